@@ -0,0 +1,206 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Response, g, request
+from flask_login import current_user
+
+# 准入控制：早高峰全体学生同时登录、打卡时，限制每个工作进程同时处理的请求数，
+# 超出并发上限的请求在有限长度的队列中短暂等待，队列已满或等待超时立即返回 503；
+# 同一学生过于频繁的登录和打卡提交返回 429。两种情况都带 Retry-After，避免客户端立即重试。
+# 与性能指标一样按工作进程统计和限制
+AUTH, CHECKIN, ADMIN = 'auth', 'checkin', 'admin'
+
+# 受控的路由：登录/注册提交（bcrypt）、打卡页面和提交（SQLite 写锁）、管理后台报表
+AUTH_ENDPOINTS = {'main.login', 'main.register'}
+CHECKIN_ENDPOINTS = {'main.CheckIn', 'main.my_calendar'}
+# 监控指标不受限，过载时仍能查看排队情况
+EXEMPT_ENDPOINTS = {'main.metrics'}
+
+
+class Overloaded(Exception):
+    """并发已满且排队已满（或等待超时），调用方应返回 503。"""
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class TokenBucketLimiter:
+    """按键（用户）限速的令牌桶：每秒补充 rate 个令牌，最多积累 burst 个，每次请求消耗一个。
+
+    只保留最近使用的 max_keys 个桶；被淘汰的键下次按满桶重新开始。
+    """
+
+    def __init__(self, rate, burst, max_keys=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()  # 键 -> [令牌数, 上次更新时间]
+        self.limited = 0
+
+    def take(self, key, now=None):
+        """取一个令牌，成功返回 0，否则返回需要等待的秒数。"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(self.burst), now]
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0.0
+            self.limited += 1
+            return (1 - bucket[0]) / self.rate
+
+
+class AdmissionController:
+    """按路由类别限制并发：每类最多 limit 个请求同时处理，另有最多 queue 个请求排队等待。
+
+    所有类别合计不超过 max_active 个，其中 reserve 个只留给 reserved 类别（管理后台报表），
+    学生请求再多也不会占满，管理员在高峰期仍能查看报表。
+    observer(类别, 处理中, 排队中) 在计数变化时调用，用于更新监控指标。
+    """
+
+    def __init__(self, max_active, classes, reserve=0, reserved=ADMIN, timeout=2.0, observer=None):
+        self.max_active = max_active
+        self.classes = {name: (limit, queue) for name, (limit, queue) in classes.items()}
+        self.reserve = min(reserve, max_active)
+        self.reserved = reserved
+        self.timeout = timeout
+        self.observer = observer
+        self._cond = threading.Condition()
+        self._total = 0
+        self.active = dict.fromkeys(self.classes, 0)
+        self.queued = dict.fromkeys(self.classes, 0)
+        self.rejected = dict.fromkeys(self.classes, 0)
+
+    def _capacity(self, route_class):
+        return self.max_active if route_class == self.reserved else self.max_active - self.reserve
+
+    def _can_run(self, route_class):
+        limit, _ = self.classes[route_class]
+        return self.active[route_class] < limit and self._total < self._capacity(route_class)
+
+    def _notify(self, route_class):
+        if self.observer is not None:
+            self.observer(route_class, self.active[route_class], self.queued[route_class])
+
+    def acquire(self, route_class):
+        """占用一个名额，返回排队等待的秒数；无法进入时抛出 Overloaded。"""
+        with self._cond:
+            if self._can_run(route_class):
+                self._enter(route_class)
+                return 0.0
+            _, queue = self.classes[route_class]
+            if self.queued[route_class] >= queue:
+                self.rejected[route_class] += 1
+                raise Overloaded('queue_full')
+            start = time.monotonic()
+            self.queued[route_class] += 1
+            self._notify(route_class)
+            try:
+                if not self._cond.wait_for(lambda: self._can_run(route_class), self.timeout):
+                    self.rejected[route_class] += 1
+                    raise Overloaded('timeout')
+            finally:
+                self.queued[route_class] -= 1
+                self._notify(route_class)
+            self._enter(route_class)
+            return time.monotonic() - start
+
+    def _enter(self, route_class):
+        self.active[route_class] += 1
+        self._total += 1
+        self._notify(route_class)
+
+    def release(self, route_class):
+        with self._cond:
+            self.active[route_class] -= 1
+            self._total -= 1
+            self._notify(route_class)
+            # 各类别的等待条件不同，全部唤醒后各自重新检查
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'max_active': self.max_active,
+                'reserve': self.reserve,
+                'classes': {name: {'limit': limit, 'queue': queue, 'active': self.active[name],
+                                   'queued': self.queued[name], 'rejected': self.rejected[name]}
+                            for name, (limit, queue) in self.classes.items()},
+            }
+
+
+def route_class(endpoint):
+    if endpoint in EXEMPT_ENDPOINTS:
+        return None
+    if endpoint in AUTH_ENDPOINTS:
+        return AUTH if request.method == 'POST' else None
+    if endpoint in CHECKIN_ENDPOINTS:
+        return CHECKIN
+    # 只有管理员的请求才会生成报表；其他人访问管理页面立即被重定向，不占用管理后台的名额
+    if request.path.startswith('/admin/') and current_user.is_authenticated and current_user.is_admin:
+        return ADMIN
+    return None
+
+
+# 限速的键：登录按 (提交的学号, 客户端地址)，别人冒用学号反复尝试不会把本人锁在外面；
+# 打卡按当前用户
+def rate_limit_key(endpoint):
+    if request.method != 'POST':
+        return None
+    if endpoint == 'main.login':
+        return request.form.get('username', '').strip(), request.remote_addr
+    if endpoint == 'main.CheckIn' and current_user.is_authenticated:
+        return current_user.id
+    return None
+
+
+def _reject(status, message, retry_after):
+    return Response(message, status=status, mimetype='text/plain',
+                    headers={'Retry-After': str(max(1, math.ceil(retry_after)))})
+
+
+def install(app, controller, limiters, metrics, retry_after=5):
+    """在请求开始时限速并占用并发名额，请求结束（流式导出传输完成）后归还。
+
+    limiters 为 {endpoint: TokenBucketLimiter}。
+    """
+
+    @app.before_request
+    def _admit_request():
+        endpoint = request.endpoint or ''
+        route = route_class(endpoint)
+        # 配置中没有列出的类别不受并发限制
+        if route not in controller.classes:
+            return None
+        limiter = limiters.get(endpoint)
+        key = rate_limit_key(endpoint) if limiter is not None else None
+        if key is not None:
+            wait = limiter.take(key)
+            if wait:
+                metrics.admission_rejected.inc(1, route, 'rate_limited')
+                return _reject(429, '操作过于频繁，请稍后再试。', wait)
+        try:
+            waited = controller.acquire(route)
+        except Overloaded as e:
+            metrics.admission_rejected.inc(1, route, e.reason)
+            return _reject(503, '服务器繁忙，请稍后重试。', retry_after)
+        g.admission_class = route
+        metrics.admission_wait_seconds.observe(waited, route)
+        return None
+
+    @app.teardown_request
+    def _release_request(exc):
+        route = g.pop('admission_class', None)
+        if route is not None:
+            controller.release(route)
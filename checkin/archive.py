@@ -0,0 +1,195 @@
+import os
+import zlib
+from datetime import date
+
+from flask import current_app
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+import search_index
+import services
+from checkins import rebuild_period_summary
+from content_store import PREVIEW_LENGTH
+from extensions import db
+from models import ArchivedRecord, CheckInContent, CheckInRecord, SignPeriod, User, bump_generation, checkins_generation
+
+# 已结束时间段的冷数据归档：打卡记录和内容分批移到归档库和压缩内容包，
+# 本库保留签到统计、完成情况汇总（含打卡位图）和学院统计，列表页和汇总页不受影响。
+# 每批先写内容包并提交归档库，再删除本库中的记录，中断后重新运行会从剩下的记录继续
+ARCHIVING, ARCHIVED = 'archiving', 'archived'
+
+
+def pack_path(period_id):
+    return os.path.join(current_app.config['ARCHIVE_FOLDER'], f'period-{period_id}.pack')
+
+
+# 把一批内容压缩成一个块追加到内容包末尾，返回块的偏移量、长度和每条内容在块内的位置
+def _append_block(period_id, contents):
+    items, parts, offset = [], [], 0
+    for content in contents:
+        data = content.encode('utf-8')
+        items.append((offset, len(data)))
+        parts.append(data)
+        offset += len(data)
+    block = zlib.compress(b''.join(parts), 9)
+    path = pack_path(period_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'ab') as f:
+        f.seek(0, os.SEEK_END)
+        block_offset = f.tell()
+        f.write(block)
+        f.flush()
+        os.fsync(f.fileno())
+    return block_offset, len(block), items
+
+
+# 读取归档记录的内容；同一压缩块只解压一次
+def load_contents(rows):
+    blocks, contents = {}, {}
+    for row in rows:
+        key = (row.period_id, row.block_offset)
+        if key not in blocks:
+            with open(pack_path(row.period_id), 'rb') as f:
+                f.seek(row.block_offset)
+                blocks[key] = zlib.decompress(f.read(row.block_length))
+        data = blocks[key][row.item_offset:row.item_offset + row.item_length]
+        contents[row.id] = data.decode('utf-8')
+    return contents
+
+
+def _period(period_id):
+    period = db.session.get(SignPeriod, period_id)
+    if period is None:
+        raise ValueError(f'时间段 {period_id} 不存在')
+    return period
+
+
+def _set_state(period, state):
+    period.archive_state = state
+    bump_generation('periods', checkins_generation(period.id))
+    db.session.commit()
+    services.period_calendar.invalidate()
+
+
+def archive_period(period_id, batch_size=1000, today=None, log=print):
+    """把已结束时间段的打卡记录和内容移到归档库，返回本次移动的记录数。
+
+    开始前按截止日期重建一次汇总，使缺卡日期和位图成为最终结果；之后汇总和签到统计不再重建。
+    """
+    today = today or date.today()
+    period = _period(period_id)
+    if period.archive_state == ARCHIVED:
+        return 0
+    if period.end_date >= today:
+        raise ValueError(f'时间段 {period.name} 尚未结束，不能归档')
+    if period.archive_state is None:
+        rebuild_period_summary(services.period_calendar.get(period.id), today)
+        _set_state(period, ARCHIVING)
+    moved = 0
+    while True:
+        records = CheckInRecord.query.filter(CheckInRecord.date >= period.start_date,
+                                             CheckInRecord.date <= period.end_date) \
+            .order_by(CheckInRecord.id).limit(batch_size).all()
+        if not records:
+            break
+        ids = [r.id for r in records]
+        # 一次取出本批的内容行，load() 时直接命中会话缓存
+        CheckInContent.query.filter(CheckInContent.record_id.in_(ids)).all()
+        contents = []
+        indexed = []  # 全文索引按原文删除，读取失败的记录无法删除
+        for record in records:
+            try:
+                contents.append(services.content_storage.load(record))
+                indexed.append((record.id, contents[-1]))
+            except OSError as e:
+                # 内容文件已丢失：记录照常归档（统计不变），内容为空
+                log(f'读取失败 id={record.id} {record.file_path}: {e}')
+                contents.append('')
+        block_offset, block_length, items = _append_block(period.id, contents)
+        # 重新运行中断的批次时覆盖之前写入的归档行，旧的压缩块不再被引用
+        insert = sqlite_insert(ArchivedRecord).values([
+            dict(id=r.id, period_id=period.id, user_pk=r.user_pk, user_id=r.user_id, date=r.date,
+                 preview=content[:PREVIEW_LENGTH], block_offset=block_offset, block_length=block_length,
+                 item_offset=item_offset, item_length=item_length)
+            for r, content, (item_offset, item_length) in zip(records, contents, items)
+        ])
+        db.session.execute(insert.on_conflict_do_update(
+            index_elements=['id'], set_={c.name: insert.excluded[c.name] for c in ArchivedRecord.__table__.c}))
+        db.session.commit()
+        files = services.content_storage.delete(records)
+        search_index.remove(db.session, indexed)
+        services.duplicate_index.remove(ids)
+        CheckInRecord.query.filter(CheckInRecord.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        for path in files:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        moved += len(records)
+        log(f'{period.name}：已归档 {moved} 条')
+    _set_state(period, ARCHIVED)
+    return moved
+
+
+def restore_period(period_id, batch_size=1000, log=print):
+    """把归档的打卡记录和内容移回本库（按当前 CONTENT_BACKEND 保存并重新建立全文索引），返回恢复的记录数。
+
+    相似度指纹不随归档保存，恢复后运行 fingerprint-content 重新计算。
+    """
+    period = _period(period_id)
+    if period.archive_state is None:
+        return 0
+    _set_state(period, ARCHIVING)
+    restored = 0
+    while True:
+        rows = ArchivedRecord.query.filter_by(period_id=period.id) \
+            .order_by(ArchivedRecord.id).limit(batch_size).all()
+        if not rows:
+            break
+        contents = load_contents(rows)
+        # 归档后修改过学号的学生按当前学号恢复（user_pk 为空的旧记录保留原学号）
+        usernames = dict(db.session.query(User.id, User.username).filter(
+            User.id.in_({row.user_pk for row in rows if row.user_pk is not None})))
+        user_ids = {row.id: usernames.get(row.user_pk, row.user_id) for row in rows}
+        # 按唯一约束 (user_id, date) 判断上次中断前已恢复的记录
+        existing = set(db.session.query(CheckInRecord.user_id, CheckInRecord.date).filter(
+            CheckInRecord.user_id.in_(set(user_ids.values())),
+            CheckInRecord.date >= period.start_date, CheckInRecord.date <= period.end_date))
+        indexed = []
+        for row in rows:
+            user_id = user_ids[row.id]
+            if (user_id, row.date) in existing:
+                continue
+            # 原 id 已被新记录占用时（SQLite 会复用最大的已删除 id）由数据库分配新 id
+            record_id = db.session.execute(
+                sqlite_insert(CheckInRecord)
+                .values(id=row.id, user_pk=row.user_pk, user_id=user_id, date=row.date, file_path='')
+                .on_conflict_do_nothing().returning(CheckInRecord.id)
+            ).scalar()
+            if record_id is None:
+                record_id = db.session.execute(
+                    sqlite_insert(CheckInRecord)
+                    .values(user_pk=row.user_pk, user_id=user_id, date=row.date, file_path='')
+                    .returning(CheckInRecord.id)
+                ).scalar()
+            services.content_storage.save(db.session.get(CheckInRecord, record_id), contents[row.id])
+            indexed.append((record_id, contents[row.id]))
+        search_index.index_many(db.session, indexed)
+        db.session.commit()
+        ArchivedRecord.query.filter(ArchivedRecord.id.in_([row.id for row in rows])) \
+            .delete(synchronize_session=False)
+        db.session.commit()
+        restored += len(rows)
+        log(f'{period.name}：已恢复 {restored} 条')
+    try:
+        os.remove(pack_path(period.id))
+    except OSError:
+        pass
+    _set_state(period, None)
+    return restored
+
+
+# 删除时间段时一并删除其归档记录，调用方负责提交事务；返回提交后需要删除的内容包
+def remove_periods(period_ids):
+    ArchivedRecord.query.filter(ArchivedRecord.period_id.in_(period_ids)).delete(synchronize_session=False)
+    return [pack_path(period_id) for period_id in period_ids]
@@ -0,0 +1,7 @@
+# ASGI 入口（需要额外安装 uvicorn）：uvicorn asgi:application --workers 4 --port 5001
+# 请求在 asgiref 的线程池中执行，慢请求不会阻塞事件循环
+from asgiref.wsgi import WsgiToAsgi
+
+from app import create_app
+
+application = WsgiToAsgi(create_app())
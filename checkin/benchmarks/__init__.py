@@ -0,0 +1 @@
+# 性能基准测试脚本，在 checkin 目录下以 python -m benchmarks.<模块名> 运行
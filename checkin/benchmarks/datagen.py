@@ -0,0 +1,166 @@
+"""生成可复现的模拟数据：学生、打卡时间段和休息日、打卡记录及内容。
+
+相同的 --seed 和 --end 生成完全相同的数据。最后一个时间段包含 --end 当天（默认今天），
+当天不生成打卡记录，便于基准测试提交打卡。
+用法：python -m benchmarks.datagen --db /tmp/bench.db --users 10000 --days 120
+"""
+import argparse
+import os
+import random
+import time
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+from content_store import PREVIEW_LENGTH
+from forms import DEPARTMENTS
+
+BATCH_SIZE = 5000
+# 模拟数据统一使用的密码（bcrypt cost 4，仅用于基准测试）
+PASSWORD = 'benchmark'
+PERIOD_NAMES = ['第一阶段', '第二阶段', '第三阶段', '第四阶段']
+WORDS = ['今天', '读了', '一章', '关于', '算法', '的书', '学习', '笔记', '复习', '英语', '数学', '实验',
+         '报告', '总结', '收获', '很大', '继续', '努力']
+
+
+def usernames(count):
+    return [f'2024{i:08d}' for i in range(1, count + 1)]
+
+
+def make_content(rng):
+    return ''.join(rng.choice(WORDS) for _ in range(rng.randint(60, 200)))
+
+
+def _insert(db, table, rows):
+    for start in range(0, len(rows), BATCH_SIZE):
+        db.session.execute(db.insert(table), rows[start:start + BATCH_SIZE])
+
+
+def generate(db, users=1000, days=120, periods=2, rate=0.8, seed=2024, end=None, backend=None, log=print):
+    """向当前应用的数据库写入模拟数据（需在应用上下文中调用，数据库应为空）。返回统计信息。"""
+    import search_index
+    import services
+    import department_rollup
+    from checkins import rebuild_period_summary, rebuild_user_checkin_stats
+    from models import CheckInContent, CheckInRecord, SignInException, SignPeriod, User, load_period_infos
+    from password_hasher import hash_password
+
+    rng = random.Random(seed)
+    end = end or date.today()
+    start = end - timedelta(days=days - 1)
+    begin = time.perf_counter()
+
+    pw_hash = hash_password(PASSWORD, 4)
+    _insert(db, User, [
+        dict(id=i, username=username, name=f'学生{i}', password=pw_hash,
+             Departments=rng.choice(DEPARTMENTS), QQ=str(10000000 + i), is_admin=False)
+        for i, username in enumerate(usernames(users), 1)
+    ])
+    db.session.add(User(id=users + 1, username='000000000000', name='管理员', password=pw_hash,
+                        Departments=DEPARTMENTS[0], QQ='10000', is_admin=True))
+    db.session.flush()
+    department_rollup.assign_departments(db.session)
+
+    # 时间段平均分配天数，最后一段包含 end 当天；每段约七分之一的日子为休息日
+    length = days // periods
+    rest_days = set()
+    for p in range(periods):
+        p_start = start + timedelta(days=p * length)
+        p_end = end if p == periods - 1 else p_start + timedelta(days=length - 1)
+        db.session.add(SignPeriod(id=p + 1, name=PERIOD_NAMES[p % len(PERIOD_NAMES)], start_date=p_start,
+                                  end_date=p_end))
+        day = p_start
+        while day <= p_end:
+            if rng.random() < 1 / 7 and day != end:
+                rest_days.add(day)
+                db.session.add(SignInException(period_id=p + 1, exception_date=day))
+            day += timedelta(days=1)
+    db.session.flush()
+
+    # 内容直接交给存储后端生成（file 后端写文本文件，segment 追加段文件），记录和内容行批量插入
+    storage = services.content_storage.backend(backend)
+    record_id = 0
+    records, contents, texts = [], [], []
+    for user_pk, username in enumerate(usernames(users), 1):
+        for offset in range(days - 1):
+            day = start + timedelta(days=offset)
+            if day in rest_days or rng.random() >= rate:
+                continue
+            record_id += 1
+            content = make_content(rng)
+            record = SimpleNamespace(id=record_id, user_id=username, date=day, file_path='')
+            row = SimpleNamespace(data=None, codec='plain', segment=None, offset=None, length=None)
+            storage.save(record, row, content)
+            records.append(dict(id=record_id, user_id=username, user_pk=user_pk, date=day,
+                                file_path=record.file_path))
+            texts.append((record_id, content))
+            if storage.name != 'file':
+                contents.append(dict(record_id=record_id, backend=storage.name, preview=content[:PREVIEW_LENGTH],
+                                     codec=row.codec, data=row.data, segment=row.segment, offset=row.offset,
+                                     length=row.length))
+        if len(records) >= BATCH_SIZE:
+            _insert(db, CheckInRecord, records)
+            _insert(db, CheckInContent, contents)
+            search_index.index_many(db.session, texts)
+            records, contents, texts = [], [], []
+    _insert(db, CheckInRecord, records)
+    _insert(db, CheckInContent, contents)
+    search_index.index_many(db.session, texts)
+    search_index.optimize(db.session)
+    db.session.commit()
+
+    rebuild_user_checkin_stats()
+    department_rollup.rebuild(db.session)
+    for period in load_period_infos():
+        rebuild_period_summary(period, end)
+    db.session.commit()
+    elapsed = time.perf_counter() - begin
+    log(f'已生成 {users} 名学生、{periods} 个时间段、{record_id} 条打卡记录（{storage.name} 后端），'
+        f'耗时 {elapsed:.1f} 秒')
+    return {'users': users, 'days': days, 'periods': periods, 'records': record_id, 'backend': storage.name,
+            'seed': seed, 'end': str(end)}
+
+
+def create_app(path, upload_folder=None, **config):
+    from app import create_app as create
+
+    return create(dict({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.abspath(path),
+        'SQLALCHEMY_BINDS': {'archive': 'sqlite:///' + os.path.splitext(os.path.abspath(path))[0] + '-archive.db'},
+        'UPLOAD_FOLDER': upload_folder or os.path.join(os.path.dirname(os.path.abspath(path)), 'uploads'),
+        'WTF_CSRF_ENABLED': False,
+        'BCRYPT_LOG_ROUNDS': 4,
+        'PASSWORD_HASH_WORKERS': 0,
+        # 基准测试在进程内用大量线程直接调用视图，默认不做准入控制和限速
+        'ADMISSION_CONTROL': False,
+    }, **config))
+
+
+def add_arguments(parser):
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=120)
+    parser.add_argument('--periods', type=int, default=2)
+    parser.add_argument('--rate', type=float, default=0.8, help='每天打卡的概率')
+    parser.add_argument('--seed', type=int, default=2024)
+    parser.add_argument('--end', type=date.fromisoformat, default=None, help='最后一天，默认今天')
+    parser.add_argument('--backend', default=None, help='内容存储后端，默认 CONTENT_BACKEND')
+
+
+def main():
+    import db_bootstrap
+    from extensions import db
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', required=True, help='生成的 SQLite 数据库路径（不能已存在）')
+    add_arguments(parser)
+    args = parser.parse_args()
+    if os.path.exists(args.db):
+        parser.error(f'{args.db} 已存在')
+    app = create_app(args.db, CONTENT_BACKEND=args.backend or 'db')
+    with app.app_context():
+        db_bootstrap.upgrade(db, log=lambda message: None)
+        generate(db, users=args.users, days=args.days, periods=args.periods, rate=args.rate, seed=args.seed,
+                 end=args.end, backend=args.backend)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""用户与打卡记录关联查询基准：比较按学号字符串关联与按整数外键 user_pk 关联。
+
+生成模拟数据（默认 3000 名学生、一学期 120 天、约 80% 的打卡率），
+对时间段内每个用户的签到次数统计和单个用户的记录查询分别计时。
+用法：python -m benchmarks.join_benchmark [--users 3000] [--days 120] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+
+SCHEMA = """
+CREATE TABLE user (
+    id INTEGER NOT NULL PRIMARY KEY,
+    username VARCHAR(20) NOT NULL UNIQUE,
+    name VARCHAR(20) NOT NULL
+);
+CREATE TABLE check_in_record (
+    id INTEGER NOT NULL PRIMARY KEY,
+    user_id VARCHAR(64) NOT NULL,
+    user_pk INTEGER REFERENCES user (id) ON DELETE CASCADE,
+    date DATE,
+    file_path VARCHAR(256) NOT NULL,
+    CONSTRAINT unique_signin_per_day UNIQUE (user_id, date)
+);
+CREATE INDEX ix_check_in_record_date ON check_in_record (date);
+CREATE UNIQUE INDEX ix_check_in_record_user_pk_date ON check_in_record (user_pk, date);
+"""
+
+QUERIES = {
+    'period_counts': {
+        'username': 'SELECT user.id, COUNT(*) FROM user JOIN check_in_record '
+                    'ON user.username = check_in_record.user_id '
+                    'WHERE check_in_record.date >= ? AND check_in_record.date <= ? GROUP BY user.id',
+        'user_pk': 'SELECT user.id, COUNT(*) FROM user JOIN check_in_record '
+                   'ON user.id = check_in_record.user_pk '
+                   'WHERE check_in_record.date >= ? AND check_in_record.date <= ? GROUP BY user.id',
+    },
+    'user_records': {
+        'username': 'SELECT check_in_record.date FROM user JOIN check_in_record '
+                    'ON user.username = check_in_record.user_id WHERE user.id = ? ORDER BY date',
+        'user_pk': 'SELECT check_in_record.date FROM user JOIN check_in_record '
+                   'ON user.id = check_in_record.user_pk WHERE user.id = ? ORDER BY date',
+    },
+}
+
+
+def populate(conn, users, days, rate, seed):
+    rng = random.Random(seed)
+    start = date(2025, 2, 17)
+    conn.executemany('INSERT INTO user (id, username, name) VALUES (?, ?, ?)',
+                     ((i, f'2024{i:08d}', f'学生{i}') for i in range(1, users + 1)))
+    rows = ((f'2024{i:08d}', i, str(start + timedelta(days=d)), 'db')
+            for i in range(1, users + 1) for d in range(days) if rng.random() < rate)
+    conn.executemany('INSERT INTO check_in_record (user_id, user_pk, date, file_path) VALUES (?, ?, ?, ?)', rows)
+    conn.commit()
+    conn.execute('ANALYZE')
+    return start
+
+
+def index_size(conn, name):
+    try:
+        return conn.execute('SELECT SUM(pgsize) FROM dbstat WHERE name = ?', (name,)).fetchone()[0]
+    except sqlite3.OperationalError:
+        return None  # 编译时未启用 dbstat
+
+
+def timed(conn, sql, params_list, repeat):
+    best = None
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        for params in params_list:
+            conn.execute(sql, params).fetchall()
+        elapsed = time.perf_counter() - begin
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=3000)
+    parser.add_argument('--days', type=int, default=120)
+    parser.add_argument('--rate', type=float, default=0.8, help='每天打卡的概率')
+    parser.add_argument('--lookups', type=int, default=500, help='单用户查询的次数')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, 'bench.db'))
+        conn.executescript(SCHEMA)
+        start = populate(conn, args.users, args.days, args.rate, args.seed)
+        total = conn.execute('SELECT COUNT(*) FROM check_in_record').fetchone()[0]
+        print(f'{args.users} 名学生，{total} 条打卡记录')
+
+        for name in ('sqlite_autoindex_check_in_record_1', 'ix_check_in_record_user_pk_date'):
+            size = index_size(conn, name)
+            if size is not None:
+                print(f'索引 {name}: {size / 1024:.0f} KiB')
+
+        rng = random.Random(args.seed)
+        params = {
+            'period_counts': [(str(start), str(start + timedelta(days=args.days - 1)))],
+            'user_records': [(rng.randint(1, args.users),) for _ in range(args.lookups)],
+        }
+        for query, variants in QUERIES.items():
+            results = {key: timed(conn, sql, params[query], args.repeat) for key, sql in variants.items()}
+            speedup = results['username'] / results['user_pk']
+            print(f'{query:>14}: 学号关联 {results["username"] * 1000:8.1f} ms  '
+                  f'user_pk 关联 {results["user_pk"] * 1000:8.1f} ms  加速 {speedup:.2f}x')
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""打卡高峰压测：模拟 N 名学生并发登录并提交打卡，统计各步骤的 p50/p99 延迟和每秒请求数。
+
+需要先启动服务（例如 gunicorn -c gunicorn.conf.py wsgi:app），并存在一个进行中的打卡时间段。
+用法：python -m benchmarks.load_test --url http://127.0.0.1:5001 --students 200 --concurrency 50 --register
+"""
+import argparse
+import http.cookiejar
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+CSRF_RE = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+
+
+class Student:
+    def __init__(self, base_url, username, password):
+        self.base_url = base_url.rstrip('/')
+        self.username = username
+        self.password = password
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def request(self, path, data=None):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        try:
+            with self.opener.open(self.base_url + path, body, timeout=60) as resp:
+                return resp.status, resp.read().decode('utf-8', 'replace')
+        except urllib.error.HTTPError as e:
+            return e.code, e.read().decode('utf-8', 'replace')
+
+    def csrf(self, path):
+        status, html = self.request(path)
+        match = CSRF_RE.search(html)
+        return match.group(1) if match else ''
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+        self.errors = {}
+
+    def timed(self, step, fn, *args):
+        begin = time.perf_counter()
+        status, body = fn(*args)
+        elapsed = time.perf_counter() - begin
+        with self._lock:
+            self.samples.setdefault(step, []).append(elapsed)
+            if status >= 400:
+                self.errors[step] = self.errors.get(step, 0) + 1
+        return status, body
+
+    def report(self, wall):
+        total = sum(len(v) for v in self.samples.values())
+        print(f'总请求 {total}，耗时 {wall:.2f} 秒，{total / wall:.1f} 请求/秒')
+        for step, values in self.samples.items():
+            values.sort()
+            p50 = values[len(values) // 2] * 1000
+            p99 = values[max(0, int(len(values) * 0.99) - 1)] * 1000
+            print(f'{step:>10}: {len(values):5d} 次  p50 {p50:8.1f} ms  p99 {p99:8.1f} ms  '
+                  f'错误 {self.errors.get(step, 0)}')
+
+
+def register(student, recorder):
+    token = student.csrf('/register')
+    recorder.timed('register', student.request, '/register', {
+        'csrf_token': token, 'username': student.username, 'password': student.password,
+        'confirm_password': student.password, 'name': '压测', 'Departments': '理学院', 'QQ': '10000',
+    })
+
+
+def check_in(student, recorder):
+    token = student.csrf('/login')
+    recorder.timed('login', student.request, '/login', {
+        'csrf_token': token, 'username': student.username, 'password': student.password})
+    recorder.timed('page', student.request, '/CheckIn')
+    recorder.timed('checkin', student.request, '/CheckIn', {'contents': '今天读了一章书。' * 20})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:5001')
+    parser.add_argument('--students', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--prefix', default='9999', help='压测账号学号前缀，补齐到 12 位')
+    parser.add_argument('--password', default='loadtest')
+    parser.add_argument('--register', action='store_true', help='先注册压测账号（已存在时会失败，可忽略）')
+    args = parser.parse_args()
+
+    students = [Student(args.url, f'{args.prefix}{i:0{12 - len(args.prefix)}d}', args.password)
+                for i in range(args.students)]
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        if args.register:
+            setup = Recorder()
+            list(pool.map(lambda s: register(s, setup), students))
+        recorder = Recorder()
+        begin = time.perf_counter()
+        list(pool.map(lambda s: check_in(s, recorder), students))
+        recorder.report(time.perf_counter() - begin)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+"""路由基准：用 Flask 测试客户端访问主要页面，输出各路由的延迟、SQL 条数和内存峰值（JSON）。
+
+不指定 --db 时先在临时目录生成模拟数据（参数同 benchmarks.datagen）。
+结果可保存后在不同提交之间比较：
+python -m benchmarks.routes --users 2000 --output before.json
+python -m benchmarks.routes --db /tmp/bench.db --repeat 50
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from sqlalchemy import event
+
+from benchmarks import datagen
+
+# (名称, 登录身份, 方法, 路径)；student 为每次请求轮换的学生，{username} 替换为其学号
+ROUTES = [
+    ('checkin_page', 'student', 'GET', '/CheckIn'),
+    ('checkin_submit', 'student', 'POST', '/CheckIn'),
+    ('users_page', 'admin', 'GET', '/admin/users'),
+    ('users_last_page', 'admin', 'GET', '/admin/users?page={last_page}'),
+    ('users_csv', 'admin', 'GET', '/admin/users?export=csv'),
+    ('records_by_period', 'admin', 'GET', '/admin/records_by_period/{period_id}'),
+    ('records_by_period_below', 'admin', 'GET', '/admin/records_by_period/{period_id}?below=60'),
+    ('records_by_period_csv', 'admin', 'GET', '/admin/records_by_period/{period_id}?export=csv'),
+    ('user_records', 'admin', 'GET', '/admin/user/{username}/records'),
+    ('search', 'admin', 'GET', '/admin/search?q=算法的书'),
+    ('search_filtered', 'admin', 'GET', '/admin/search?q=算法的书+复习&period_id={period_id}&department=理学院'),
+]
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, 'after_cursor_execute', self._after)
+
+    def _after(self, *args):
+        self.count += 1
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def login(client, username):
+    client.get('/logout')
+    response = client.post('/login', data={'username': username, 'password': datagen.PASSWORD})
+    if response.status_code != 302:
+        raise RuntimeError(f'{username} 登录失败')
+
+
+def run_route(app, counter, role, method, path, students, repeat, context):
+    admin = app.test_client()
+    login(admin, '000000000000')
+    latencies, queries, sizes = [], [], []
+    errors = 0
+    content = '模拟打卡内容，用于基准测试。' * 10
+    for i in range(repeat + 1):
+        student = students[i % len(students)]
+        client = admin
+        if role == 'student':
+            client = app.test_client()
+            login(client, student)
+        url = path.format(username=student, **context)
+        counter.count = 0
+        begin = time.perf_counter()
+        if method == 'POST':
+            response = client.post(url, data={'contents': content})
+        else:
+            response = client.get(url)
+        body = response.get_data()  # 流式导出在这里读完全部内容
+        elapsed = time.perf_counter() - begin
+        if i == 0:
+            continue  # 第一次请求用于预热缓存
+        latencies.append(elapsed)
+        queries.append(counter.count)
+        sizes.append(len(body))
+        if response.status_code >= 400:
+            errors += 1
+    return latencies, queries, sizes, errors
+
+
+def measure_peak(app, role, method, path, student, context):
+    client = app.test_client()
+    login(client, student if role == 'student' else '000000000000')
+    tracemalloc.start()
+    try:
+        if method == 'POST':
+            client.post(path.format(username=student, **context), data={'contents': '内存峰值测试内容。' * 20})
+        else:
+            client.get(path.format(username=student, **context)).get_data()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    import db_bootstrap
+    from extensions import db
+    from models import SignPeriod, User
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', help='已有的模拟数据库（由 benchmarks.datagen 生成），不指定时临时生成')
+    parser.add_argument('--repeat', type=int, default=20, help='每个路由的请求次数')
+    parser.add_argument('--routes', default=None, help='只运行指定路由，逗号分隔')
+    parser.add_argument('--output', default=None, help='JSON 结果文件，默认输出到标准输出')
+    datagen.add_arguments(parser)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.db or os.path.join(tmp, 'bench.db')
+        dataset = None
+        app = datagen.create_app(path, CONTENT_BACKEND=args.backend or 'db')
+        with app.app_context():
+            db_bootstrap.upgrade(db, log=lambda message: None)
+            if args.db is None:
+                dataset = datagen.generate(db, users=args.users, days=args.days, periods=args.periods,
+                                           rate=args.rate, seed=args.seed, end=args.end, backend=args.backend,
+                                           log=lambda message: print(message, file=sys.stderr))
+            # 提交打卡会写入数据，按学号倒序轮换学生，尽量避开其他路由查看的学生
+            students = [u for (u,) in db.session.query(User.username).filter_by(is_admin=False)
+                        .order_by(User.username.desc()).limit(args.repeat + 1)]
+            user_count = User.query.count()
+            period_id = db.session.query(SignPeriod.id).order_by(SignPeriod.end_date.desc()).limit(1).scalar()
+            counter = QueryCounter(db.engine)
+        context = {'period_id': period_id, 'last_page': (user_count + 19) // 20}
+
+        results = {}
+        selected = set(args.routes.split(',')) if args.routes else None
+        for name, role, method, route in ROUTES:
+            if selected and name not in selected:
+                continue
+            latencies, queries, sizes, errors = run_route(app, counter, role, method, route, students,
+                                                          args.repeat, context)
+            peak = measure_peak(app, role, method, route, students[0], context)
+            results[name] = {
+                'method': method,
+                'path': route,
+                'requests': len(latencies),
+                'errors': errors,
+                'p50_ms': round(percentile(latencies, 0.5) * 1000, 2),
+                'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+                'max_ms': round(max(latencies) * 1000, 2),
+                'queries': max(queries),
+                'response_bytes': max(sizes),
+                'peak_kib': round(peak / 1024, 1),
+            }
+            print(f'{name:>24}: p50 {results[name]["p50_ms"]:8.2f} ms  p95 {results[name]["p95_ms"]:8.2f} ms  '
+                  f'SQL {results[name]["queries"]:3d}  峰值 {results[name]["peak_kib"]:9.1f} KiB', file=sys.stderr)
+
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'dataset': dataset or {'db': args.db, 'users': user_count},
+        'repeat': args.repeat,
+        'max_rss_kib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'routes': results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""并发打卡写入吞吐量基准：比较默认日志模式与生产环境 PRAGMA（WAL 等）。
+
+用法：python -m benchmarks.write_throughput [--writers 8] [--per-writer 300]
+"""
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+from db_bootstrap import DEFAULT_PRAGMAS
+
+SCHEMA = """
+CREATE TABLE check_in_record (
+    id INTEGER NOT NULL PRIMARY KEY,
+    user_id VARCHAR(64) NOT NULL,
+    date DATE,
+    file_path VARCHAR(256) NOT NULL,
+    CONSTRAINT unique_signin_per_day UNIQUE (user_id, date)
+);
+CREATE INDEX ix_check_in_record_date ON check_in_record (date);
+"""
+
+# 两种配置都设置同样的锁等待时间，只比较日志模式等参数的差异
+PROFILES = {
+    'default': {'busy_timeout': DEFAULT_PRAGMAS['busy_timeout']},
+    'production': DEFAULT_PRAGMAS,
+}
+
+
+def connect(path, pragmas):
+    conn = sqlite3.connect(path, timeout=DEFAULT_PRAGMAS['busy_timeout'] / 1000)
+    for key, value in pragmas.items():
+        conn.execute(f'PRAGMA {key}={value}')
+    return conn
+
+
+def writer(path, pragmas, writer_id, count, errors, ready, go):
+    conn = connect(path, pragmas)
+    ready.release()
+    go.wait()
+    start = date(2025, 1, 1)
+    for i in range(count):
+        # 每次打卡单独提交，与 CheckIn() 的写入方式一致
+        try:
+            with conn:
+                conn.execute('INSERT INTO check_in_record (user_id, date, file_path) VALUES (?, ?, ?)',
+                             (f'{writer_id:06d}{i:06d}', str(start + timedelta(days=i % 120)), 'db'))
+        except sqlite3.OperationalError:
+            with errors.get_lock():
+                errors.value += 1
+    conn.close()
+
+
+def reader(path, pragmas, stop, latencies):
+    conn = connect(path, pragmas)
+    while not stop.is_set():
+        begin = time.perf_counter()
+        conn.execute('SELECT user_id, COUNT(*) FROM check_in_record GROUP BY user_id LIMIT 20').fetchall()
+        latencies.append(time.perf_counter() - begin)
+        time.sleep(0.005)
+    conn.close()
+
+
+def run_profile(name, writers, per_writer):
+    directory = tempfile.mkdtemp(prefix='checkin-bench-')
+    path = os.path.join(directory, 'bench.db')
+    conn = connect(path, PROFILES[name])
+    conn.executescript(SCHEMA)
+    conn.close()
+
+    # 用 spawn 启动写进程：fork 会继承父进程读连接的 SQLite 锁状态
+    context = multiprocessing.get_context('spawn')
+    errors = context.Value('i', 0)
+    ready = context.Semaphore(0)
+    go = context.Event()
+    stop = threading.Event()
+    latencies = []
+    reader_thread = threading.Thread(target=reader, args=(path, PROFILES[name], stop, latencies))
+    reader_thread.start()
+    processes = [context.Process(target=writer, args=(path, PROFILES[name], w, per_writer, errors, ready, go))
+                 for w in range(writers)]
+    for p in processes:
+        p.start()
+    # 等所有写进程连接就绪后同时开始，计时不包含进程启动时间
+    for _ in processes:
+        ready.acquire()
+    begin = time.perf_counter()
+    go.set()
+    for p in processes:
+        p.join()
+    elapsed = time.perf_counter() - begin
+    stop.set()
+    reader_thread.join()
+
+    written = writers * per_writer - errors.value
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else 0.0
+    print(f'{name:>10}: {written} 条写入，{elapsed:.2f} 秒，{written / elapsed:.0f} 次/秒，'
+          f'锁超时 {errors.value} 次，并发读 {len(latencies)} 次，读 p99 {p99:.1f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--per-writer', type=int, default=300)
+    args = parser.parse_args()
+    for name in PROFILES:
+        run_profile(name, args.writers, args.per_writer)
+
+
+if __name__ == '__main__':
+    main()
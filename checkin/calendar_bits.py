@@ -0,0 +1,121 @@
+from datetime import timedelta
+from functools import lru_cache
+
+# 打卡日历位图：时间段第 i 天（从 start_date 起算，0 开始）对应整数的第 i 位。
+# 数据库中按小端字节序保存（period_user_summary.signed_bits），JSON 中输出为十六进制字符串
+
+
+def period_length(period):
+    return (period.end_date - period.start_date).days + 1
+
+
+def encode(period, days):
+    bits = 0
+    for day in days:
+        if period.start_date <= day <= period.end_date:
+            bits |= 1 << (day - period.start_date).days
+    return bits
+
+
+def to_bytes(period, bits):
+    return bits.to_bytes((period_length(period) + 7) // 8, 'little')
+
+
+def from_bytes(data):
+    return int.from_bytes(data, 'little') if data else 0
+
+
+def to_hex(bits):
+    return format(bits, 'x')
+
+
+def dates(period, bits):
+    result = []
+    while bits:
+        low = bits & -bits
+        result.append(period.start_date + timedelta(days=low.bit_length() - 1))
+        bits ^= low
+    return result
+
+
+# 时间段的全部日期、休息日和应打卡日掩码；PeriodInfo 不可变，按时间段缓存
+@lru_cache(maxsize=128)
+def masks(period):
+    full = (1 << period_length(period)) - 1
+    rest = encode(period, period.exceptions)
+    return full, rest, full & ~rest
+
+
+# day 之前（不含 day）的日期掩码
+def before(period, day):
+    index = (day - period.start_date).days
+    if index <= 0:
+        return 0
+    return (1 << min(index, period_length(period))) - 1
+
+
+# 截至 as_of 的连续打卡天数：从 as_of 前最后一次缺卡之后算起，休息日不打断连续；
+# as_of 当天还没打卡不算缺卡
+def current_streak(period, bits, as_of):
+    _, _, required = masks(period)
+    signed = bits & required
+    missed = required & ~bits & before(period, as_of)
+    if missed:
+        signed &= ~((1 << missed.bit_length()) - 1)
+    return signed.bit_count()
+
+
+# 最长连续打卡天数：休息日视为已打卡把前后连起来，但不计入天数
+def longest_streak(period, bits):
+    _, rest, required = masks(period)
+    runs = bits | rest
+    longest = 0
+    while runs:
+        low = runs & -runs
+        # 加上最低位后进位清除最低的一段连续 1，两者相与取出这一段
+        run = runs & ~(runs + low)
+        longest = max(longest, (run & bits & required).bit_count())
+        runs &= runs + low
+    return longest
+
+
+def summary(period, bits, as_of):
+    """由打卡位图计算日历接口返回的统计：打卡和缺卡日期、完成率、当前及最长连续打卡。"""
+    _, rest, required = masks(period)
+    signed = bits & required
+    missed = required & ~bits & before(period, as_of)
+    required_count = required.bit_count()
+    return {
+        'period_id': period.id,
+        'start': period.start_date.isoformat(),
+        'end': period.end_date.isoformat(),
+        'length': period_length(period),
+        'as_of': as_of.isoformat(),
+        'signed': to_hex(bits),
+        'rest': to_hex(rest),
+        'signed_dates': [d.isoformat() for d in dates(period, bits)],
+        'missed_dates': [d.isoformat() for d in dates(period, missed)],
+        'sign_count': signed.bit_count(),
+        'required_days': required_count,
+        'completion': round(signed.bit_count() * 100.0 / required_count, 2) if required_count else 100.0,
+        'current_streak': current_streak(period, bits, as_of),
+        'longest_streak': longest_streak(period, bits),
+    }
+
+
+def day_counts(bitsets, length):
+    """所有用户位图按天求和，返回每天的打卡人数。
+
+    用按位切片的计数器累加：planes[k] 的第 i 位是第 i 天人数的第 k 个二进制位，
+    每加一个位图只需 O(log 人数) 次整数运算，每次运算同时处理时间段内的所有天。
+    """
+    planes = []
+    for bits in bitsets:
+        carry = bits
+        k = 0
+        while carry:
+            if k == len(planes):
+                planes.append(0)
+            planes[k], carry = planes[k] ^ carry, planes[k] & carry
+            k += 1
+    return [sum(((plane >> i) & 1) << k for k, plane in enumerate(planes)) for i in range(length)]
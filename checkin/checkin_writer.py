@@ -0,0 +1,120 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from sqlalchemy import text
+
+
+class CheckInWriter:
+    """单写线程批量提交打卡（group commit）：请求线程提交任务后得到 Future，
+    写线程把排队中的打卡合并成一批，在同一个事务中逐条执行 write 后只提交一次。
+
+    SQLite 同一时间只允许一个写事务，逐条提交时每个请求都要争抢写锁；
+    合并后每批只获取一次写锁（BEGIN IMMEDIATE），提交成功后才设置各 Future 的结果。
+    每条打卡在独立的 SAVEPOINT 中执行，单条失败只回滚该条，不影响同批其他打卡。
+    """
+
+    def __init__(self, app, db, write, batch_size=64, max_wait=0.0):
+        self.app = app
+        self.db = db
+        self._write = write
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.pending = 0
+        self.completed = 0
+        self.duplicates = 0
+        self.failed = 0
+        self.batches = 0
+        self.largest_batch = 0
+
+    def submit(self, *args):
+        future = Future()
+        with self._lock:
+            self.pending += 1
+            # 第一次提交时才启动写线程，命令行等不打卡的场景不创建线程
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='checkin-writer', daemon=True)
+                self._thread.start()
+        self._queue.put((args, future))
+        return future
+
+    def _next_batch(self):
+        item = self._queue.get()
+        if item is None:
+            return None
+        batch = [item]
+        # 先取走已在排队的打卡；max_wait 大于 0 时再等待一小段时间凑满一批
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            try:
+                remaining = deadline - time.monotonic()
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)  # 处理完这一批后再退出
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self._commit(batch)
+
+    def _commit(self, batch):
+        results = []
+        with self.app.app_context():
+            session = self.db.session
+            try:
+                # 先取得写锁，避免事务中途由读锁升级为写锁时与其他进程冲突
+                session.execute(text('BEGIN IMMEDIATE'))
+                for args, future in batch:
+                    try:
+                        with session.begin_nested():
+                            results.append((future, self._write(*args), None))
+                    except Exception as exc:
+                        self.app.logger.exception('保存打卡失败：%r', args[:2])
+                        results.append((future, None, exc))
+                session.commit()
+            except Exception as exc:
+                session.rollback()
+                self.app.logger.exception('批量提交打卡失败（%d 条）', len(batch))
+                results = [(future, None, exc) for args, future in batch]
+            finally:
+                session.remove()
+        with self._lock:
+            self.pending -= len(batch)
+            self.batches += 1
+            self.largest_batch = max(self.largest_batch, len(batch))
+            for future, result, exc in results:
+                if exc is not None:
+                    self.failed += 1
+                elif getattr(result, 'status', None) == 'duplicate':
+                    self.duplicates += 1
+                else:
+                    self.completed += 1
+        for future, result, exc in results:
+            if exc is not None:
+                future.set_exception(exc)
+            else:
+                future.set_result(result)
+
+    def stats(self):
+        with self._lock:
+            return {'pending': self.pending, 'completed': self.completed,
+                    'duplicates': self.duplicates, 'failed': self.failed,
+                    'batches': self.batches, 'largest_batch': self.largest_batch}
+
+    def shutdown(self):
+        with self._lock:
+            thread = self._thread
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
@@ -0,0 +1,158 @@
+from collections import namedtuple
+from datetime import date
+
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+import department_rollup
+import period_summary
+import search_index
+import services
+from extensions import db
+from models import ArchivedRecord, CheckInRecord, UserCheckInStats, PeriodUserSummary, bump_generation, \
+    checkins_generation, load_period_infos
+from period_calendar import previous_required_day
+
+# 一次打卡的结果：created 新保存；replayed 同一表单重复提交（令牌相同，视为已成功）；
+# duplicate 当天已用其他表单打过卡。similar 为新打卡命中的近似重复条数
+CheckInResult = namedtuple('CheckInResult', 'status record_id similar')
+CREATED, REPLAYED, DUPLICATE = 'created', 'replayed', 'duplicate'
+
+
+# 保存一次打卡：插入记录、保存内容并更新统计和汇总，调用方负责提交事务。
+# 记录用 INSERT OR IGNORE 插入，同一用户同一天已有记录时不会抛出异常，也不会写入内容
+def save_checkin(user_pk, username, period, day, content, token=None):
+    record_id = db.session.execute(
+        sqlite_insert(CheckInRecord)
+        .values(user_id=username, user_pk=user_pk, date=day, file_path='', request_token=token)
+        .on_conflict_do_nothing()
+        .returning(CheckInRecord.id)
+    ).scalar()
+    if record_id is None:
+        existing = db.session.query(CheckInRecord.id, CheckInRecord.request_token) \
+            .filter_by(user_pk=user_pk, date=day).first()
+        if existing is not None and token and existing.request_token == token:
+            return CheckInResult(REPLAYED, existing.id, 0)
+        return CheckInResult(DUPLICATE, existing.id if existing else None, 0)
+    record = db.session.get(CheckInRecord, record_id)
+    # 按配置的后端保存打卡内容
+    services.content_storage.save(record, content)
+    search_index.index_content(db.session, record_id, content)
+    matches = services.duplicate_index.add(record_id, user_pk, period.id, content)
+    record_checkin_stats(user_pk, period, day)
+    refresh_period_summary(user_pk, period, day)
+    department_rollup.record_checkin(db.session, user_pk, day)
+    bump_generation('checkins', checkins_generation(period.id))
+    return CheckInResult(CREATED, record_id, len(matches))
+
+# 打卡成功后更新签到统计，调用方负责提交事务
+def record_checkin_stats(user_pk, period, day):
+    stats = db.session.get(UserCheckInStats, (user_pk, period.id))
+    if stats is None:
+        stats = UserCheckInStats(user_id=user_pk, period_id=period.id, count=0, current_streak=0)
+        db.session.add(stats)
+    if stats.last_checkin_date is not None and stats.last_checkin_date == previous_required_day(period, day):
+        stats.current_streak = stats.current_streak + 1
+    else:
+        stats.current_streak = 1
+    stats.count = (stats.count or 0) + 1
+    stats.last_checkin_date = day
+
+# 用户总签到次数：汇总各时间段的统计行
+def checkin_totals(user_pks):
+    rows = db.session.query(
+        UserCheckInStats.user_id,
+        func.sum(UserCheckInStats.count)
+    ).filter(UserCheckInStats.user_id.in_(user_pks)) \
+        .group_by(UserCheckInStats.user_id).all()
+    return {user_pk: total for user_pk, total in rows}
+
+# 根据全部打卡记录重建签到统计（首次部署或数据修复时使用）
+def rebuild_user_checkin_stats():
+    # 已归档（或正在归档）时间段的打卡记录不在本库中，保留其统计行
+    periods = [p for p in load_period_infos() if not p.archive_state]
+    UserCheckInStats.query.filter(UserCheckInStats.period_id.in_([p.id for p in periods])) \
+        .delete(synchronize_session=False)
+    stats = {}
+    rows = db.session.query(CheckInRecord.user_pk, CheckInRecord.date) \
+        .filter(CheckInRecord.user_pk.isnot(None)) \
+        .order_by(CheckInRecord.user_pk, CheckInRecord.date)
+    for user_pk, day in rows:
+        period = next((p for p in periods if p.start_date <= day <= p.end_date), None)
+        if period is None:
+            continue
+        item = stats.setdefault((user_pk, period.id), [0, 0, None])
+        if item[2] is not None and item[2] == previous_required_day(period, day):
+            item[1] += 1
+        else:
+            item[1] = 1
+        item[0] += 1
+        item[2] = day
+    for (user_pk, period_id), (count, streak, last_day) in stats.items():
+        db.session.add(UserCheckInStats(user_id=user_pk, period_id=period_id, count=count,
+                                        current_streak=streak, last_checkin_date=last_day))
+    bump_generation('checkins')
+    db.session.commit()
+    return len(stats)
+
+# 重新计算一个用户在某时间段的汇总行，调用方负责提交事务
+def refresh_period_summary(user_pk, period, today):
+    signed = [d for (d,) in db.session.query(CheckInRecord.date).filter(
+        CheckInRecord.user_pk == user_pk,
+        CheckInRecord.date >= period.start_date,
+        CheckInRecord.date <= period.end_date)]
+    values = period_summary.summarize(period, signed, today)
+    summary = db.session.get(PeriodUserSummary, (period.id, user_pk))
+    if summary is None:
+        summary = PeriodUserSummary(period_id=period.id, user_id=user_pk)
+        db.session.add(summary)
+    for key, value in values.items():
+        setattr(summary, key, value)
+
+# 整体重建某时间段的汇总表（时间段日期或休息日变化后调用）
+def rebuild_period_summary(period, today=None):
+    # 归档前已生成最终的汇总，归档后不再重建
+    if period.archive_state:
+        return 0
+    today = today or date.today()
+    PeriodUserSummary.query.filter_by(period_id=period.id).delete()
+    signed = {}
+    rows = db.session.query(CheckInRecord.user_pk, CheckInRecord.date) \
+        .filter(CheckInRecord.user_pk.isnot(None),
+                CheckInRecord.date >= period.start_date, CheckInRecord.date <= period.end_date)
+    for user_pk, day in rows:
+        signed.setdefault(user_pk, []).append(day)
+    if signed:
+        db.session.execute(db.insert(PeriodUserSummary), [
+            dict(period_id=period.id, user_id=user_pk, **period_summary.summarize(period, days, today))
+            for user_pk, days in signed.items()
+        ])
+    bump_generation(checkins_generation(period.id))
+    return len(signed)
+
+# 修改学号时同步打卡记录中冗余保存的学号，调用方负责提交事务
+def rename_user_records(user_pk, username):
+    CheckInRecord.query.filter_by(user_pk=user_pk).update({CheckInRecord.user_id: username})
+
+# 删除用户及其打卡记录、内容、统计和汇总，调用方负责提交事务；
+# 返回提交后需要删除的内容文件路径
+def delete_user_data(user):
+    records = CheckInRecord.query.filter_by(user_pk=user.id).all()
+    search_index.remove_records(db.session, records)
+    files = services.content_storage.delete(records)
+    services.duplicate_index.remove([r.id for r in records])
+    department_rollup.discount(db.session, [r.id for r in records])
+    CheckInRecord.query.filter_by(user_pk=user.id).delete(synchronize_session=False)
+    UserCheckInStats.query.filter_by(user_id=user.id).delete()
+    PeriodUserSummary.query.filter_by(user_id=user.id).delete()
+    # 已归档时间段的记录在归档库中，内容包只追加，删除归档行即可
+    ArchivedRecord.query.filter_by(user_pk=user.id).delete(synchronize_session=False)
+    db.session.delete(user)
+    bump_generation('users', 'checkins')
+    return files
+
+# 在请求线程内保存并提交一次打卡（未开启批量写入时使用）
+def commit_checkin(user_pk, username, period, day, content, token=None):
+    result = save_checkin(user_pk, username, period, day, content, token)
+    db.session.commit()
+    return result
@@ -0,0 +1,361 @@
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+import archive
+import db_bootstrap
+import department_rollup
+import maintenance
+import near_duplicates
+import roster_import
+import search_index
+import services
+from checkins import rebuild_user_checkin_stats, rebuild_period_summary
+from extensions import db
+from forms import DEPARTMENTS
+from models import User, CacheGeneration, CheckInRecord, CheckInContent, ContentFingerprint, bump_generation, \
+    load_period_infos
+
+# 命令行维护工具：flask --app app checkin <命令>
+checkin_cli = AppGroup('checkin', help='打卡网站维护命令')
+
+@checkin_cli.command('db-upgrade')
+def db_upgrade_command():
+    version = db_bootstrap.upgrade(db)
+    print(f'数据库当前版本：{version}')
+
+@checkin_cli.command('rebuild-stats')
+def rebuild_stats_command():
+    count = rebuild_user_checkin_stats()
+    print(f'已重建 {count} 条签到统计')
+
+@checkin_cli.command('rebuild-summary')
+@click.option('--period', 'period_id', type=int, default=None, help='只重建指定时间段')
+def rebuild_summary_command(period_id):
+    for period in load_period_infos():
+        if period_id is None or period.id == period_id:
+            count = rebuild_period_summary(period)
+            db.session.commit()
+            print(f'时间段 {period.name}：已重建 {count} 条汇总')
+
+# 递增全部数据代数：直接用 SQL 或旧脚本修改数据库后运行，所有工作进程的页面缓存和浏览器 ETag 随之失效
+@checkin_cli.command('clear-cache')
+def clear_cache_command():
+    names = {'users', 'periods', 'checkins'} | {name for (name,) in db.session.query(CacheGeneration.name)}
+    bump_generation(*sorted(names))
+    db.session.commit()
+    print(f'已使 {len(names)} 个数据代数失效')
+
+# 把旧的文本文件（或其他后端）中的打卡内容迁移到指定后端
+@checkin_cli.command('migrate-content')
+@click.option('--backend', default=None, help='目标后端，默认使用 CONTENT_BACKEND 配置')
+@click.option('--batch-size', default=500, show_default=True)
+@click.option('--delete-files', is_flag=True, help='迁移成功后删除原文本文件')
+def migrate_content_command(backend, batch_size, delete_files):
+    target = services.content_storage.backend(backend).name
+    migrated = failed = 0
+    last_id = 0
+    while True:
+        records = CheckInRecord.query.filter(CheckInRecord.id > last_id) \
+            .order_by(CheckInRecord.id).limit(batch_size).all()
+        if not records:
+            break
+        last_id = records[-1].id
+        rows = {r.record_id: r.backend for r in CheckInContent.query.filter(
+            CheckInContent.record_id.in_([r.id for r in records]))}
+        old_files = []
+        for record in records:
+            if rows.get(record.id) == target:
+                continue
+            old_path = record.file_path
+            try:
+                content = services.content_storage.load(record)
+            except Exception as e:
+                failed += 1
+                print(f'读取失败 id={record.id} {old_path}: {e}')
+                continue
+            services.content_storage.save(record, content, backend=target)
+            if rows.get(record.id, 'file') == 'file' and target != 'file':
+                old_files.append(old_path)
+            migrated += 1
+        db.session.commit()
+        if delete_files:
+            for path in old_files:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+    print(f'已迁移 {migrated} 条打卡内容到 {target}，失败 {failed} 条')
+
+# 学期初批量导入学生名单（CSV/TSV：学号,姓名,学院,QQ[,初始密码]）
+@checkin_cli.command('import-roster')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--password', 'default_password', default='', help='名单中没有密码列时使用的初始密码')
+@click.option('--workers', type=int, default=None, help='并行哈希进程数，默认 ROSTER_HASH_WORKERS')
+@click.option('--batch-size', type=int, default=None, help='每批插入行数，默认 ROSTER_BATCH_SIZE')
+@click.option('--dry-run', is_flag=True, help='只检查不导入')
+def import_roster_command(path, default_password, workers, batch_size, dry_run):
+    config = current_app.config
+    with open(path, 'rb') as f:
+        text = roster_import.decode(f.read())
+    result = roster_import.import_roster(
+        db, User, text,
+        default_password=default_password,
+        departments=DEPARTMENTS,
+        rounds=config['ROSTER_HASH_ROUNDS'],
+        workers=workers or config['ROSTER_HASH_WORKERS'],
+        batch_size=batch_size or config['ROSTER_BATCH_SIZE'],
+        dry_run=dry_run
+    )
+    if result.created:
+        department_rollup.assign_departments(db.session)
+        bump_generation('users')
+        db.session.commit()
+    for error in result.errors:
+        print(f'第 {error.line} 行 {error.username}：{error.message}')
+    if dry_run:
+        print(f'检查完成：{result.rows - len(result.errors)} 行可以导入')
+    print(f'共 {result.rows} 行，导入 {result.created} 行，错误 {len(result.errors)} 行，'
+          f'耗时 {result.seconds:.2f} 秒（{result.rows_per_second:.0f} 行/秒）')
+
+# 为已有打卡内容建立全文索引（已索引的记录跳过，中断后可重新运行）
+@checkin_cli.command('index-content')
+@click.option('--batch-size', default=500, show_default=True)
+def index_content_command(batch_size):
+    indexed = skipped = failed = 0
+    last_id = 0
+    while True:
+        records = CheckInRecord.query.filter(CheckInRecord.id > last_id) \
+            .order_by(CheckInRecord.id).limit(batch_size).all()
+        if not records:
+            break
+        last_id = records[-1].id
+        done = search_index.indexed_ids(db.session, [r.id for r in records])
+        items = []
+        for record in records:
+            if record.id in done:
+                skipped += 1
+                continue
+            try:
+                items.append((record.id, services.content_storage.load(record)))
+            except Exception as e:
+                failed += 1
+                print(f'读取失败 id={record.id} {record.file_path}: {e}')
+        search_index.index_many(db.session, items)
+        db.session.commit()
+        indexed += len(items)
+    search_index.optimize(db.session)
+    db.session.commit()
+    print(f'已索引 {indexed} 条打卡内容，跳过已索引 {skipped} 条，失败 {failed} 条')
+
+# 为已有打卡计算近似重复签名：签名在进程池中并行计算，按 id 顺序写入索引，
+# 每条记录只与更早的记录比较，结果与逐条打卡时一致；已处理的记录跳过
+@checkin_cli.command('fingerprint-content')
+@click.option('--workers', type=int, default=None, help='并行进程数，默认 CPU 核数')
+@click.option('--batch-size', default=1000, show_default=True)
+def fingerprint_content_command(workers, batch_size):
+    periods = load_period_infos()
+    processed = flagged = failed = 0
+    last_id = 0
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        while True:
+            records = CheckInRecord.query.filter(CheckInRecord.id > last_id) \
+                .order_by(CheckInRecord.id).limit(batch_size).all()
+            if not records:
+                break
+            last_id = records[-1].id
+            ids = [r.id for r in records]
+            done = {rid for (rid,) in db.session.query(ContentFingerprint.record_id).filter(
+                ContentFingerprint.record_id.in_(ids))}
+            # 一次取出本批的内容行，load() 时直接命中会话缓存
+            CheckInContent.query.filter(CheckInContent.record_id.in_(ids)).all()
+            todo, contents = [], []
+            for record in records:
+                if record.id in done or record.user_pk is None:
+                    continue
+                try:
+                    contents.append(services.content_storage.load(record))
+                except Exception as e:
+                    failed += 1
+                    print(f'读取失败 id={record.id} {record.file_path}: {e}')
+                    continue
+                todo.append(record)
+            signatures = pool.map(near_duplicates.pack_signature, contents, chunksize=32)
+            for record, packed in zip(todo, signatures):
+                period = next((p for p in periods if p.start_date <= record.date <= p.end_date), None)
+                matches = services.duplicate_index.add(record.id, record.user_pk, period.id if period else None,
+                                                       packed=packed)
+                flagged += bool(matches)
+            db.session.commit()
+            processed += len(todo)
+    print(f'已处理 {processed} 条打卡，其中 {flagged} 条疑似重复，读取失败 {failed} 条')
+
+# 根据全部打卡记录重建各学院每日打卡次数（升级到数据库版本 9 后运行一次）
+@checkin_cli.command('rebuild-rollup')
+def rebuild_rollup_command():
+    department_rollup.assign_departments(db.session)
+    count = department_rollup.rebuild(db.session)
+    bump_generation('checkins')
+    db.session.commit()
+    print(f'已重建 {count} 条学院每日统计')
+
+# 把已结束时间段的打卡记录和内容移到归档库（分批提交，中断后重新运行会继续）
+@checkin_cli.command('archive-period')
+@click.argument('period_ids', nargs=-1, type=int)
+@click.option('--closed-before', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='归档结束日期早于该日期的全部时间段')
+@click.option('--batch-size', type=int, default=None, help='每批处理的打卡数，默认 ARCHIVE_BATCH_SIZE')
+def archive_period_command(period_ids, closed_before, batch_size):
+    if closed_before:
+        period_ids += tuple(p.id for p in load_period_infos()
+                            if p.end_date < closed_before.date() and p.archive_state != archive.ARCHIVED)
+    if not period_ids:
+        raise click.UsageError('请给出时间段 id 或 --closed-before')
+    for period_id in period_ids:
+        try:
+            count = archive.archive_period(period_id, batch_size or current_app.config['ARCHIVE_BATCH_SIZE'])
+        except ValueError as e:
+            raise click.BadParameter(str(e))
+        print(f'时间段 {period_id}：共归档 {count} 条打卡')
+
+# 把归档的时间段恢复到本库
+@checkin_cli.command('restore-period')
+@click.argument('period_id', type=int)
+@click.option('--batch-size', type=int, default=None, help='每批处理的打卡数，默认 ARCHIVE_BATCH_SIZE')
+def restore_period_command(period_id, batch_size):
+    try:
+        count = archive.restore_period(period_id, batch_size or current_app.config['ARCHIVE_BATCH_SIZE'])
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    print(f'时间段 {period_id}：共恢复 {count} 条打卡，如需相似度检测请运行 fingerprint-content')
+
+# 生成带指纹的静态资源和预压缩版本（部署前运行，工作进程启动时只需校验哈希）
+@checkin_cli.command('build-static')
+@click.option('--force', is_flag=True, help='全部重新生成（例如修改了 STATIC_WEBP_QUALITY 之后）')
+def build_static_command(force):
+    manifest = services.static_assets.build(force=force)
+    for name, entry in manifest.items():
+        variants = '，'.join(f'{key} {variant["size"]}' for key, variant in entry['variants'].items())
+        print(f'{name} -> {entry["file"]}（{entry["size"]} 字节{"；" + variants if variants else ""}）')
+    print(f'已生成 {len(manifest)} 个静态资源，输出目录 {services.static_assets.output}')
+
+# ----------------通用数据维护（代替 LookFor.py、delete.py、changeDB.py）----------------
+
+def _table_and_conditions(table_name, conditions):
+    try:
+        table = maintenance.get_table(table_name)
+        return table, maintenance.parse_conditions(table, conditions)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+_where_option = click.option('--where', 'conditions', multiple=True,
+                             help='筛选条件，如 id=2、date>=2025-04-01，可重复给出（同时满足）')
+
+# 列出所有表及行数
+@checkin_cli.command('tables')
+def tables_command():
+    for name in maintenance.table_names():
+        table = maintenance.get_table(name)
+        print(f'{name}\t{maintenance.count_rows(table, [])}')
+
+# 流式导出一张表：按批从游标读取，大表也不会一次性载入内存
+@checkin_cli.command('dump')
+@click.argument('table_name')
+@_where_option
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'tsv', 'jsonl']), default='csv', show_default=True)
+@click.option('--output', type=click.Path(dir_okay=False, writable=True), default=None, help='输出文件，默认标准输出')
+@click.option('--batch-size', default=1000, show_default=True)
+def dump_command(table_name, conditions, fmt, output, batch_size):
+    table, clauses = _table_and_conditions(table_name, conditions)
+    if output is None:
+        maintenance.dump(table, clauses, click.get_text_stream('stdout'), fmt, batch_size)
+        return
+    with open(output, 'w', encoding='utf-8', newline='') as out:
+        count = maintenance.dump(table, clauses, out, fmt, batch_size)
+    print(f'已导出 {count} 行到 {output}')
+
+# 批量修改用户、时间段或休息日，如 update user --set is_admin=1 --where username=202111040001
+@checkin_cli.command('update')
+@click.argument('table_name')
+@click.option('--set', 'assignments', multiple=True, required=True, help='要修改的列，如 start_date=2025-04-16')
+@_where_option
+@click.option('--batch-size', default=500, show_default=True)
+@click.option('--dry-run', is_flag=True, help='只统计满足条件的行数')
+def update_command(table_name, assignments, conditions, batch_size, dry_run):
+    table, clauses = _table_and_conditions(table_name, conditions)
+    try:
+        values = maintenance.parse_assignments(table, assignments)
+        if dry_run:
+            print(f'满足条件的行：{maintenance.count_rows(table, clauses)}')
+            return
+        count = maintenance.update(table, clauses, values, batch_size)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    print(f'共修改 {count} 行')
+
+# 批量删除，打卡记录的内容文件、索引和统计同步处理，如 delete check_in_record --where id=2
+@checkin_cli.command('delete')
+@click.argument('table_name')
+@_where_option
+@click.option('--batch-size', default=500, show_default=True)
+@click.option('--dry-run', is_flag=True, help='只统计满足条件的行数')
+@click.option('--yes', is_flag=True, help='不再确认')
+def delete_command(table_name, conditions, batch_size, dry_run, yes):
+    table, clauses = _table_and_conditions(table_name, conditions)
+    count = maintenance.count_rows(table, clauses)
+    if dry_run or not count:
+        print(f'满足条件的行：{count}')
+        return
+    if not conditions and not yes:
+        click.confirm(f'没有给出 --where，将删除 {table_name} 的全部 {count} 行，确定吗？', abort=True)
+    elif not yes:
+        click.confirm(f'将删除 {table_name} 中的 {count} 行，确定吗？', abort=True)
+    try:
+        deleted = maintenance.delete(table, clauses, batch_size)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    print(f'共删除 {deleted} 行')
+
+# 在线热备份：网站运行期间也可以执行，适合放在 cron 中定时运行
+@checkin_cli.command('backup')
+@click.argument('dest', required=False, type=click.Path(dir_okay=False))
+@click.option('--dir', 'directory', type=click.Path(file_okay=False), default=None,
+              help='备份目录，文件名自动加上时间')
+@click.option('--keep', type=int, default=0, help='配合 --dir，只保留最近 N 个备份')
+@click.option('--pages', type=int, default=1024, show_default=True, help='非 WAL 模式下每步复制的页数')
+@click.option('--sleep', type=float, default=0.05, show_default=True, help='非 WAL 模式下每步之间等待的秒数')
+@click.option('--no-verify', is_flag=True, help='不对备份执行 quick_check')
+def backup_command(dest, directory, keep, pages, sleep, no_verify):
+    if bool(dest) == bool(directory):
+        raise click.UsageError('请给出备份文件路径或 --dir 其中之一')
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    now = datetime.now()
+    # 主库之外的数据库（如归档库）一并备份：给出路径时保存为 <路径>-<bind 名>.db，--dir 时使用各自的数据库名
+    for bind_key in maintenance.backup_binds():
+        if directory:
+            target = maintenance.backup_name(directory, now, bind_key)
+        elif bind_key is None:
+            target = dest
+        else:
+            stem, ext = os.path.splitext(dest)
+            target = f'{stem}-{bind_key}{ext or ".db"}'
+        size, seconds = maintenance.backup(target, pages=pages, sleep=sleep, verify=not no_verify, bind_key=bind_key)
+        print(f'已备份到 {target}（{size / 1024 / 1024:.1f} MB，{seconds:.1f} 秒）')
+        if directory and keep:
+            for path in maintenance.prune_backups(directory, keep, bind_key):
+                print(f'已删除旧备份 {path}')
+
+# 例行优化：PRAGMA optimize（或完整 ANALYZE）、合并全文索引、空闲页较多时 VACUUM
+@checkin_cli.command('optimize')
+@click.option('--analyze', is_flag=True, help='执行完整 ANALYZE 而不是 PRAGMA optimize')
+@click.option('--vacuum', is_flag=True, help='无论空闲页多少都执行 VACUUM')
+@click.option('--vacuum-threshold', type=float, default=0.25, show_default=True,
+              help='空闲页占比达到该值时执行 VACUUM，0 为不自动执行')
+def optimize_command(analyze, vacuum, vacuum_threshold):
+    maintenance.optimize(analyze=analyze, vacuum=vacuum, vacuum_threshold=vacuum_threshold)
@@ -0,0 +1,69 @@
+import os
+
+import db_bootstrap
+
+
+# 默认配置；部署时可用 CHECKIN_ 前缀的环境变量覆盖任意一项，例如 CHECKIN_CONTENT_BACKEND=segment
+class Config:
+    SECRET_KEY = 'Lxr0901'
+    UPLOAD_FOLDER = 'uploads'
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///users.db'
+    # 归档库：已结束时间段的打卡记录归档后移到这里（相对路径与 users.db 一样位于 instance 目录）
+    SQLALCHEMY_BINDS = {'archive': 'sqlite:///archive.db'}
+    ARCHIVE_FOLDER = 'archive'  # 归档内容包目录（相对路径位于应用目录下）
+    ARCHIVE_BATCH_SIZE = 1000  # 归档和恢复时每批处理的打卡数（每批一个压缩块、一次提交）
+    MAX_CONTENT_LENGTH = 4 * 1024 * 1024  # 最大上传文件限制 4MB
+    SQLITE_PRAGMAS = db_bootstrap.DEFAULT_PRAGMAS  # 每个数据库连接建立时设置的 PRAGMA
+    SQLITE_OPTIMIZE_INTERVAL = 3600  # 每个进程每隔多少秒在归还连接时执行一次 PRAGMA optimize，0 为不执行
+    # 打卡内容存储后端：file（每次打卡一个文本文件）、db（存入数据库）、segment（只追加段文件）
+    CONTENT_BACKEND = 'db'
+    CONTENT_COMPRESS = False  # db/segment 后端是否使用 zlib 压缩
+    CALENDAR_CHECK_INTERVAL = 1.0  # 打卡日历检查数据库代数的最小间隔（秒）
+    BCRYPT_LOG_ROUNDS = 12  # bcrypt cost，修改后用户下次登录时自动按新 cost 重新哈希
+    PASSWORD_HASH_WORKERS = min(4, os.cpu_count() or 1)  # bcrypt 进程池大小，0 表示在请求线程内计算
+    PASSWORD_HASH_QUEUE = 32  # 同时排队的哈希任务上限，超出时直接返回“繁忙”
+    # 名单导入：初始密码使用较低的 cost 以加快导入，学生首次登录时会按 BCRYPT_LOG_ROUNDS 重新哈希
+    ROSTER_HASH_ROUNDS = 10
+    ROSTER_HASH_WORKERS = os.cpu_count() or 1  # 命令行导入时并行哈希的进程数（管理后台导入使用 bcrypt 进程池）
+    ROSTER_BATCH_SIZE = 500  # 每批插入的行数
+    USER_CACHE_SIZE = 4096  # 登录用户快照缓存的最大条数
+    USER_CACHE_CHECK_INTERVAL = 1.0  # 用户缓存检查数据库代数的最小间隔（秒），其他进程的修改最多延迟这么久生效
+    # 批量写入：并发的打卡交给单个写线程合并成一批、一个事务提交（每批只取一次写锁）；
+    # 关闭后在请求线程内逐条提交
+    CHECKIN_GROUP_COMMIT = True
+    CHECKIN_BATCH_SIZE = 64  # 每批最多合并的打卡数
+    CHECKIN_BATCH_WAIT = 0.0  # 凑批的最长等待时间（秒），0 表示只合并已在排队的打卡
+    CHECKIN_WRITE_TIMEOUT = 10.0  # 请求等待写入结果的最长时间（秒）
+    # 异步打卡：提交给写线程后不等待结果，请求立即返回
+    CHECKIN_ASYNC_WRITES = False
+    # 管理页面缓存：按数据代数生成 ETag 并缓存渲染结果和导出文件（每个工作进程一份），0 表示关闭
+    RESPONSE_CACHE_BYTES = 32 * 1024 * 1024
+    RESPONSE_CACHE_MAX_ENTRY = 4 * 1024 * 1024  # 超过该大小的页面或导出不缓存
+    # 准入控制（每个工作进程）：登录/注册提交、打卡、管理后台报表三类请求各自限制并发和排队数，
+    # 合计不超过 ADMISSION_MAX_ACTIVE，其中 ADMISSION_ADMIN_RESERVE 个名额只留给管理后台；
+    # 排队已满或等待超过 ADMISSION_QUEUE_TIMEOUT 秒返回 503。处理中和排队的请求都占用一个 gunicorn 线程，
+    # 学生请求最多占用 (ADMISSION_MAX_ACTIVE - ADMISSION_ADMIN_RESERVE) + 两类排队数个线程，应小于 GUNICORN_THREADS
+    ADMISSION_CONTROL = True
+    ADMISSION_MAX_ACTIVE = 8
+    ADMISSION_ADMIN_RESERVE = 2
+    ADMISSION_CLASSES = {'auth': (4, 3), 'checkin': (6, 5), 'admin': (4, 4)}  # 类别: (并发上限, 排队上限)
+    ADMISSION_QUEUE_TIMEOUT = 3.0
+    ADMISSION_RETRY_AFTER = 5  # 503 响应的 Retry-After（秒）
+    # 按学号的令牌桶限速，超出返回 429：每分钟补充的次数和最多连续的次数
+    LOGIN_RATE_PER_MINUTE = 6
+    LOGIN_RATE_BURST = 5
+    CHECKIN_RATE_PER_MINUTE = 6
+    CHECKIN_RATE_BURST = 3
+    RATE_LIMIT_KEYS = 10000  # 每个限速器最多记录的学号数
+    # 静态资源：启动时按内容哈希生成带指纹的文件名和预压缩版本，url_for('static', ...) 自动使用指纹地址；
+    # 调试 CSS 时可关闭，改为每次请求都重新验证的原始地址
+    STATIC_FINGERPRINT = True
+    STATIC_BUILD_FOLDER = 'static-build'  # 相对应用目录；指纹文件、.gz/.br/.webp 版本和 manifest.json 的输出目录
+    STATIC_MAX_AGE = 365 * 24 * 3600  # 指纹地址的缓存时间（秒），响应同时带 immutable
+    STATIC_WEBP_QUALITY = 80  # 安装 Pillow 后为 JPEG/PNG 生成 WebP 版本的质量，0 表示不生成
+    # 近似重复检测：MinHash 估计的相似度（0~1）不低于阈值时标记为疑似抄袭/重复
+    DUPLICATE_THRESHOLD = 0.6
+    # 性能监控：/admin/metrics 始终可用；慢请求日志和采样分析默认关闭
+    SLOW_REQUEST_SECONDS = None  # 设为秒数后，超过阈值的请求连同最慢的 SQL 写入日志
+    PROFILE_REQUESTS = False  # 开启后管理员请求带上 X-Checkin-Profile: 1 头会返回采样分析结果
+    PROFILE_INTERVAL = 0.005  # 采样间隔（秒）
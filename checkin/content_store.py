@@ -0,0 +1,262 @@
+import os
+import threading
+import time
+import zlib
+
+from sqlalchemy import event
+
+try:
+    import fcntl
+except ImportError:  # Windows 下没有 fcntl，仅依赖进程内锁
+    fcntl = None
+
+PREVIEW_LENGTH = 100
+
+
+def encode(content, compress):
+    data = content.encode('utf-8')
+    if compress:
+        return zlib.compress(data), 'zlib'
+    return data, 'plain'
+
+
+def decode(data, codec):
+    if codec == 'zlib':
+        data = zlib.decompress(data)
+    return data.decode('utf-8')
+
+
+# 随事务生效的文件写入：内容先写入临时文件，最外层事务提交后才改名为正式文件名；
+# 所在的事务或 SAVEPOINT 回滚（或会话未提交就关闭）时删除临时文件，回滚的打卡不会留下孤立的文本文件
+class PendingFiles:
+    KEY = 'pending_files'
+
+    # 监听器挂在全局的 scoped_session 上，多次创建应用（测试、命令行）时只注册一次
+    def __init__(self, session):
+        self.session = session
+        for name, listener in (('after_commit', _after_commit), ('after_soft_rollback', _after_rollback),
+                               ('after_transaction_end', _after_end)):
+            if not event.contains(session, name, listener):
+                event.listen(session, name, listener)
+
+    def add(self, tmp, path):
+        session = self.session()
+        transaction = session.get_nested_transaction() or session.get_transaction()
+        session.info.setdefault(self.KEY, []).append((transaction, tmp, path))
+
+
+def _discard(paths):
+    for _, tmp, _ in paths:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+
+# SAVEPOINT 提交时也会触发，只在最外层事务提交后改名
+def _after_commit(session):
+    if session.in_nested_transaction():
+        return
+    for _, tmp, path in session.info.pop(PendingFiles.KEY, []):
+        os.replace(tmp, path)
+
+
+def _after_rollback(session, transaction):
+    pending = session.info.get(PendingFiles.KEY)
+    if not pending:
+        return
+    kept, dropped = [], []
+    for item in pending:
+        outer = item[0]
+        while outer is not None and outer is not transaction:
+            outer = outer.parent
+        (dropped if outer is transaction else kept).append(item)
+    session.info[PendingFiles.KEY] = kept
+    _discard(dropped)
+
+
+def _after_end(session, transaction):
+    if transaction.parent is None:
+        _discard(session.info.pop(PendingFiles.KEY, []))
+
+
+# 每次打卡一个文本文件：uploads/<学号>/<日期>/<学号>_<日期>.txt（旧的存储方式）。
+# 给出 session 时文件随该会话的事务生效（见 PendingFiles），否则立即写入
+class FileBackend:
+    name = 'file'
+
+    def __init__(self, upload_folder, session=None):
+        self.upload_folder = upload_folder
+        self.pending = PendingFiles(session) if session is not None else None
+
+    def save(self, record, row, content):
+        save_dir = os.path.join(self.upload_folder, record.user_id, str(record.date))
+        os.makedirs(save_dir, exist_ok=True)
+        file_path = os.path.join(save_dir, f"{record.user_id}_{record.date}.txt")
+        target = file_path if self.pending is None else f'{file_path}.{os.getpid()}.tmp'
+        with open(target, 'w', encoding='utf-8') as f:
+            f.write(content)
+        if self.pending is not None:
+            self.pending.add(target, file_path)
+        record.file_path = file_path
+
+    def load(self, record, row):
+        with open(record.file_path, encoding='utf-8') as f:
+            return f.read()
+
+
+# 内容直接存入数据库 check_in_content 表，可选 zlib 压缩
+class DatabaseBackend:
+    name = 'db'
+
+    def __init__(self, compress=False):
+        self.compress = compress
+
+    def save(self, record, row, content):
+        row.data, row.codec = encode(content, self.compress)
+        record.file_path = self.name
+
+    def load(self, record, row):
+        return decode(row.data, row.codec)
+
+
+# 只追加的段文件：内容顺序写入 segments/segment-NNNNNN.dat，check_in_content 表记录偏移量
+class SegmentBackend:
+    name = 'segment'
+
+    def __init__(self, upload_folder, compress=False, max_bytes=64 * 1024 * 1024):
+        self.directory = os.path.join(upload_folder, 'segments')
+        self.compress = compress
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _current_segment(self):
+        names = sorted(n for n in os.listdir(self.directory) if n.startswith('segment-'))
+        if not names:
+            return 'segment-000001.dat'
+        name = names[-1]
+        if os.path.getsize(os.path.join(self.directory, name)) >= self.max_bytes:
+            return 'segment-%06d.dat' % (int(name[8:14]) + 1)
+        return name
+
+    def save(self, record, row, content):
+        data, row.codec = encode(content, self.compress)
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            segment = self._current_segment()
+            with open(os.path.join(self.directory, segment), 'ab') as f:
+                # 多个工作进程同时追加时用文件锁保证偏移量正确
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    f.seek(0, os.SEEK_END)
+                    row.offset = f.tell()
+                    f.write(data)
+                    f.flush()
+                finally:
+                    if fcntl:
+                        fcntl.flock(f, fcntl.LOCK_UN)
+        row.segment = segment
+        row.length = len(data)
+        record.file_path = f'{self.name}:{segment}'
+
+    def load(self, record, row):
+        with open(os.path.join(self.directory, row.segment), 'rb') as f:
+            f.seek(row.offset)
+            return decode(f.read(row.length), row.codec)
+
+
+class ContentStorage:
+    """打卡内容存储入口。
+
+    所有后端都会在 check_in_content 表中保存前 100 字的预览；
+    没有对应行的旧记录回退到读取 file_path 指向的文本文件。
+    observer(seconds, backend, op) 用于统计各后端的读写耗时。
+    """
+
+    def __init__(self, db, model, backends, default, observer=None):
+        self.db = db
+        self.model = model
+        self.backends = {b.name: b for b in backends}
+        self.default = default
+        self.observer = observer
+
+    def _observe(self, begin, backend, op):
+        if self.observer is not None:
+            self.observer(time.perf_counter() - begin, backend, op)
+
+    def backend(self, name=None):
+        return self.backends[name or self.default]
+
+    # record 需已 flush 获得 id；调用方负责提交事务
+    def save(self, record, content, backend=None):
+        backend = self.backend(backend)
+        row = self.db.session.get(self.model, record.id)
+        if row is None:
+            row = self.model(record_id=record.id)
+            self.db.session.add(row)
+        row.backend = backend.name
+        row.preview = content[:PREVIEW_LENGTH]
+        row.data = row.segment = row.offset = row.length = None
+        row.codec = 'plain'
+        begin = time.perf_counter()
+        backend.save(record, row, content)
+        self._observe(begin, backend.name, 'save')
+        return row
+
+    def load(self, record):
+        row = self.db.session.get(self.model, record.id)
+        backend = self.backends['file'] if row is None else self.backend(row.backend)
+        begin = time.perf_counter()
+        content = backend.load(record, row)
+        self._observe(begin, backend.name, 'load')
+        return content
+
+    # 批量读取完整内容：一次查询取出本批的内容行，load() 时直接命中会话缓存；
+    # 返回 {记录 id: 内容}，读取失败的记录不在其中
+    def load_many(self, records):
+        ids = [r.id for r in records]
+        if ids:
+            self.db.session.query(self.model).filter(self.model.record_id.in_(ids)).all()
+        contents = {}
+        for record in records:
+            try:
+                contents[record.id] = self.load(record)
+            except Exception:
+                continue
+        return contents
+
+    # 批量读取预览：一次查询，缺失的旧记录才读文件。
+    # cache=True 时把读到的预览写回 check_in_content（backend 仍为 file），下次不再读文件；调用方负责提交事务
+    def previews(self, records, cache=False):
+        ids = [r.id for r in records]
+        rows = self.db.session.query(self.model.record_id, self.model.preview) \
+            .filter(self.model.record_id.in_(ids)).all() if ids else []
+        previews = dict(rows)
+        for record in records:
+            if record.id not in previews:
+                begin = time.perf_counter()
+                try:
+                    with open(record.file_path, encoding='utf-8') as f:
+                        previews[record.id] = f.read(PREVIEW_LENGTH)
+                except Exception:
+                    previews[record.id] = '[读取失败]'
+                    continue
+                finally:
+                    self._observe(begin, 'file', 'preview')
+                if cache:
+                    self.db.session.add(self.model(record_id=record.id, backend='file', codec='plain',
+                                                   preview=previews[record.id]))
+        return previews
+
+    # 删除记录的内容行，调用方负责提交事务；返回提交后需要删除的文本文件路径。
+    # 段文件只追加，其中的数据删除后不再被引用
+    def delete(self, records):
+        ids = [r.id for r in records]
+        if not ids:
+            return []
+        backends = dict(self.db.session.query(self.model.record_id, self.model.backend)
+                        .filter(self.model.record_id.in_(ids)).all())
+        self.db.session.query(self.model).filter(self.model.record_id.in_(ids)) \
+            .delete(synchronize_session=False)
+        return [r.file_path for r in records if backends.get(r.id, 'file') == 'file' and r.file_path]
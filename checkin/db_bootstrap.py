@@ -0,0 +1,242 @@
+import os
+import threading
+import time
+from datetime import date
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+
+# 生产环境 SQLite 参数：WAL 允许读写并发，NORMAL 在 WAL 下仍可保证崩溃一致性
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,  # 毫秒，写锁被占用时等待而不是立即报错
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -20000,  # 负数表示 KiB，约 20MB 页缓存
+    'foreign_keys': 'ON',
+}
+
+
+def apply_pragmas(dbapi_connection, pragmas):
+    cursor = dbapi_connection.cursor()
+    for key, value in pragmas.items():
+        cursor.execute(f'PRAGMA {key}={value}')
+    cursor.close()
+
+
+def configure_sqlite(engine, pragmas=None):
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = DEFAULT_PRAGMAS if pragmas is None else pragmas
+
+    @event.listens_for(engine, 'connect')
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        apply_pragmas(dbapi_connection, pragmas)
+
+
+# 长期运行的进程定期执行 PRAGMA optimize（SQLite 的建议）：只对本连接查询过、统计信息缺失或已过时的表
+# 执行 ANALYZE，通常立即返回。在连接归还连接池时检查，每个引擎每隔 interval 秒最多执行一次；
+# 完整 ANALYZE 和 VACUUM 仍由 optimize 命令执行
+def schedule_optimize(engine, interval):
+    if engine.dialect.name != 'sqlite' or not interval:
+        return
+    lock = threading.Lock()
+    due = [time.monotonic() + interval]
+
+    @event.listens_for(engine, 'checkin')
+    def _optimize_on_checkin(dbapi_connection, connection_record):
+        if dbapi_connection is None:
+            return
+        now = time.monotonic()
+        with lock:
+            if now < due[0]:
+                return
+            due[0] = now + interval
+        try:
+            cursor = dbapi_connection.cursor()
+            cursor.execute('PRAGMA optimize')
+            cursor.close()
+        except Exception:
+            # 写锁被长时间占用等情况下跳过本次，下个间隔再试，不影响连接归还
+            pass
+
+
+# 相对路径的 SQLite 地址按 directory（应用的 instance 目录）解析为绝对路径，不受启动时的工作目录影响
+def absolute_sqlite_uri(uri, directory):
+    if not isinstance(uri, str):
+        return uri
+    url = make_url(uri)
+    database = url.database
+    if url.get_backend_name() != 'sqlite' or not database or database == ':memory:' \
+            or database.startswith('file:') or os.path.isabs(database):
+        return uri
+    return url.set(database=os.path.join(directory, database)).render_as_string(hide_password=False)
+
+
+# ----------------版本化数据库迁移----------------
+# 当前版本记录在 PRAGMA user_version 中；新增迁移时在 MIGRATIONS 末尾追加
+
+def column_exists(conn, table, column):
+    rows = conn.execute(text(f'PRAGMA table_info("{table}")')).fetchall()
+    return any(row[1] == column for row in rows)
+
+
+def add_column(conn, table, column, ddl):
+    if not column_exists(conn, table, column):
+        conn.execute(text(f'ALTER TABLE "{table}" ADD COLUMN {column} {ddl}'))
+
+
+def _create_missing_tables(db, conn):
+    db.metadata.create_all(conn)
+
+
+# 新增表的迁移：只创建指定的表（已存在则跳过）
+def create_tables(*names):
+    def migrate(db, conn):
+        db.metadata.create_all(conn, tables=[db.metadata.tables[name] for name in names])
+    return migrate
+
+
+def _add_lookup_indexes(db, conn):
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_check_in_record_date ON check_in_record (date)'))
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_sign_in_exception_period_date '
+                      'ON sign_in_exception (period_id, exception_date)'))
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_sign_period_dates ON sign_period (start_date, end_date)'))
+
+
+def _drop_stray_sign_period_table(db, conn):
+    # 早期版本误建的空表 "SignPeriod"（实际使用 sign_period）
+    exists = conn.execute(text("SELECT 1 FROM sqlite_master WHERE type='table' AND name='SignPeriod'")).first()
+    if exists and conn.execute(text('SELECT COUNT(*) FROM "SignPeriod"')).scalar() == 0:
+        conn.execute(text('DROP TABLE "SignPeriod"'))
+
+
+BACKFILL_BATCH_SIZE = 2000
+
+
+# 打卡记录改为用整数外键关联用户：先加列，再按 id 区间分批回填并逐批提交，
+# 避免长时间持有写锁，中断后重新运行会从未回填的行继续；最后建索引
+def _add_check_in_record_user_pk(db, conn):
+    add_column(conn, 'check_in_record', 'user_pk', 'INTEGER REFERENCES user (id) ON DELETE CASCADE')
+    conn.commit()
+    max_id = conn.execute(text('SELECT MAX(id) FROM check_in_record')).scalar() or 0
+    for start in range(0, max_id, BACKFILL_BATCH_SIZE):
+        conn.execute(text(
+            'UPDATE check_in_record SET user_pk = '
+            '(SELECT user.id FROM user WHERE user.username = check_in_record.user_id) '
+            'WHERE user_pk IS NULL AND id > :start AND id <= :stop'
+        ), {'start': start, 'stop': start + BACKFILL_BATCH_SIZE})
+        conn.commit()
+    conn.execute(text('CREATE UNIQUE INDEX IF NOT EXISTS ix_check_in_record_user_pk_date '
+                      'ON check_in_record (user_pk, date)'))
+
+
+def _create_search_index(db, conn):
+    import search_index
+    conn.execute(text(search_index.CREATE_TABLE))
+
+
+def _add_check_in_request_token(db, conn):
+    add_column(conn, 'check_in_record', 'request_token', 'VARCHAR(32)')
+
+
+# 学院字典表：先写入注册表单中的学院，再补上已有用户中出现的其他名称，然后回填 user.department_id
+def _add_departments(db, conn):
+    import department_rollup
+    create_tables('department', 'department_daily_count')(db, conn)
+    add_column(conn, 'user', 'department_id', 'INTEGER REFERENCES department (id)')
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_user_department_id ON user (department_id)'))
+    department_rollup.seed_departments(conn)
+
+
+# 汇总表新增打卡位图，按已有打卡记录回填（每个时间段一次查询）
+def _add_summary_signed_bits(db, conn):
+    import calendar_bits
+    from period_calendar import PeriodInfo
+    add_column(conn, 'period_user_summary', 'signed_bits', 'BLOB')
+    periods = conn.execute(text('SELECT id, start_date, end_date FROM sign_period')).fetchall()
+    for period_id, start, end in periods:
+        period = PeriodInfo(period_id, None, date.fromisoformat(start), date.fromisoformat(end), frozenset())
+        signed = {}
+        rows = conn.execute(text('SELECT user_pk, date FROM check_in_record '
+                                 'WHERE user_pk IS NOT NULL AND date BETWEEN :start AND :end'),
+                            {'start': start, 'end': end})
+        for user_pk, day in rows:
+            signed.setdefault(user_pk, []).append(date.fromisoformat(day))
+        if signed:
+            conn.execute(text('UPDATE period_user_summary SET signed_bits = :bits '
+                              'WHERE period_id = :period_id AND user_id = :user_id'),
+                         [{'bits': calendar_bits.to_bytes(period, calendar_bits.encode(period, days)),
+                           'period_id': period_id, 'user_id': user_pk} for user_pk, days in signed.items()])
+
+
+# 时间段新增归档状态，并在归档库中建表
+def _add_archive(db, conn):
+    add_column(conn, 'sign_period', 'archive_state', 'VARCHAR(16)')
+    db.create_all(bind_key='archive')
+
+
+# 全文索引改为无内容表，不再保存第二份原文：旧表中的原文直接复制到新表，不需要重新读取内容
+def _contentless_search_index(db, conn):
+    import search_index
+    table = search_index.TABLE
+    sql = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                       {'name': table}).scalar()
+    if sql is not None and "content=''" in sql:
+        return
+    if sql is not None:
+        conn.execute(text(f'ALTER TABLE {table} RENAME TO {table}_old'))
+    conn.execute(text(search_index.CREATE_TABLE))
+    if sql is not None:
+        conn.execute(text(f'INSERT INTO {table} (rowid, content) SELECT rowid, content FROM {table}_old'))
+        conn.execute(text(f'DROP TABLE {table}_old'))
+    conn.execute(text(f"INSERT INTO {table} ({table}) VALUES ('optimize')"))
+
+
+MIGRATIONS = [
+    (1, '创建缺失的数据表', _create_missing_tables),
+    (2, '为打卡记录、休息日和时间段添加查询索引', _add_lookup_indexes),
+    (3, '删除遗留的空表 SignPeriod', _drop_stray_sign_period_table),
+    (4, '新增时间段完成情况汇总表 period_user_summary（升级后运行 rebuild-summary）',
+     create_tables('period_user_summary')),
+    (5, '打卡记录新增整数外键 user_pk 并分批回填', _add_check_in_record_user_pk),
+    (6, '新增打卡内容全文索引 check_in_fts（升级后运行 index-content 索引已有内容）', _create_search_index),
+    (7, '新增近似重复检测表（升级后运行 fingerprint-content 处理已有内容）',
+     create_tables('content_fingerprint', 'lsh_bucket', 'duplicate_flag')),
+    (8, '打卡记录新增幂等令牌 request_token', _add_check_in_request_token),
+    (9, '新增学院字典表和各学院每日打卡统计（升级后运行 rebuild-rollup）', _add_departments),
+    (10, '时间段汇总表新增打卡日期位图 signed_bits', _add_summary_signed_bits),
+    (11, '时间段新增归档状态，创建归档库', _add_archive),
+    (12, '全文索引 check_in_fts 改为无内容表，不再重复保存打卡内容', _contentless_search_index),
+]
+
+
+def schema_version(conn):
+    return conn.execute(text('PRAGMA user_version')).scalar()
+
+
+def upgrade(db, log=print):
+    """把数据库升级到最新版本，每个迁移在独立事务中执行（迁移内部也可以分批提交）。
+    返回升级后的版本号。"""
+    with db.engine.connect() as conn:
+        version = schema_version(conn)
+    applied = False
+    for number, description, migrate in MIGRATIONS:
+        if number <= version:
+            continue
+        with db.engine.connect() as conn:
+            migrate(db, conn)
+            conn.execute(text(f'PRAGMA user_version={number}'))
+            conn.commit()
+        log(f'数据库已升级到版本 {number}：{description}')
+        version = number
+        applied = True
+    # 新建的索引和回填的列还没有统计信息，查询规划器可能不用新索引；升级后统一收集一次。
+    # analysis_limit 让大表只抽样检查，ANALYZE 不会长时间持有写锁
+    if applied:
+        with db.engine.connect() as conn:
+            conn.execute(text('PRAGMA analysis_limit=1000'))
+            conn.execute(text('ANALYZE'))
+            conn.commit()
+        log('已更新查询规划器统计信息（ANALYZE）')
+    return version
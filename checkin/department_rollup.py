@@ -0,0 +1,131 @@
+from collections import namedtuple
+
+from sqlalchemy import func, insert, literal, not_, select, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+import period_summary
+from models import CheckInRecord, Department, DepartmentDailyCount, SignPeriod, User
+
+# 学院参与率：department_daily_count 保存每个学院每天的打卡次数（按用户当前所在学院统计），
+# 查询任意时间范围只需读取“学院数 × 天数”行，与打卡记录总量无关
+DepartmentRate = namedtuple('DepartmentRate', 'id name students checkins expected rate')
+
+
+# 写入注册表单中的学院以及已有用户中出现的其他名称（conn 可以是连接或会话）
+def seed_departments(conn):
+    from forms import DEPARTMENTS
+    conn.execute(text('INSERT OR IGNORE INTO department (name) VALUES (:name)'), [{'name': n} for n in DEPARTMENTS])
+    assign_departments(conn)
+
+
+# 为还没有 department_id 的用户按学院名称补齐（名单导入、模拟数据等直接插入的行）
+def assign_departments(conn):
+    conn.execute(text('INSERT OR IGNORE INTO department (name) '
+                      'SELECT DISTINCT "Departments" FROM user WHERE department_id IS NULL'))
+    conn.execute(text('UPDATE user SET department_id = '
+                      '(SELECT id FROM department WHERE name = user."Departments") WHERE department_id IS NULL'))
+
+
+# 按名称取学院 id，不存在时新建
+def department_id(session, name):
+    value = session.execute(select(Department.id).where(Department.name == name)).scalar()
+    if value is None:
+        session.execute(text('INSERT OR IGNORE INTO department (name) VALUES (:name)'), {'name': name})
+        value = session.execute(select(Department.id).where(Department.name == name)).scalar()
+    return value
+
+
+def _increment(rows):
+    return sqlite_insert(DepartmentDailyCount).values(rows).on_conflict_do_update(
+        index_elements=['department_id', 'date'], set_={'count': DepartmentDailyCount.count + 1})
+
+
+# 打卡时累加用户所在学院当天的次数，调用方负责提交事务
+def record_checkin(session, user_pk, day):
+    session.execute(
+        sqlite_insert(DepartmentDailyCount)
+        .from_select(['department_id', 'date', 'count'],
+                     select(User.department_id, literal(day), literal(1))
+                     .where(User.id == user_pk, User.department_id.isnot(None)))
+        .on_conflict_do_update(index_elements=['department_id', 'date'],
+                               set_={'count': DepartmentDailyCount.count + 1})
+    )
+
+
+# 删除打卡记录之前调用：按学院和日期扣减这些记录的次数
+def discount(session, record_ids):
+    if not record_ids:
+        return
+    rows = session.query(User.department_id, CheckInRecord.date, func.count()) \
+        .join(User, User.id == CheckInRecord.user_pk) \
+        .filter(CheckInRecord.id.in_(record_ids), User.department_id.isnot(None)) \
+        .group_by(User.department_id, CheckInRecord.date).all()
+    for department, day, count in rows:
+        session.query(DepartmentDailyCount) \
+            .filter_by(department_id=department, date=day) \
+            .update({DepartmentDailyCount.count: DepartmentDailyCount.count - count}, synchronize_session=False)
+
+
+# 用户更换学院时把其全部打卡次数从原学院移到新学院（每人每天最多一条打卡）
+def move_user(session, user_pk, old_id, new_id):
+    if old_id == new_id:
+        return
+    days = [d for (d,) in session.query(CheckInRecord.date).filter_by(user_pk=user_pk)]
+    if not days:
+        return
+    if old_id is not None:
+        session.query(DepartmentDailyCount) \
+            .filter(DepartmentDailyCount.department_id == old_id, DepartmentDailyCount.date.in_(days)) \
+            .update({DepartmentDailyCount.count: DepartmentDailyCount.count - 1}, synchronize_session=False)
+    if new_id is not None:
+        session.execute(_increment([dict(department_id=new_id, date=d, count=1) for d in days]))
+
+
+# 根据全部打卡记录重建统计表（升级或数据修复后运行），返回写入的行数；
+# 已归档时间段内的日期保留原有统计（这些打卡记录已不在本库中）
+def rebuild(session):
+    archived = session.query(SignPeriod.start_date, SignPeriod.end_date) \
+        .filter(SignPeriod.archive_state.isnot(None)).all()
+
+    def live(column):
+        return [not_(column.between(start, end)) for start, end in archived]
+
+    session.query(DepartmentDailyCount).filter(*live(DepartmentDailyCount.date)).delete(synchronize_session=False)
+    rows = select(User.department_id, CheckInRecord.date, func.count()) \
+        .join(User, User.id == CheckInRecord.user_pk) \
+        .where(User.department_id.isnot(None), *live(CheckInRecord.date)) \
+        .group_by(User.department_id, CheckInRecord.date)
+    result = session.execute(insert(DepartmentDailyCount).from_select(['department_id', 'date', 'count'], rows))
+    return result.rowcount
+
+
+# [start, end] 内需要打卡的日期：落在某个时间段内且不是该时间段的休息日
+def required_days_between(periods, start, end):
+    days = set()
+    for period in periods:
+        if period.end_date < start or period.start_date > end:
+            continue
+        days.update(d for d in period_summary.required_days(period) if start <= d <= end)
+    return sorted(days)
+
+
+def participation(session, start, end, required_count):
+    """各学院在 [start, end] 内的参与率：打卡次数 / (学生人数 × 应打卡天数)。
+
+    打卡次数来自 department_daily_count，学生人数按 user.department_id 索引计数（不含管理员）。
+    """
+    students = dict(session.query(User.department_id, func.count())
+                    .filter(User.is_admin.is_(False)).group_by(User.department_id))
+    checkins = dict(session.query(DepartmentDailyCount.department_id, func.sum(DepartmentDailyCount.count))
+                    .filter(DepartmentDailyCount.date >= start, DepartmentDailyCount.date <= end)
+                    .group_by(DepartmentDailyCount.department_id))
+    rates = []
+    for department in session.query(Department).order_by(Department.id):
+        count = students.get(department.id, 0)
+        done = checkins.get(department.id, 0) or 0
+        if not count and not done:
+            continue
+        expected = count * required_count
+        rate = round(done * 100.0 / expected, 2) if expected else None
+        rates.append(DepartmentRate(department.id, department.name, count, done, expected, rate))
+    return rates
@@ -0,0 +1,74 @@
+import csv
+import io
+import zlib
+
+from flask import Response, stream_with_context
+
+# 每累计多少行输出一次，避免逐行 yield 产生大量小块
+FLUSH_ROWS = 500
+
+
+def _csv_chunks(header, rows):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(header)
+    for i, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if i % FLUSH_ROWS == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+def _tsv_field(value):
+    if value is None:
+        return ''
+    return str(value).replace('\t', ' ').replace('\r', ' ').replace('\n', ' ')
+
+
+# TSV 快速路径：不做引号转义，直接拼接
+def _tsv_chunks(header, rows):
+    lines = ['\t'.join(header)]
+    for row in rows:
+        lines.append('\t'.join(map(_tsv_field, row)))
+        if len(lines) >= FLUSH_ROWS:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def _gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+# 把表头和数据行编码成 csv 或 tsv 文本块（命令行导出也使用）
+def encode_rows(header, rows, fmt='csv'):
+    return _tsv_chunks(header, rows) if fmt == 'tsv' else _csv_chunks(header, rows)
+
+
+def stream_export(filename, header, make_rows, fmt='csv', gzip=False):
+    """以流的方式导出表格。make_rows 返回逐行产生数据的可迭代对象（通常是 yield_per 查询），
+    在开始输出后才调用：视图返回时请求的数据库会话已经关闭，查询必须在流中重新执行。
+
+    fmt 为 csv 或 tsv；gzip=True 时以 Content-Encoding: gzip 压缩传输。
+    """
+    mimetype = 'text/tab-separated-values' if fmt == 'tsv' else 'text/csv'
+
+    def body():
+        for chunk in encode_rows(header, make_rows(), fmt):
+            yield chunk.encode('utf-8')
+
+    headers = {"Content-Disposition": f"attachment; filename={filename}.{fmt}"}
+    chunks = body()
+    if gzip:
+        chunks = _gzip_chunks(chunks)
+        headers['Content-Encoding'] = 'gzip'
+        headers['Vary'] = 'Accept-Encoding'
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
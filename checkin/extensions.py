@@ -0,0 +1,7 @@
+from flask_login import LoginManager
+from flask_sqlalchemy import SQLAlchemy
+
+# 扩展对象在 create_app() 中绑定到应用
+db = SQLAlchemy()
+login_manager = LoginManager()
+login_manager.login_view = 'main.login'
@@ -0,0 +1,64 @@
+from flask_wtf import FlaskForm
+from flask_wtf.file import FileField, FileRequired
+from wtforms import StringField, PasswordField, SubmitField, SelectField, DateField, BooleanField
+from wtforms.validators import DataRequired, Length, EqualTo, ValidationError
+
+from models import User
+
+# 注册和名单导入时可选的学院
+DEPARTMENTS = [
+    '机械工程学院', '材料科学与工程学院', '电气工程学院',
+    '信息科学与工程学院（软件学院）', '经济管理学院', '外国语学院',
+    '建筑工程与力学学院', '文法学院（公共管理学院）', '马克思主义学院',
+    '理学院', '环境与化学工程学院', '艺术与设计学院', '车辆与能源学院',
+    '体育学院', '西里西亚智能科学与工程学院', '国际教育学院（欧洲学院）',
+    '继续教育学院', '里仁学院'
+]
+DEPARTMENT_CHOICES = [('', '请选择学院')] + [(name, name) for name in DEPARTMENTS]
+
+# 修改密码表单
+class ChangePasswordForm(FlaskForm):
+    username = StringField('学号', validators=[DataRequired()])
+    new_password = PasswordField('新密码', validators=[DataRequired(), Length(min=6)])
+    confirm_password = PasswordField('确认新密码', validators=[DataRequired(), EqualTo('new_password')])
+    submit = SubmitField('修改密码')
+
+# 注册表单
+class RegistrationForm(FlaskForm):
+    username = StringField('学号', validators=[DataRequired(), Length(min=12, max=12)])
+    password = PasswordField('密码', validators=[DataRequired(), Length(min=6)])
+    confirm_password = PasswordField('确认密码', validators=[DataRequired(), EqualTo('password')])
+    name = StringField('姓名', validators=[DataRequired()])
+    Departments = SelectField('学院', choices=DEPARTMENT_CHOICES, validators=[DataRequired()])
+    QQ = StringField('QQ号', validators=[DataRequired()])
+    submit = SubmitField('注册')
+
+    def validate_username(self, username):
+        user = User.query.filter_by(username=username.data).first()
+        if user:
+            raise ValidationError('学号已被注册，请确保您输入的学号正确，或联系网站管理人员。')
+
+# 登录表单
+class LoginForm(FlaskForm):
+    username = StringField('学号', validators=[DataRequired()])
+    password = PasswordField('密码', validators=[DataRequired()])
+    submit = SubmitField('登录')
+
+# 管理员新增打卡时间段的表单
+class SignPeriodForm(FlaskForm):
+    name = StringField('时间段名称', validators=[DataRequired()])
+    start_date = DateField('开始日期', validators=[DataRequired()], format='%Y-%m-%d')
+    end_date = DateField('结束日期', validators=[DataRequired()], format='%Y-%m-%d')
+    submit = SubmitField('提交')
+
+# 管理员新增例外日期的表单
+class ExceptionDateForm(FlaskForm):
+    exception_date = DateField('休息日', validators=[DataRequired()], format='%Y-%m-%d')
+    submit = SubmitField('添加休息日')
+
+# 管理员导入学生名单的表单
+class RosterImportForm(FlaskForm):
+    roster = FileField('名单文件（CSV/TSV）', validators=[FileRequired()])
+    default_password = PasswordField('初始密码（名单中没有密码列时使用）')
+    dry_run = BooleanField('只检查不导入')
+    submit = SubmitField('导入')
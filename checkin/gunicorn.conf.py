@@ -0,0 +1,27 @@
+# gunicorn 配置：gunicorn -c gunicorn.conf.py wsgi:app
+# 工作进程数和线程数可用环境变量 GUNICORN_WORKERS / GUNICORN_THREADS 调整
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5001')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+# 线程数需大于准入控制中学生请求可占用的线程数（见 config.py ADMISSION_*），留出线程给管理后台
+threads = int(os.environ.get('GUNICORN_THREADS', 16))
+worker_class = 'gthread'
+timeout = 30
+graceful_timeout = 30
+# 定期重启工作进程，防止内存缓慢增长
+max_requests = 5000
+max_requests_jitter = 500
+accesslog = '-'
+
+
+# 主进程启动时执行一次数据库迁移，避免多个工作进程同时升级
+def on_starting(server):
+    import db_bootstrap
+    from app import create_app
+    from extensions import db
+
+    app = create_app()
+    with app.app_context():
+        db_bootstrap.upgrade(db, log=server.log.info)
@@ -0,0 +1,374 @@
+import base64
+import glob
+import json
+import operator
+import os
+import re
+import sqlite3
+import time
+from datetime import date, datetime
+
+from sqlalchemy import func, select
+
+import archive
+import department_rollup
+import export_stream
+import search_index
+import services
+from checkins import delete_user_data, rebuild_period_summary, rebuild_user_checkin_stats, rename_user_records
+from extensions import db
+from models import CheckInRecord, PeriodUserSummary, SignInException, SignPeriod, User, UserCheckInStats, \
+    bump_generation, checkins_generation, load_period_infos
+
+# 命令行数据维护的实现（见 cli.py）：
+# 表名和列名只接受模型中定义的名称，条件值按列类型转换后作为参数传入，不拼接到 SQL 中
+
+# --where 条件：列名 运算符 值，值为 null 时表示 IS NULL / IS NOT NULL
+_CONDITION = re.compile(r'^\s*(\w+)\s*(<=|>=|!=|=|<|>)\s*(.*?)\s*$')
+_OPERATORS = {'=': operator.eq, '!=': operator.ne, '<': operator.lt, '<=': operator.le,
+              '>': operator.gt, '>=': operator.ge}
+
+# 允许批量修改的表；打卡记录及由它派生的统计、索引表只能删除或重建
+UPDATABLE = ('user', 'sign_period', 'sign_in_exception')
+DELETABLE = ('check_in_record', 'user', 'sign_period', 'sign_in_exception')
+# 用户表中不允许直接修改的列：密码需要哈希，department_id 随学院名称自动维护
+READ_ONLY_COLUMNS = {'id', 'password', 'department_id'}
+
+
+# 全部表，包括其他数据库（如归档库 archive）中的表；会话按表所属的 bind 选择数据库
+def _tables():
+    return {name: table for metadata in db.metadatas.values() for name, table in metadata.tables.items()}
+
+
+def table_names():
+    return sorted(_tables())
+
+
+def get_table(name):
+    table = _tables().get(name)
+    if table is None:
+        raise ValueError(f'未知的表：{name}（可用：{", ".join(table_names())}）')
+    return table
+
+
+def _column(table, name):
+    if name not in table.c:
+        raise ValueError(f'表 {table.name} 没有列 {name}')
+    return table.c[name]
+
+
+def convert(column, value):
+    if value.lower() == 'null':
+        return None
+    python_type = column.type.python_type
+    if python_type is date:
+        return date.fromisoformat(value)
+    if python_type is bool:
+        return value.lower() in ('1', 'true', 'yes')
+    if python_type is bytes:
+        raise ValueError(f'不支持按二进制列 {column.name} 筛选或修改')
+    return python_type(value)
+
+
+def parse_conditions(table, conditions):
+    clauses = []
+    for condition in conditions:
+        match = _CONDITION.match(condition)
+        if not match:
+            raise ValueError(f'无法解析条件：{condition}（格式为 列名=值，支持 = != < <= > >=）')
+        name, op, raw = match.groups()
+        column = _column(table, name)
+        value = convert(column, raw)
+        if value is None:
+            if op not in ('=', '!='):
+                raise ValueError(f'null 只能与 = 或 != 一起使用：{condition}')
+            clauses.append(column.is_(None) if op == '=' else column.isnot(None))
+        else:
+            clauses.append(_OPERATORS[op](column, value))
+    return clauses
+
+
+def parse_assignments(table, assignments):
+    values = {}
+    for assignment in assignments:
+        name, sep, raw = assignment.partition('=')
+        name = name.strip()
+        if not sep:
+            raise ValueError(f'无法解析赋值：{assignment}（格式为 列名=值）')
+        if name in READ_ONLY_COLUMNS:
+            raise ValueError(f'不能直接修改列 {name}')
+        values[name] = convert(_column(table, name), raw.strip())
+    return values
+
+
+# Flask-SQLAlchemy 只按模型和 Table 本身选择数据库，对 select() 需要指明表所属的 bind
+def _execute(table, statement):
+    return db.session.execute(statement, bind_arguments={'bind': db.engines[table.metadata.info.get('bind_key')]})
+
+
+def count_rows(table, clauses):
+    return _execute(table, select(func.count()).select_from(table).where(*clauses)).scalar()
+
+
+# 按主键分批取出满足条件的 id：每批都重新查询 id > 上一批最大值，
+# 删除或修改后不再满足条件的行不会影响后续批次
+def _batches(table, clauses, batch_size):
+    pk = table.c.id
+    last_id = 0
+    while True:
+        ids = [i for (i,) in _execute(table, select(pk).where(pk > last_id, *clauses).order_by(pk).limit(batch_size))]
+        if not ids:
+            return
+        last_id = ids[-1]
+        yield ids
+
+
+def _plain(value):
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode('ascii')
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def dump(table, clauses, out, fmt='csv', batch_size=1000):
+    """按主键顺序把表中满足条件的行写到 out，返回行数。
+
+    查询以 yield_per 分批从游标读取，内存占用与表大小无关；二进制列输出为 base64。
+    """
+    names = [c.name for c in table.c]
+    query = select(table).where(*clauses).order_by(*table.primary_key.columns) \
+        .execution_options(yield_per=batch_size)
+    count = 0
+
+    def rows():
+        nonlocal count
+        for row in _execute(table, query):
+            count += 1
+            yield [_plain(v) for v in row]
+
+    if fmt == 'jsonl':
+        for row in rows():
+            out.write(json.dumps(dict(zip(names, row)), ensure_ascii=False) + '\n')
+    else:
+        for chunk in export_stream.encode_rows(names, rows(), fmt):
+            out.write(chunk)
+    return count
+
+
+# 时间段或休息日变化后：重新加载日历，重建各时间段汇总和签到统计
+def _refresh_periods():
+    services.period_calendar.invalidate()
+    for period in load_period_infos():
+        rebuild_period_summary(period)
+    db.session.commit()
+    rebuild_user_checkin_stats()
+
+
+def _update_users(ids, values):
+    for user in User.query.filter(User.id.in_(ids)):
+        if 'username' in values and values['username'] != user.username:
+            rename_user_records(user.id, values['username'])
+        for name, value in values.items():
+            setattr(user, name, value)
+        if 'Departments' in values:
+            new_department = department_rollup.department_id(db.session, user.Departments)
+            department_rollup.move_user(db.session, user.id, user.department_id, new_department)
+            user.department_id = new_department
+    bump_generation('users')
+
+
+def update(table, clauses, values, batch_size=500, log=print):
+    """分批修改满足条件的行，每批一个事务，返回修改的行数。
+
+    修改用户时同步打卡记录中的学号和学院统计；修改时间段或休息日后重建汇总和统计。
+    """
+    if table.name not in UPDATABLE:
+        raise ValueError(f'不支持批量修改 {table.name}（可修改：{", ".join(UPDATABLE)}）')
+    if not values:
+        raise ValueError('没有要修改的列')
+    updated = 0
+    for ids in _batches(table, clauses, batch_size):
+        if table.name == 'user':
+            _update_users(ids, values)
+        else:
+            db.session.execute(table.update().where(table.c.id.in_(ids)).values(**values))
+            bump_generation('periods')
+        db.session.commit()
+        if table.name == 'user':
+            for user_pk in ids:
+                services.user_cache.invalidate(user_pk)
+        updated += len(ids)
+        log(f'已修改 {updated} 行')
+    if updated and table.name != 'user':
+        _refresh_periods()
+    return updated
+
+
+def _remove_files(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+# 删除一批打卡记录及其内容、全文索引、相似度指纹和学院统计，返回涉及的时间段 id
+def _delete_records(ids, periods):
+    records = CheckInRecord.query.filter(CheckInRecord.id.in_(ids)).all()
+    search_index.remove_records(db.session, records)
+    files = services.content_storage.delete(records)
+    services.duplicate_index.remove(ids)
+    department_rollup.discount(db.session, ids)
+    CheckInRecord.query.filter(CheckInRecord.id.in_(ids)).delete(synchronize_session=False)
+    touched = {p.id for r in records for p in periods if p.start_date <= r.date <= p.end_date}
+    return files, touched
+
+
+def _delete_periods(ids):
+    packs = archive.remove_periods(ids)
+    SignInException.query.filter(SignInException.period_id.in_(ids)).delete(synchronize_session=False)
+    PeriodUserSummary.query.filter(PeriodUserSummary.period_id.in_(ids)).delete(synchronize_session=False)
+    UserCheckInStats.query.filter(UserCheckInStats.period_id.in_(ids)).delete(synchronize_session=False)
+    SignPeriod.query.filter(SignPeriod.id.in_(ids)).delete(synchronize_session=False)
+    return packs
+
+
+def delete(table, clauses, batch_size=500, log=print):
+    """分批删除满足条件的行，每批一个事务，提交后再删除内容文件，返回删除的行数。
+
+    删除打卡记录时同步删除内容、索引和学院统计，结束后重建受影响时间段的汇总和签到统计；
+    删除用户与管理后台相同（连同其打卡记录）；删除时间段时一并删除其休息日、汇总、统计和归档记录。
+    """
+    if table.name not in DELETABLE:
+        raise ValueError(f'不支持批量删除 {table.name}（可删除：{", ".join(DELETABLE)}）')
+    periods = load_period_infos()
+    touched = set()
+    deleted = 0
+    for ids in _batches(table, clauses, batch_size):
+        files = []
+        if table.name == 'check_in_record':
+            files, batch_periods = _delete_records(ids, periods)
+            touched |= batch_periods
+            bump_generation('checkins', *(checkins_generation(p) for p in batch_periods))
+        elif table.name == 'user':
+            for user in User.query.filter(User.id.in_(ids)).all():
+                files += delete_user_data(user)
+        elif table.name == 'sign_period':
+            files = _delete_periods(ids)
+            bump_generation('periods')
+        else:
+            db.session.execute(table.delete().where(table.c.id.in_(ids)))
+            bump_generation('periods')
+        db.session.commit()
+        _remove_files(files)
+        if table.name == 'user':
+            for user_pk in ids:
+                services.user_cache.invalidate(user_pk)
+        deleted += len(ids)
+        log(f'已删除 {deleted} 行')
+    if not deleted:
+        return 0
+    if table.name == 'check_in_record':
+        for period in periods:
+            if period.id in touched:
+                rebuild_period_summary(period)
+        db.session.commit()
+        rebuild_user_checkin_stats()
+    elif table.name in ('sign_period', 'sign_in_exception'):
+        _refresh_periods()
+    return deleted
+
+
+def database_path(bind_key=None):
+    path = db.engines[bind_key].url.database
+    if not path or path == ':memory:':
+        raise ValueError('只能备份文件数据库')
+    return path
+
+
+# 需要备份的数据库：主库（bind_key 为 None）和 SQLALCHEMY_BINDS 中的文件数据库（如归档库）
+def backup_binds():
+    keys = [None] + sorted(key for key in db.engines if key is not None)
+    return [key for key in keys
+            if db.engines[key].dialect.name == 'sqlite' and db.engines[key].url.database not in (None, '', ':memory:')]
+
+
+def backup(dest, pages=1024, sleep=0.05, verify=True, bind_key=None):
+    """用 SQLite 在线备份 API 把正在使用的数据库（bind_key 指定的 bind，默认主库）复制到 dest，网站不需要停止。
+
+    WAL 模式下读事务不阻塞写入，一次复制全部页面，得到开始时刻的一致快照；
+    分步复制期间如有其他连接写入，备份会从头开始，写入频繁时可能一直无法完成。
+    其他日志模式下复制期间持有共享锁会阻塞写入，因此每次复制 pages 页后释放锁并等待 sleep 秒。
+    先写到临时文件，校验通过后再改名，返回 (文件大小, 耗时秒数)。
+    """
+    begin = time.perf_counter()
+    tmp = dest + '.tmp'
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    source = db.engines[bind_key].raw_connection()
+    try:
+        target = sqlite3.connect(tmp)
+        try:
+            mode = source.driver_connection.execute('PRAGMA journal_mode').fetchone()[0]
+            if mode.lower() == 'wal':
+                source.driver_connection.backup(target)
+            else:
+                source.driver_connection.backup(target, pages=pages, sleep=sleep)
+            if verify:
+                result = target.execute('PRAGMA quick_check').fetchone()[0]
+                if result != 'ok':
+                    raise RuntimeError(f'备份校验失败：{result}')
+        finally:
+            target.close()
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    finally:
+        source.close()
+    os.replace(tmp, dest)
+    return os.path.getsize(dest), time.perf_counter() - begin
+
+
+# 备份目录中的文件名：<数据库名>-<时间>.db，按名称排序即按时间排序
+def backup_name(directory, now=None, bind_key=None):
+    stem = os.path.splitext(os.path.basename(database_path(bind_key)))[0]
+    return os.path.join(directory, f'{stem}-{(now or datetime.now()):%Y%m%d-%H%M%S}.db')
+
+
+# 只保留最近 keep 个备份，返回删除的文件
+def prune_backups(directory, keep, bind_key=None):
+    stem = os.path.splitext(os.path.basename(database_path(bind_key)))[0]
+    files = sorted(glob.glob(os.path.join(directory, f'{stem}-*.db')))
+    removed = files[:-keep] if keep > 0 else []
+    _remove_files(removed)
+    return removed
+
+
+def optimize(analyze=False, vacuum=False, vacuum_threshold=0.25, log=print):
+    """数据库例行维护：更新查询规划统计、合并全文索引、按需 VACUUM，最后截断 WAL 文件。
+
+    空闲页占比达到 vacuum_threshold 或 vacuum=True 时才执行 VACUUM；VACUUM 期间其他写入会等待，
+    应在访问量低的时段运行。
+    """
+    search_index.optimize(db.session)
+    db.session.commit()
+    log('全文索引已合并')
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        if analyze:
+            conn.exec_driver_sql('ANALYZE')
+            log('已执行 ANALYZE')
+        else:
+            conn.exec_driver_sql('PRAGMA optimize')
+            log('已执行 PRAGMA optimize')
+        page_count = conn.exec_driver_sql('PRAGMA page_count').scalar()
+        free = conn.exec_driver_sql('PRAGMA freelist_count').scalar()
+        ratio = free / page_count if page_count else 0.0
+        log(f'空闲页 {free}/{page_count}（{ratio:.1%}）')
+        if vacuum or (vacuum_threshold and ratio >= vacuum_threshold):
+            begin = time.perf_counter()
+            conn.exec_driver_sql('VACUUM')
+            log(f'已执行 VACUUM，耗时 {time.perf_counter() - begin:.1f} 秒')
+        busy, wal_pages, done = conn.exec_driver_sql('PRAGMA wal_checkpoint(TRUNCATE)').fetchone()
+        log(f'WAL 检查点：{done}/{wal_pages} 页' + ('（有读事务未结束，未能截断）' if busy else ''))
@@ -0,0 +1,258 @@
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter as _Tally
+
+from flask import Response, g, has_request_context, request
+from flask_login import current_user
+from sqlalchemy import event
+
+# 耗时直方图的桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 每个请求 SQL 条数的桶，条数偏大通常意味着 N+1 查询
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+PROFILE_HEADER = 'X-Checkin-Profile'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}  # 标签值 -> [各桶计数..., +Inf 桶计数, 总和, 次数]
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = [(k, list(v)) for k, v in sorted(self._series.items())]
+        for label_values, series in items:
+            cumulative = 0
+            for le, count in zip(self.buckets + (float('inf'),), series):
+                cumulative += count
+                bucket = _labels(self.labels, label_values, 'le="%s"' % _number(le))
+                lines.append(f'{self.name}_bucket{bucket} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labels, label_values)} {_number(series[-2])}')
+            lines.append(f'{self.name}_count{_labels(self.labels, label_values)} {series[-1]}')
+        return lines
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, *label_values):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, value in items:
+            lines.append(f'{self.name}{_labels(self.labels, label_values)} {_number(value)}')
+        return lines
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def set(self, value, *label_values):
+        with self._lock:
+            self._values[label_values] = value
+
+
+class Metrics:
+    """本进程的性能指标，按 Prometheus 文本格式输出。
+
+    多个 gunicorn 工作进程各自统计，抓取时请求落到哪个进程就返回哪个进程的数据。
+    """
+
+    def __init__(self):
+        self.request_seconds = Histogram(
+            'checkin_request_duration_seconds', '请求处理耗时（流式导出包含整个传输过程）',
+            ('endpoint', 'method'))
+        self.requests = Counter('checkin_requests_total', '请求数', ('endpoint', 'method', 'status'))
+        self.request_queries = Histogram(
+            'checkin_request_sql_queries', '每个请求执行的 SQL 条数', ('endpoint',), QUERY_COUNT_BUCKETS)
+        self.request_sql_seconds = Histogram(
+            'checkin_request_sql_seconds', '每个请求的 SQL 总耗时', ('endpoint',))
+        self.sql_seconds = Histogram('checkin_sql_statement_seconds', '单条 SQL 耗时（包括后台线程）')
+        self.content_io_seconds = Histogram(
+            'checkin_content_io_seconds', '打卡内容读写耗时（file/segment 为上传目录文件 I/O）',
+            ('backend', 'op'))
+        self.slow_requests = Counter('checkin_slow_requests_total', '超过慢请求阈值的请求数', ('endpoint',))
+        self.admission_active = Gauge('checkin_admission_active', '准入控制：正在处理的请求', ('class',))
+        self.admission_queued = Gauge('checkin_admission_queued', '准入控制：排队等待的请求', ('class',))
+        self.admission_rejected = Counter(
+            'checkin_admission_rejected_total', '准入控制拒绝的请求（rate_limited 为 429，其余为 503）',
+            ('class', 'reason'))
+        self.admission_wait_seconds = Histogram(
+            'checkin_admission_wait_seconds', '准入控制：获得名额前的排队时间', ('class',))
+        self._collectors = []
+
+    # collector 在抓取时调用，返回 [(名称, 类型, 说明, 值)]，用于输出其他服务对象已有的统计
+    def add_collector(self, collector):
+        self._collectors.append(collector)
+
+    def observe_content_io(self, seconds, backend, op):
+        self.content_io_seconds.observe(seconds, backend, op)
+
+    def observe_admission(self, route_class, active, queued):
+        self.admission_active.set(active, route_class)
+        self.admission_queued.set(queued, route_class)
+
+    def render(self):
+        lines = []
+        for metric in (self.request_seconds, self.requests, self.request_queries, self.request_sql_seconds,
+                       self.sql_seconds, self.content_io_seconds, self.slow_requests, self.admission_active,
+                       self.admission_queued, self.admission_rejected, self.admission_wait_seconds):
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            for name, kind, help, value in collector():
+                lines.extend([f'# HELP {name} {help}', f'# TYPE {name} {kind}', f'{name} {_number(value)}'])
+        return '\n'.join(lines) + '\n'
+
+
+class SamplingProfiler:
+    """采样分析器：后台线程按固定间隔抓取目标线程的调用栈，输出折叠栈格式（可直接生成火焰图）。"""
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = _Tally()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='checkin-profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({code.co_filename}:{frame.f_lineno})')
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def render(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.samples.most_common())
+
+
+def instrument(app, engine, metrics):
+    """注册请求钩子和 SQLAlchemy 事件：统计每个请求的耗时、SQL 条数和 SQL 耗时。
+
+    SLOW_REQUEST_SECONDS 不为 None 时记录超过阈值的请求及其中最慢的 SQL；
+    PROFILE_REQUESTS 开启时，管理员请求带上 X-Checkin-Profile: 1 头会返回该请求的采样结果。
+    """
+    slow_seconds = app.config['SLOW_REQUEST_SECONDS']
+    profile_enabled = app.config['PROFILE_REQUESTS']
+    profile_interval = app.config['PROFILE_INTERVAL']
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('checkin_query_start', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['checkin_query_start'].pop()
+        metrics.sql_seconds.observe(elapsed)
+        if has_request_context() and 'checkin_sql' in g:
+            g.checkin_sql[0] += 1
+            g.checkin_sql[1] += elapsed
+            if g.checkin_sql_log is not None:
+                g.checkin_sql_log.append((elapsed, statement))
+
+    # 语句执行出错时不会触发 after_cursor_execute，在这里弹出开始时间
+    @event.listens_for(engine, 'handle_error')
+    def _handle_error(context):
+        starts = context.connection.info.get('checkin_query_start') if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+    @app.before_request
+    def _start_request_metrics():
+        g.checkin_start = time.perf_counter()
+        g.checkin_sql = [0, 0.0]
+        g.checkin_sql_log = [] if slow_seconds is not None else None
+        g.checkin_profiler = None
+        if profile_enabled and request.headers.get(PROFILE_HEADER) == '1' \
+                and current_user.is_authenticated and current_user.is_admin:
+            g.checkin_profiler = SamplingProfiler(threading.get_ident(), profile_interval).start()
+
+    @app.after_request
+    def _finish_request_metrics(response):
+        g.checkin_status = response.status_code
+        profiler = g.get('checkin_profiler')
+        if profiler is not None:
+            g.checkin_profiler = None
+            profiler.stop()
+            # 流式响应只统计到开始传输为止
+            return Response(profiler.render(), mimetype='text/plain',
+                            headers={'X-Profile-Samples': str(sum(profiler.samples.values())),
+                                     'X-Profile-Status': str(response.status_code)})
+        return response
+
+    @app.teardown_request
+    def _record_request_metrics(exc):
+        start = g.get('checkin_start')
+        if start is None:
+            return
+        elapsed = time.perf_counter() - start
+        endpoint = request.endpoint or 'unmatched'
+        queries, sql_seconds = g.checkin_sql
+        metrics.request_seconds.observe(elapsed, endpoint, request.method)
+        metrics.requests.inc(1, endpoint, request.method, str(g.get('checkin_status', 500)))
+        metrics.request_queries.observe(queries, endpoint)
+        metrics.request_sql_seconds.observe(sql_seconds, endpoint)
+        if slow_seconds is not None and elapsed >= slow_seconds:
+            metrics.slow_requests.inc(1, endpoint)
+            slowest = sorted(g.checkin_sql_log, key=lambda item: item[0], reverse=True)[:5]
+            app.logger.warning(
+                '慢请求 %s %s 耗时 %.3f 秒，SQL %d 条共 %.3f 秒，最慢的语句：\n%s',
+                request.method, request.path, elapsed, queries, sql_seconds,
+                '\n'.join(f'  {seconds * 1000:.1f} ms  {" ".join(statement.split())}'
+                          for seconds, statement in slowest))
@@ -0,0 +1,195 @@
+from datetime import date
+
+from flask_login import UserMixin
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from extensions import db
+from period_calendar import PeriodInfo
+
+# 用户模型
+class User(db.Model, UserMixin):
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(20), unique=True, nullable=False)  # 学号，最多12字符
+    name = db.Column(db.String(20), nullable=False)  # 姓名
+    password = db.Column(db.String(60), nullable=False)
+    Departments = db.Column(db.String(13), nullable=False)  # 学院名称（冗余保存，修改学院时同步更新 department_id）
+    QQ = db.Column(db.String(14), nullable=False)
+    is_admin = db.Column(db.Boolean, default=False, nullable=False)
+    # 关联学院字典表；批量导入等直接插入的行由 department_rollup.assign_departments 补齐
+    department_id = db.Column(db.Integer, db.ForeignKey('department.id'), index=True)
+
+# 打卡记录模型
+class CheckInRecord(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String(64), nullable=False)  # 学号（冗余保存，修改学号时同步更新）
+    # 关联 user.id；旧库升级后由迁移分批回填，删除用户时级联删除
+    user_pk = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'))
+    date = db.Column(db.Date, default=date.today)
+    file_path = db.Column(db.String(256), nullable=False)
+    # 打卡表单携带的一次性令牌：同一表单重复提交时识别为同一次打卡，而不是“已经签到过”
+    request_token = db.Column(db.String(32))
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'date', name='unique_signin_per_day'),
+        db.Index('ix_check_in_record_date', 'date'),
+        db.Index('ix_check_in_record_user_pk_date', 'user_pk', 'date', unique=True),
+    )
+
+# 打卡内容：保存预览及 db/segment 后端的内容位置
+class CheckInContent(db.Model):
+    __tablename__ = 'check_in_content'
+    record_id = db.Column(db.Integer, db.ForeignKey('check_in_record.id'), primary_key=True)
+    backend = db.Column(db.String(16), nullable=False)
+    preview = db.Column(db.String(100), nullable=False)
+    codec = db.Column(db.String(8), nullable=False, default='plain')
+    data = db.Column(db.LargeBinary)  # db 后端的内容
+    segment = db.Column(db.String(64))  # segment 后端的段文件名
+    offset = db.Column(db.Integer)
+    length = db.Column(db.Integer)
+
+# 新增打卡时间段模型
+class SignPeriod(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), nullable=False)  # 时间段名称，如“第一阶段”
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date, nullable=False)
+    # 归档状态：None 未归档；archiving 正在分批归档；archived 打卡记录已全部移到归档库（见 archive.py）
+    archive_state = db.Column(db.String(16))
+
+    __table_args__ = (db.Index('ix_sign_period_dates', 'start_date', 'end_date'),)
+
+# 新增例外日期模型（用于定义某一时间段不需要打卡的日期）
+class SignInException(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    period_id = db.Column(db.Integer, db.ForeignKey('sign_period.id'), nullable=False)
+    exception_date = db.Column(db.Date, nullable=False)
+    sign_period = db.relationship('SignPeriod', backref=db.backref('exceptions', lazy=True))
+
+    __table_args__ = (db.Index('ix_sign_in_exception_period_date', 'period_id', 'exception_date'),)
+
+# 每个用户在每个打卡时间段的签到统计，随打卡记录在同一事务中增量维护
+class UserCheckInStats(db.Model):
+    __tablename__ = 'user_checkin_stats'
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    period_id = db.Column(db.Integer, db.ForeignKey('sign_period.id'), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    current_streak = db.Column(db.Integer, nullable=False, default=0)  # 当前连续打卡天数（休息日不打断）
+    last_checkin_date = db.Column(db.Date)
+
+# 每个时间段每个用户的完成情况（物化汇总），打卡时增量刷新，时间段日期或休息日变化时整体重建；
+# 从未打卡的用户没有汇总行，按签到 0 次处理
+class PeriodUserSummary(db.Model):
+    __tablename__ = 'period_user_summary'
+    period_id = db.Column(db.Integer, db.ForeignKey('sign_period.id'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    sign_count = db.Column(db.Integer, nullable=False, default=0)
+    required_days = db.Column(db.Integer, nullable=False)  # 时间段天数减去休息日
+    completion = db.Column(db.Float, nullable=False, default=0.0)  # 完成率（百分比）
+    missed_dates = db.Column(db.Text, nullable=False, default='')  # refreshed_on 之前的缺卡日期，逗号分隔
+    last_signed_date = db.Column(db.Date)
+    refreshed_on = db.Column(db.Date, nullable=False)
+    # 打卡日期位图：第 i 位表示时间段第 i 天已打卡（见 calendar_bits）
+    signed_bits = db.Column(db.LargeBinary)
+
+    __table_args__ = (db.Index('ix_period_user_summary_completion', 'period_id', 'completion'),)
+
+# 打卡内容的 MinHash 签名（近似重复检测）
+class ContentFingerprint(db.Model):
+    __tablename__ = 'content_fingerprint'
+    record_id = db.Column(db.Integer, db.ForeignKey('check_in_record.id'), primary_key=True)
+    user_pk = db.Column(db.Integer, nullable=False)
+    period_id = db.Column(db.Integer)
+    signature = db.Column(db.LargeBinary, nullable=False)
+
+# LSH 分段桶：签名某一段相同的记录落在同一个 (band, bucket)
+class LshBucket(db.Model):
+    __tablename__ = 'lsh_bucket'
+    band = db.Column(db.Integer, primary_key=True)
+    bucket = db.Column(db.BigInteger, primary_key=True)
+    record_id = db.Column(db.Integer, db.ForeignKey('check_in_record.id'), primary_key=True)
+    user_pk = db.Column(db.Integer, nullable=False)
+    period_id = db.Column(db.Integer)
+
+    __table_args__ = (db.Index('ix_lsh_bucket_record', 'record_id'),)
+
+# 疑似重复：record_id 的内容与更早的 match_id 高度相似
+class DuplicateFlag(db.Model):
+    __tablename__ = 'duplicate_flag'
+    record_id = db.Column(db.Integer, db.ForeignKey('check_in_record.id'), primary_key=True)
+    match_id = db.Column(db.Integer, db.ForeignKey('check_in_record.id'), primary_key=True)
+    similarity = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (db.Index('ix_duplicate_flag_match', 'match_id'),)
+
+# 学院字典表：学院名称只在这里保存一份，用户和统计表按整数 id 引用
+class Department(db.Model):
+    __tablename__ = 'department'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(32), unique=True, nullable=False)
+
+# 各学院每天的打卡次数：打卡时累加，删除打卡时扣减，可用 rebuild-rollup 整体重建
+class DepartmentDailyCount(db.Model):
+    __tablename__ = 'department_daily_count'
+    department_id = db.Column(db.Integer, db.ForeignKey('department.id'), primary_key=True)
+    date = db.Column(db.Date, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+# 已归档的打卡记录，保存在单独的归档库（SQLALCHEMY_BINDS['archive']）中，id 与原记录相同。
+# 内容按批压缩后追加到该时间段的内容包 ARCHIVE_FOLDER/period-<id>.pack：
+# block_offset/block_length 为压缩块在包中的位置，item_offset/item_length 为解压后本条内容的位置
+class ArchivedRecord(db.Model):
+    __bind_key__ = 'archive'
+    __tablename__ = 'archived_record'
+    id = db.Column(db.Integer, primary_key=True)
+    period_id = db.Column(db.Integer, nullable=False)
+    user_pk = db.Column(db.Integer)
+    user_id = db.Column(db.String(64), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    preview = db.Column(db.String(100), nullable=False)
+    block_offset = db.Column(db.Integer, nullable=False)
+    block_length = db.Column(db.Integer, nullable=False)
+    item_offset = db.Column(db.Integer, nullable=False)
+    item_length = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_archived_record_period', 'period_id', 'id'),
+        db.Index('ix_archived_record_user_date', 'user_pk', 'date'),
+    )
+
+# 缓存代数计数器：数据修改时递增，多个工作进程据此判断本地缓存是否过期
+class CacheGeneration(db.Model):
+    name = db.Column(db.String(32), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+def current_generation(name):
+    value = db.session.query(CacheGeneration.value).filter_by(name=name).scalar()
+    return value or 0
+
+# 一次查询读取多个代数，按 names 的顺序返回元组（不存在的记为 0）
+def current_generations(names):
+    rows = dict(db.session.query(CacheGeneration.name, CacheGeneration.value)
+                .filter(CacheGeneration.name.in_(names)))
+    return tuple(rows.get(name, 0) for name in names)
+
+# 代数名称：periods 时间段和休息日，users 用户信息，checkins 全部打卡，
+# checkins:<时间段 id> 该时间段内的打卡；管理页面缓存按页面依赖的代数失效
+def checkins_generation(period_id):
+    return f'checkins:{period_id}'
+
+# 在当前事务中递增代数，需随业务修改一起提交；用一条 upsert 完成，
+# 多个进程同时创建同一个计数器时不会冲突
+def bump_generation(*names):
+    for name in names:
+        db.session.execute(
+            sqlite_insert(CacheGeneration).values(name=name, value=1)
+            .on_conflict_do_update(index_elements=['name'], set_={'value': CacheGeneration.value + 1})
+        )
+
+# 按会话中的时间段（包括尚未提交的休息日）生成快照
+def period_info(p):
+    return PeriodInfo(p.id, p.name, p.start_date, p.end_date,
+                      frozenset(e.exception_date for e in p.exceptions), p.archive_state)
+
+def load_period_infos():
+    periods = SignPeriod.query.options(db.selectinload(SignPeriod.exceptions)).all()
+    return [period_info(p) for p in periods]
@@ -0,0 +1,158 @@
+import hashlib
+import struct
+
+from sqlalchemy import or_, text
+
+# MinHash 签名：单次排列哈希（one permutation hashing），每个切片只算一次 64 位哈希，
+# 按低 6 位分到 64 个桶，各桶取最小值；空桶向后借用相邻桶的值（densification）。
+# 签名分成 16 段（每段 4 个值）做 LSH：两篇内容只要有一段签名完全相同就成为候选，
+# 相似度约 0.5 以上的内容大概率被找出，再用完整签名估计相似度（Jaccard）并与阈值比较
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE = 5  # 按连续 5 个字切片
+_MASK = (1 << 32) - 1
+_EMPTY = 1 << 64
+_OFFSET = 0x9E3779B1  # 借用相邻桶时按距离加上的偏移，避免不同空桶取到完全相同的值
+
+
+def normalize(content):
+    return ''.join(ch for ch in content.lower() if ch.isalnum())
+
+
+def _hash(piece):
+    return int.from_bytes(hashlib.blake2b(piece.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def shingles(content):
+    text = normalize(content)
+    if len(text) <= SHINGLE:
+        return {_hash(text)}
+    return {_hash(text[i:i + SHINGLE]) for i in range(len(text) - SHINGLE + 1)}
+
+
+def signature(content):
+    mins = [_EMPTY] * NUM_PERM
+    for h in shingles(content):
+        slot = h & (NUM_PERM - 1)
+        value = h >> 6
+        if value < mins[slot]:
+            mins[slot] = value
+    values = []
+    for slot in range(NUM_PERM):
+        distance = 0
+        while mins[(slot + distance) % NUM_PERM] == _EMPTY:
+            distance += 1
+        values.append((mins[(slot + distance) % NUM_PERM] + distance * _OFFSET) & _MASK)
+    return values
+
+
+def pack(values):
+    return struct.pack(f'<{NUM_PERM}I', *values)
+
+
+def unpack(data):
+    return struct.unpack(f'<{NUM_PERM}I', data)
+
+
+# 每段签名映射为一个 64 位整数桶号
+def band_buckets(values):
+    buckets = []
+    for band in range(BANDS):
+        chunk = struct.pack(f'<{ROWS}I', *values[band * ROWS:(band + 1) * ROWS])
+        digest = hashlib.blake2b(chunk, digest_size=8).digest()
+        buckets.append((band, int.from_bytes(digest, 'little', signed=True)))
+    return buckets
+
+
+def similarity(a, b):
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+
+# 进程池中批量计算签名（fingerprint-content 命令使用）
+def pack_signature(content):
+    return pack(signature(content))
+
+
+class NearDuplicateIndex:
+    """增量维护的 LSH 索引：打卡保存时写入签名和分段桶号，并在同一事务中查找相似内容。
+
+    只和本人的历史打卡、以及同一时间段内其他人的打卡比较；
+    命中的记录对写入 duplicate_flag（新记录指向更早的记录），供管理员查看。
+    """
+
+    def __init__(self, db, fingerprint_model, bucket_model, flag_model, threshold=0.6):
+        self.db = db
+        self.Fingerprint = fingerprint_model
+        self.Bucket = bucket_model
+        self.Flag = flag_model
+        self.threshold = threshold
+        # 候选查询每次打卡都要执行，预先写成带参数的 SQL，避免每次构造 16 个条件的表达式；
+        # 每个 (band, bucket) 条件都走主键索引
+        bands = ' OR '.join(f'(band = {band} AND bucket = :b{band})' for band in range(BANDS))
+        self._candidates = text(
+            f'SELECT DISTINCT record_id FROM {bucket_model.__tablename__} WHERE ({bands}) '
+            f'AND record_id < :record_id AND (user_pk = :user_pk OR period_id = :period_id)')
+
+    # 写入一条记录的签名并返回 [(更早的相似记录 id, 相似度)]，调用方负责提交事务
+    def add(self, record_id, user_pk, period_id, content=None, packed=None):
+        packed = packed if packed is not None else pack(signature(content))
+        values = unpack(packed)
+        buckets = band_buckets(values)
+        session = self.db.session
+        session.add(self.Fingerprint(record_id=record_id, user_pk=user_pk, period_id=period_id, signature=packed))
+        session.execute(self.db.insert(self.Bucket), [
+            dict(band=band, bucket=bucket, record_id=record_id, user_pk=user_pk, period_id=period_id)
+            for band, bucket in buckets
+        ])
+        matches = self.find(record_id, user_pk, period_id, values, buckets)
+        if matches:
+            session.execute(self.db.insert(self.Flag), [
+                dict(record_id=record_id, match_id=match_id, similarity=score) for match_id, score in matches
+            ])
+        return matches
+
+    def find(self, record_id, user_pk, period_id, values, buckets):
+        params = {f'b{band}': bucket for band, bucket in buckets}
+        params.update(record_id=record_id, user_pk=user_pk, period_id=period_id)
+        candidates = {rid for (rid,) in self.db.session.execute(self._candidates, params)}
+        if not candidates:
+            return []
+        matches = []
+        for rid, packed in self.db.session.query(self.Fingerprint.record_id, self.Fingerprint.signature) \
+                .filter(self.Fingerprint.record_id.in_(candidates)):
+            score = similarity(values, unpack(packed))
+            if score >= self.threshold:
+                matches.append((rid, score))
+        matches.sort(key=lambda item: -item[1])
+        return matches
+
+    def remove(self, record_ids):
+        if not record_ids:
+            return
+        session = self.db.session
+        session.query(self.Flag).filter(or_(self.Flag.record_id.in_(record_ids),
+                                             self.Flag.match_id.in_(record_ids))) \
+            .delete(synchronize_session=False)
+        session.query(self.Bucket).filter(self.Bucket.record_id.in_(record_ids)).delete(synchronize_session=False)
+        session.query(self.Fingerprint).filter(self.Fingerprint.record_id.in_(record_ids)) \
+            .delete(synchronize_session=False)
+
+
+# 把相似记录对合并成簇（并查集），返回按大小降序排列的记录 id 列表
+def clusters(pairs):
+    parent = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b in pairs:
+        parent[find(a)] = find(b)
+    groups = {}
+    for x in parent:
+        groups.setdefault(find(x), []).append(x)
+    return sorted((sorted(g) for g in groups.values()), key=lambda g: (-len(g), g[0]))
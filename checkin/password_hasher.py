@@ -0,0 +1,158 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+import bcrypt
+
+
+class HasherBusy(Exception):
+    """哈希队列已满或哈希超时，调用方应尽快返回“繁忙，请重试”。"""
+
+
+# bcrypt 只使用前 72 字节（旧版本会静默截断，这里保持一致）
+def _encode(password):
+    return password.encode('utf-8')[:72]
+
+
+def hash_password(password, rounds):
+    return bcrypt.hashpw(_encode(password), bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+
+
+def hash_many(passwords, rounds):
+    return [hash_password(p, rounds) for p in passwords]
+
+
+def check_password(pw_hash, password):
+    try:
+        return bcrypt.checkpw(_encode(password), pw_hash.encode('utf-8'))
+    except ValueError:
+        return False
+
+
+def hash_cost(pw_hash):
+    try:
+        return int(pw_hash.split('$')[2])
+    except (IndexError, ValueError):
+        return None
+
+
+class PasswordHasher:
+    """在独立进程池中执行 bcrypt，避免 CPU 密集的哈希阻塞请求线程。
+
+    同时在执行和排队的任务数不超过 max_pending，超出时立即抛出 HasherBusy。
+    workers=0 时在当前线程内执行（用于开发和测试）。
+    """
+
+    def __init__(self, rounds=12, workers=2, max_pending=32, timeout=10.0):
+        self.rounds = rounds
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HasherBusy()
+        with self._lock:
+            self.pending += 1
+        start = time.perf_counter()
+        release = True
+        try:
+            if self.workers == 0:
+                return fn(*args)
+            future = self._get_executor().submit(fn, *args)
+            try:
+                return future.result(timeout=self.timeout)
+            except FutureTimeout:
+                with self._lock:
+                    self.timeouts += 1
+                # 还在排队的任务直接取消；已在子进程中执行的无法中断，等它结束后再归还名额，
+                # 使占用进程池的任务数仍不超过 max_pending
+                if not future.cancel():
+                    release = False
+                    future.add_done_callback(lambda f: self._slots.release())
+                raise HasherBusy()
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.pending -= 1
+                self.completed += 1
+                self.total_seconds += elapsed
+                self.max_seconds = max(self.max_seconds, elapsed)
+            if release:
+                self._slots.release()
+
+    def generate(self, password):
+        return self._run(hash_password, password, self.rounds)
+
+    def check(self, pw_hash, password):
+        return self._run(check_password, pw_hash, password)
+
+    def generate_many(self, passwords, rounds=None, chunk_size=8):
+        """批量计算哈希（管理后台导入名单），按块提交到同一个进程池，按原顺序返回。
+
+        同时最多占用一半的工作进程，其余进程仍可处理登录；每块占用一个排队名额，
+        等待名额或结果超时时抛出 HasherBusy。
+        """
+        rounds = rounds or self.rounds
+        chunks = [passwords[i:i + chunk_size] for i in range(0, len(passwords), chunk_size)]
+        if self.workers == 0:
+            return [pw_hash for chunk in chunks for pw_hash in hash_many(chunk, rounds)]
+        limit = max(1, self.workers // 2)
+        hashes = []
+        running = deque()
+        try:
+            for chunk in chunks:
+                if len(running) >= limit:
+                    hashes.extend(running.popleft().result(timeout=self.timeout))
+                if not self._slots.acquire(timeout=self.timeout):
+                    with self._lock:
+                        self.rejected += 1
+                    raise HasherBusy()
+                future = self._get_executor().submit(hash_many, chunk, rounds)
+                future.add_done_callback(lambda f: self._slots.release())
+                running.append(future)
+            while running:
+                hashes.extend(running.popleft().result(timeout=self.timeout))
+        except FutureTimeout:
+            with self._lock:
+                self.timeouts += 1
+            raise HasherBusy()
+        finally:
+            # 出错时取消还在排队的块，已在执行的块结束后归还名额
+            for future in running:
+                future.cancel()
+        return hashes
+
+    # 配置的 cost 改变后，登录成功时用新 cost 重新计算哈希
+    def needs_rehash(self, pw_hash):
+        return hash_cost(pw_hash) != self.rounds
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending': self.pending,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+                'total_seconds': self.total_seconds,
+                'avg_seconds': self.total_seconds / self.completed if self.completed else 0.0,
+                'max_seconds': self.max_seconds,
+            }
@@ -0,0 +1,92 @@
+import bisect
+import threading
+import time
+from collections import namedtuple
+from datetime import timedelta
+
+# 打卡时间段的只读快照，供模板和视图使用（字段与 SignPeriod 模型一致）
+PeriodInfo = namedtuple('PeriodInfo', ['id', 'name', 'start_date', 'end_date', 'exceptions', 'archive_state'],
+                        defaults=(None,))
+
+# 日历的一次完整加载结果：按开始日期排序的时间段、各自的开始日期、截至该位置的最大结束日期、按 id 索引。
+# 重新加载时整体替换，读取方先取得一个引用再使用，不会读到新旧混合的数据
+_Snapshot = namedtuple('_Snapshot', ['periods', 'starts', 'max_end', 'by_id'])
+
+
+class PeriodCalendar:
+    """进程内打卡日历：把所有时间段和休息日缓存为有序区间和日期集合。
+
+    loader() 返回 PeriodInfo 列表；generation() 返回数据库中的代数计数器，
+    其他进程修改时间段或休息日后会递增该计数器，本进程据此重新加载。
+    """
+
+    def __init__(self, loader, generation, check_interval=1.0):
+        self._loader = loader
+        self._generation = generation
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._loaded_generation = None
+        self._checked_at = 0.0
+        self._snapshot = _Snapshot((), (), (), {})
+
+    @staticmethod
+    def _build(periods):
+        periods = tuple(sorted(periods, key=lambda p: (p.start_date, p.id)))
+        max_end = []
+        for p in periods:
+            max_end.append(max(max_end[-1], p.end_date) if max_end else p.end_date)
+        return _Snapshot(periods, tuple(p.start_date for p in periods), tuple(max_end), {p.id: p for p in periods})
+
+    # 返回当前的日历快照，需要时先重新加载
+    def _ensure_fresh(self):
+        now = time.monotonic()
+        if self._loaded_generation is not None and now - self._checked_at < self.check_interval:
+            return self._snapshot
+        with self._lock:
+            if self._loaded_generation is not None and now - self._checked_at < self.check_interval:
+                return self._snapshot
+            generation = self._generation()
+            if generation != self._loaded_generation:
+                self._snapshot = self._build(self._loader())
+                self._loaded_generation = generation
+            self._checked_at = now
+            return self._snapshot
+
+    def invalidate(self):
+        # 本进程内提交修改后立即失效，下次访问时重新加载
+        with self._lock:
+            self._loaded_generation = None
+
+    def active_period(self, day):
+        snapshot = self._ensure_fresh()
+        # 二分查找最后一个 start_date <= day 的时间段，再向前找仍覆盖 day 的区间
+        i = bisect.bisect_right(snapshot.starts, day) - 1
+        while i >= 0 and snapshot.max_end[i] >= day:
+            if snapshot.periods[i].end_date >= day:
+                return snapshot.periods[i]
+            i -= 1
+        return None
+
+    def get(self, period_id):
+        return self._ensure_fresh().by_id.get(period_id)
+
+    # 全部时间段（按开始日期排序）
+    def periods(self):
+        return list(self._ensure_fresh().periods)
+
+    def is_rest_day(self, day, period=None):
+        if period is None:
+            period = self.active_period(day)
+        if period is None:
+            return False
+        return day in period.exceptions
+
+
+# 时间段内 day 之前最近的一个需要打卡的日期（跳过休息日），没有则返回 None
+def previous_required_day(period, day):
+    day -= timedelta(days=1)
+    while day >= period.start_date:
+        if day not in period.exceptions:
+            return day
+        day -= timedelta(days=1)
+    return None
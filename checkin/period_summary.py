@@ -0,0 +1,58 @@
+from datetime import date, timedelta
+
+import calendar_bits
+
+
+# 时间段内需要打卡的日期（去掉休息日）
+def required_days(period):
+    days = []
+    day = period.start_date
+    while day <= period.end_date:
+        if day not in period.exceptions:
+            days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def format_dates(days):
+    return ','.join(d.isoformat() for d in days)
+
+
+def parse_dates(text):
+    return [date.fromisoformat(d) for d in text.split(',')] if text else []
+
+
+def completion(sign_count, required_count):
+    return round(sign_count * 100.0 / required_count, 2) if required_count else 100.0
+
+
+def summarize(period, signed_dates, as_of):
+    """根据用户在时间段内的打卡日期计算汇总行的字段。
+
+    missed_dates 只记录 as_of 之前未打卡的日期；as_of 之后的缺卡在读取时由 missed_dates() 补齐。
+    """
+    signed = set(signed_dates)
+    required = required_days(period)
+    return {
+        'sign_count': len(signed),
+        'required_days': len(required),
+        'completion': completion(len(signed), len(required)),
+        'missed_dates': format_dates(d for d in required if d < as_of and d not in signed),
+        'last_signed_date': max(signed) if signed else None,
+        'refreshed_on': as_of,
+        'signed_bits': calendar_bits.to_bytes(period, calendar_bits.encode(period, signed)),
+    }
+
+
+def missed_dates(required, summary, as_of):
+    """返回截至 as_of（不含当天）的缺卡日期。required 为 required_days(period) 的结果，
+    summary 为 None 表示该用户尚无汇总行（从未打卡）。
+
+    汇总行在每次打卡时刷新，所以 refreshed_on 之后只可能在 refreshed_on 当天有打卡。
+    """
+    if summary is None:
+        return [d for d in required if d < as_of]
+    missed = parse_dates(summary.missed_dates)
+    missed.extend(d for d in required
+                  if summary.refreshed_on <= d < as_of and d != summary.last_signed_date)
+    return missed
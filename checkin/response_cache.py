@@ -0,0 +1,146 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import Response, request
+from markupsafe import Markup
+
+
+class CachedBody:
+    __slots__ = ('body', 'status', 'mimetype', 'headers')
+
+    def __init__(self, body, status, mimetype, headers):
+        self.body = body
+        self.status = status
+        self.mimetype = mimetype
+        self.headers = headers
+
+
+class ResponseCache:
+    """按 ETag 缓存渲染好的页面和导出文件的 LRU，总字节数不超过 max_bytes。
+
+    ETag 由 (路由, 参数, 数据代数) 计算，数据修改时递增代数即可让旧条目不再被命中，
+    不需要主动删除；旧条目在内存不足时按最近最少使用的顺序淘汰。
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, max_entry_bytes=4 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = min(max_entry_bytes, max_bytes)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def get(self, etag):
+        with self._lock:
+            entry = self._entries.get(etag)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(etag)
+            self.hits += 1
+            return entry
+
+    def put(self, etag, entry):
+        size = len(entry.body)
+        if size > self.max_entry_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(etag, None)
+            if old is not None:
+                self.size -= len(old.body)
+            self._entries[etag] = entry
+            self.size += size
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted.body)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'not_modified': self.not_modified,
+                    'entries': len(self._entries), 'bytes': self.size}
+
+    def _count_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def respond(self, versions, render, *extra):
+        """带 ETag 的条件 GET：浏览器带来的 If-None-Match 与当前 ETag 相同时返回 304，
+        否则从缓存返回页面，缓存中没有时调用 render() 生成。
+
+        versions 为页面依赖的数据代数，extra 为参数之外影响页面内容的其他值（如当天日期）；
+        必须在读取页面数据之前取得 versions，这样即使期间数据被修改，也只会把较新的内容存在旧 ETag 下。
+        render 返回字符串或 Response（流式导出边输出边收集，完整输出后再放入缓存）。
+        max_bytes 为 0 时不缓存，直接调用 render()。
+        """
+        if not self.max_bytes:
+            return render()
+        key = (request.endpoint, sorted(request.view_args.items()), sorted(request.args.items(multi=True)),
+               versions) + extra
+        etag = hashlib.blake2b(repr(key).encode('utf-8'), digest_size=16).hexdigest()
+        if etag in request.if_none_match:
+            self._count_not_modified()
+            response = Response(status=304)
+        else:
+            entry = self.get(etag)
+            if entry is not None:
+                response = Response(entry.body, status=entry.status, mimetype=entry.mimetype,
+                                    headers=entry.headers)
+            else:
+                response = render()
+                if not isinstance(response, Response):
+                    response = Response(response, mimetype='text/html')
+                if response.status_code == 200:
+                    self._store(etag, response)
+        response.set_etag(etag)
+        # 浏览器每次都带 ETag 向服务器确认；页面只对当前管理员可见，不允许共享缓存保存
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+
+    # 缓存页面中的一段 HTML：整页含有会话相关内容（如 CSRF 令牌）不能整体缓存时使用，
+    # key 中应包含片段依赖的数据代数
+    def fragment(self, key, render):
+        if not self.max_bytes:
+            return Markup(render())
+        name = 'fragment:' + hashlib.blake2b(repr(key).encode('utf-8'), digest_size=16).hexdigest()
+        entry = self.get(name)
+        if entry is None:
+            entry = CachedBody(render().encode('utf-8'), 200, 'text/html', [])
+            self.put(name, entry)
+        return Markup(entry.body.decode('utf-8'))
+
+    def _store(self, etag, response):
+        headers = [(k, v) for k, v in response.headers.items() if k not in ('Content-Type', 'Content-Length')]
+        if not response.is_streamed:
+            self.put(etag, CachedBody(response.get_data(), response.status_code, response.mimetype, headers))
+            return
+        chunks = response.response
+        limit = self.max_entry_bytes
+
+        def collect():
+            parts, size = [], 0
+            try:
+                for chunk in chunks:
+                    if parts is not None:
+                        size += len(chunk)
+                        if size <= limit:
+                            parts.append(chunk)
+                        else:
+                            parts = None
+                    yield chunk
+            finally:
+                close = getattr(chunks, 'close', None)
+                if close is not None:
+                    close()
+            # 只有完整输出且不超过单条上限的导出才放入缓存
+            if parts is not None:
+                self.put(etag, CachedBody(b''.join(parts), response.status_code, response.mimetype, headers))
+
+        response.response = collect()
@@ -0,0 +1,139 @@
+import csv
+import io
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from sqlalchemy.exc import IntegrityError
+
+from password_hasher import hash_password
+
+LOOKUP_CHUNK_SIZE = 500  # 查询已有学号时每次 IN 的学号数
+
+# 名单列顺序；第五列 password 可选，缺省时使用导入时指定的初始密码
+COLUMNS = ('username', 'name', 'Departments', 'QQ', 'password')
+
+RosterRow = namedtuple('RosterRow', 'line username name Departments QQ password')
+RowError = namedtuple('RowError', 'line username message')
+
+
+class ImportResult:
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.errors = []
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.created / self.seconds if self.seconds else 0.0
+
+    def error(self, line, username, message):
+        self.errors.append(RowError(line, username, message))
+
+
+# 名单文件可能来自 Excel，先尝试 UTF-8（含 BOM），失败再按 GBK 解码
+def decode(data):
+    for encoding in ('utf-8-sig', 'gbk'):
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    raise ValueError('无法识别文件编码，请另存为 UTF-8')
+
+
+# 解析 CSV/TSV 名单：根据首行是否包含制表符判断格式，首行不是学号时视为表头跳过
+def parse(text):
+    first_line = text.split('\n', 1)[0]
+    dialect = 'excel-tab' if '\t' in first_line else 'excel'
+    rows = []
+    for line, cells in enumerate(csv.reader(io.StringIO(text), dialect=dialect), start=1):
+        cells = [c.strip() for c in cells]
+        if not any(cells):
+            continue
+        if line == 1 and not cells[0].isdigit():
+            continue
+        cells = (cells + [''] * len(COLUMNS))[:len(COLUMNS)]
+        rows.append(RosterRow(line, *cells))
+    return rows
+
+
+def validate(rows, existing, departments, default_password, result):
+    """逐行校验，返回可以导入的行；existing 为数据库中已有学号的集合。"""
+    valid = []
+    seen = set()
+    for row in rows:
+        password = row.password or default_password
+        if len(row.username) != 12 or not row.username.isdigit():
+            result.error(row.line, row.username, '学号必须是 12 位数字')
+        elif not row.name or not row.QQ:
+            result.error(row.line, row.username, '姓名和 QQ 不能为空')
+        elif departments and row.Departments not in departments:
+            result.error(row.line, row.username, f'未知学院：{row.Departments}')
+        elif not password or len(password) < 6:
+            result.error(row.line, row.username, '初始密码至少 6 位')
+        elif row.username in existing:
+            result.error(row.line, row.username, '学号已注册')
+        elif row.username in seen:
+            result.error(row.line, row.username, '文件中学号重复')
+        else:
+            seen.add(row.username)
+            valid.append(row._replace(password=password))
+    return valid
+
+
+# 只查询名单中出现的学号（按唯一索引分块 IN 查询），不读取全部用户
+def existing_usernames(db, model, usernames):
+    usernames = sorted(set(usernames))
+    existing = set()
+    for start in range(0, len(usernames), LOOKUP_CHUNK_SIZE):
+        chunk = usernames[start:start + LOOKUP_CHUNK_SIZE]
+        existing.update(u for (u,) in db.session.query(model.username).filter(model.username.in_(chunk)))
+    return existing
+
+
+# 命令行导入：在独立进程池中并行计算 bcrypt，不占用处理登录请求的哈希进程池
+def hash_passwords(passwords, rounds, workers):
+    if workers <= 1 or len(passwords) < 2:
+        return [hash_password(p, rounds) for p in passwords]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        chunksize = max(1, len(passwords) // (workers * 4))
+        return list(pool.map(hash_password, passwords, repeat(rounds), chunksize=chunksize))
+
+
+def import_roster(db, model, text, default_password='', departments=None, rounds=10, workers=1,
+                  batch_size=500, dry_run=False, hasher=None):
+    """导入学生名单：分块查询名单中已注册的学号，并行哈希初始密码，
+    在同一事务中按批插入。任何一批插入失败时整体回滚。
+
+    给出 hasher（共用的 PasswordHasher）时在其进程池中哈希，队列已满时抛出 HasherBusy；
+    否则按 workers 创建独立的进程池（命令行导入）。
+    """
+    result = ImportResult()
+    begin = time.perf_counter()
+    rows = parse(text)
+    result.rows = len(rows)
+    existing = existing_usernames(db, model, [row.username for row in rows])
+    valid = validate(rows, existing, departments, default_password, result)
+    if valid and not dry_run:
+        passwords = [row.password for row in valid]
+        if hasher is not None:
+            hashes = hasher.generate_many(passwords, rounds)
+        else:
+            hashes = hash_passwords(passwords, rounds, workers)
+        try:
+            for start in range(0, len(valid), batch_size):
+                db.session.execute(db.insert(model), [
+                    dict(username=row.username, name=row.name, Departments=row.Departments,
+                         QQ=row.QQ, password=pw_hash, is_admin=False)
+                    for row, pw_hash in zip(valid[start:start + batch_size], hashes[start:start + batch_size])
+                ])
+            db.session.commit()
+            result.created = len(valid)
+        except IntegrityError:
+            # 导入期间有学生自行注册了同一学号
+            db.session.rollback()
+            result.error(0, '', '写入时学号冲突（可能刚有学生自行注册），已全部回滚，请重新导入')
+    result.seconds = time.perf_counter() - begin
+    return result
@@ -0,0 +1,157 @@
+import re
+from collections import namedtuple
+
+from markupsafe import Markup, escape
+from sqlalchemy import text
+
+import services
+
+# 打卡内容全文索引：FTS5 虚拟表，rowid 与 check_in_record.id 相同。
+# trigram 分词不依赖中文分词，任意连续 3 个字以上的子串都可以走索引。
+# 无内容表（content=''）只保存索引，不再保存第二份原文；摘要从内容存储中读取原文生成，
+# 删除索引时也要提供原文
+TABLE = 'check_in_fts'
+CREATE_TABLE = f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5(content, content='', tokenize='trigram')"
+# 用控制字符标记命中位置，转义后再替换成 <mark>，避免内容中的 HTML 被渲染
+_START, _END = '\x02', '\x03'
+SNIPPET_LENGTH = 40
+MIN_TERM_LENGTH = 3  # trigram 索引能匹配的最短词
+SCAN_BATCH_SIZE = 200  # 含短词时每次读取并检查的记录数
+SCAN_LIMIT = 2000  # 含短词时一次搜索最多检查的记录数，超过后停止并提示缩小范围
+
+SearchHit = namedtuple('SearchHit', 'record_id date username name department snippet')
+
+
+def index_content(session, record_id, content):
+    session.execute(text(f'INSERT INTO {TABLE} (rowid, content) VALUES (:id, :content)'),
+                    {'id': record_id, 'content': content})
+
+
+def index_many(session, items):
+    if items:
+        session.execute(text(f'INSERT INTO {TABLE} (rowid, content) VALUES (:id, :content)'),
+                        [{'id': record_id, 'content': content} for record_id, content in items])
+
+
+# 无内容表不支持 DELETE，用 'delete' 命令按原文删除词条；items 为 (记录 id, 原文)
+def remove(session, items):
+    items = list(items)
+    if items:
+        session.execute(text(f"INSERT INTO {TABLE} ({TABLE}, rowid, content) VALUES ('delete', :id, :content)"),
+                        [{'id': record_id, 'content': content} for record_id, content in items])
+
+
+# 从索引中删除记录，须在删除内容之前调用。内容已无法读取的记录留在索引中，
+# 搜索时连接不到打卡记录，不会出现在结果里
+def remove_records(session, records):
+    remove(session, services.content_storage.load_many(records).items())
+
+
+def indexed_ids(session, record_ids):
+    if not record_ids:
+        return set()
+    rows = session.execute(text(f'SELECT rowid FROM {TABLE} WHERE rowid IN ({",".join(str(int(i)) for i in record_ids)})'))
+    return {row[0] for row in rows}
+
+
+def optimize(session):
+    session.execute(text(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')"))
+
+
+def highlight(snippet):
+    return Markup(escape(snippet)).replace(_START, Markup('<mark>')).replace(_END, Markup('</mark>'))
+
+
+# 空格分隔的多个词都必须出现；每个词作为短语加引号，避免 FTS5 语法字符引发错误
+def _match_expression(terms):
+    return ' '.join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+# trigram 分词不区分大小写，摘要中的高亮和短词匹配也不区分
+def _term_pattern(terms):
+    return re.compile('|'.join(re.escape(term) for term in sorted(terms, key=len, reverse=True)), re.IGNORECASE)
+
+
+def _snippet(content, pattern, width=SNIPPET_LENGTH):
+    match = pattern.search(content)
+    begin = max((match.start() if match else 0) - width // 2, 0)
+    piece = pattern.sub(lambda m: _START + m.group(0) + _END, content[begin:begin + width])
+    return ('…' if begin > 0 else '') + piece + ('…' if begin + width < len(content) else '')
+
+
+def _hit(row, snippet):
+    return SearchHit(row.id, row.date, row.username, row.name, row.department, snippet)
+
+
+def search(session, query, start=None, end=None, department=None, page=1, per_page=20):
+    """按相关度排序返回 (命中列表, 是否还有下一页, 是否因扫描上限而提前停止)。
+
+    不短于 3 个字的词使用 FTS5 索引（bm25 排序）；含短词时按候选记录逐批读取内容检查，
+    最多检查 SCAN_LIMIT 条，超过后返回已找到的命中并提示用户输入更长的词或缩小日期范围。
+    短词（以及摘要）都从内容存储中读取原文判断。
+    """
+    terms = query.split()
+    if not terms:
+        return [], False, False
+    params = {}
+    filters = []
+    if start is not None:
+        filters.append('r.date >= :start')
+        params['start'] = start.isoformat()
+    if end is not None:
+        filters.append('r.date <= :end')
+        params['end'] = end.isoformat()
+    if department:
+        filters.append('u."Departments" = :department')
+        params['department'] = department
+
+    indexed = [term for term in terms if len(term) >= MIN_TERM_LENGTH]
+    short = [term for term in terms if len(term) < MIN_TERM_LENGTH]
+    if indexed:
+        filters.insert(0, f'{TABLE} MATCH :match')
+        params['match'] = _match_expression(indexed)
+        source = f'{TABLE} JOIN check_in_record r ON r.id = {TABLE}.rowid'
+        order = 'rank'
+    else:
+        source = 'check_in_record r'
+        order = 'r.date DESC, r.id DESC'
+    sql = (f'SELECT r.id, r.date, u.username, u.name, u."Departments" AS department, r.file_path '
+           f'FROM {source} JOIN user u ON u.id = r.user_pk '
+           f'{"WHERE " + " AND ".join(filters) if filters else ""} '
+           f'ORDER BY {order} LIMIT :limit OFFSET :offset')
+    pattern = _term_pattern(terms)
+    if not short:
+        params.update(limit=per_page + 1, offset=(page - 1) * per_page)
+        rows = session.execute(text(sql), params).fetchall()
+        contents = services.content_storage.load_many(rows[:per_page])
+        hits = [_hit(row, highlight(_snippet(contents[row.id], pattern)) if row.id in contents else '[读取失败]')
+                for row in rows[:per_page]]
+        return hits, len(rows) > per_page, False
+
+    # 含短词：候选记录逐批读取原文，所有短词都出现才算命中，跳过前几页的命中后取够一页
+    short_patterns = [re.compile(re.escape(term), re.IGNORECASE) for term in short]
+    skip = (page - 1) * per_page
+    hits = []
+    offset = 0
+    truncated = False
+    while len(hits) <= per_page:
+        if offset >= SCAN_LIMIT:
+            truncated = True
+            break
+        params.update(limit=min(SCAN_BATCH_SIZE, SCAN_LIMIT - offset), offset=offset)
+        rows = session.execute(text(sql), params).fetchall()
+        if not rows:
+            break
+        offset += len(rows)
+        contents = services.content_storage.load_many(rows)
+        for row in rows:
+            content = contents.get(row.id)
+            if content is None or not all(p.search(content) for p in short_patterns):
+                continue
+            if skip:
+                skip -= 1
+                continue
+            hits.append(_hit(row, highlight(_snippet(content, pattern))))
+            if len(hits) > per_page:
+                break
+    return hits[:per_page], len(hits) > per_page, truncated
@@ -0,0 +1,115 @@
+from content_store import ContentStorage, FileBackend, DatabaseBackend, SegmentBackend
+from admission import AdmissionController, TokenBucketLimiter
+from checkin_writer import CheckInWriter
+from extensions import db, login_manager
+from metrics import Metrics
+from models import User, CheckInContent, ContentFingerprint, LshBucket, DuplicateFlag, current_generation, \
+    load_period_infos
+from near_duplicates import NearDuplicateIndex
+from password_hasher import PasswordHasher
+from period_calendar import PeriodCalendar
+from response_cache import ResponseCache
+from static_assets import StaticAssets
+from user_cache import UserCache, UserSnapshot
+
+# 进程内共享的服务对象，由 init_app() 按应用配置创建；视图中通过 services.<名称> 访问
+period_calendar = None
+content_storage = None
+password_hasher = None
+user_cache = None
+checkin_writer = None
+metrics = None
+duplicate_index = None
+response_cache = None
+static_assets = None
+admission = None
+rate_limiters = {}
+
+
+def load_user_snapshot(user_pk):
+    user = db.session.get(User, user_pk)
+    return UserSnapshot.from_user(user) if user else None
+
+
+@login_manager.user_loader
+def load_user(user_id):
+    return user_cache.get(int(user_id))
+
+
+def init_app(app):
+    global period_calendar, content_storage, password_hasher, user_cache, checkin_writer, metrics, duplicate_index, \
+        response_cache, static_assets, admission, rate_limiters
+    config = app.config
+    metrics = Metrics()
+    period_calendar = PeriodCalendar(
+        load_period_infos,
+        lambda: current_generation('periods'),
+        check_interval=config['CALENDAR_CHECK_INTERVAL']
+    )
+    content_storage = ContentStorage(db, CheckInContent, [
+        FileBackend(config['UPLOAD_FOLDER'], session=db.session),
+        DatabaseBackend(compress=config['CONTENT_COMPRESS']),
+        SegmentBackend(config['UPLOAD_FOLDER'], compress=config['CONTENT_COMPRESS'])
+    ], default=config['CONTENT_BACKEND'], observer=metrics.observe_content_io)
+    password_hasher = PasswordHasher(
+        rounds=config['BCRYPT_LOG_ROUNDS'],
+        workers=config['PASSWORD_HASH_WORKERS'],
+        max_pending=config['PASSWORD_HASH_QUEUE']
+    )
+    user_cache = UserCache(load_user_snapshot,
+                           lambda: current_generation('users'),
+                           maxsize=config['USER_CACHE_SIZE'],
+                           check_interval=config['USER_CACHE_CHECK_INTERVAL'])
+    duplicate_index = NearDuplicateIndex(db, ContentFingerprint, LshBucket, DuplicateFlag,
+                                         threshold=config['DUPLICATE_THRESHOLD'])
+    response_cache = ResponseCache(max_bytes=config['RESPONSE_CACHE_BYTES'],
+                                   max_entry_bytes=config['RESPONSE_CACHE_MAX_ENTRY'])
+    static_assets = StaticAssets(app.static_folder, config['STATIC_BUILD_FOLDER'],
+                                 webp_quality=config['STATIC_WEBP_QUALITY'], max_age=config['STATIC_MAX_AGE'])
+    admission = AdmissionController(config['ADMISSION_MAX_ACTIVE'], config['ADMISSION_CLASSES'],
+                                    reserve=config['ADMISSION_ADMIN_RESERVE'],
+                                    timeout=config['ADMISSION_QUEUE_TIMEOUT'], observer=metrics.observe_admission)
+    rate_limiters = {
+        'main.login': TokenBucketLimiter(config['LOGIN_RATE_PER_MINUTE'] / 60.0, config['LOGIN_RATE_BURST'],
+                                         max_keys=config['RATE_LIMIT_KEYS']),
+        'main.CheckIn': TokenBucketLimiter(config['CHECKIN_RATE_PER_MINUTE'] / 60.0, config['CHECKIN_RATE_BURST'],
+                                           max_keys=config['RATE_LIMIT_KEYS']),
+    }
+    checkin_writer = None
+    if config['CHECKIN_GROUP_COMMIT'] or config['CHECKIN_ASYNC_WRITES']:
+        from checkins import save_checkin
+        checkin_writer = CheckInWriter(app, db, save_checkin, batch_size=config['CHECKIN_BATCH_SIZE'],
+                                       max_wait=config['CHECKIN_BATCH_WAIT'])
+    metrics.add_collector(_service_metrics)
+
+
+# 输出各服务对象已有的统计，抓取 /admin/metrics 时调用
+def _service_metrics():
+    hasher = password_hasher.stats()
+    cache = user_cache.stats()
+    pages = response_cache.stats()
+    samples = [
+        ('checkin_bcrypt_seconds_total', 'counter', 'bcrypt 哈希/校验累计耗时', hasher['total_seconds']),
+        ('checkin_bcrypt_operations_total', 'counter', 'bcrypt 哈希/校验次数', hasher['completed']),
+        ('checkin_bcrypt_rejected_total', 'counter', '哈希队列已满被拒绝的次数', hasher['rejected']),
+        ('checkin_bcrypt_timeouts_total', 'counter', '哈希超时（返回繁忙）的次数', hasher['timeouts']),
+        ('checkin_bcrypt_pending', 'gauge', '正在执行或排队的哈希任务', hasher['pending']),
+        ('checkin_bcrypt_max_seconds', 'gauge', '单次哈希最长耗时', hasher['max_seconds']),
+        ('checkin_user_cache_hits_total', 'counter', '登录用户缓存命中次数', cache['hits']),
+        ('checkin_user_cache_misses_total', 'counter', '登录用户缓存未命中次数', cache['misses']),
+        ('checkin_user_cache_size', 'gauge', '登录用户缓存条数', cache['size']),
+        ('checkin_response_cache_hits_total', 'counter', '管理页面缓存命中次数', pages['hits']),
+        ('checkin_response_cache_misses_total', 'counter', '管理页面缓存未命中次数', pages['misses']),
+        ('checkin_response_cache_not_modified_total', 'counter', '返回 304 的次数', pages['not_modified']),
+        ('checkin_response_cache_bytes', 'gauge', '管理页面缓存占用字节数', pages['bytes']),
+    ]
+    if checkin_writer is not None:
+        writer = checkin_writer.stats()
+        samples += [
+            ('checkin_writer_pending', 'gauge', '等待后台写入的打卡', writer['pending']),
+            ('checkin_writer_completed_total', 'counter', '后台写入完成的打卡', writer['completed']),
+            ('checkin_writer_failed_total', 'counter', '后台写入失败的打卡', writer['failed']),
+            ('checkin_writer_duplicates_total', 'counter', '当天已打过卡被忽略的提交', writer['duplicates']),
+            ('checkin_writer_batches_total', 'counter', '批量提交的事务数', writer['batches']),
+        ]
+    return samples
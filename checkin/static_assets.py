@@ -0,0 +1,174 @@
+import gzip
+import hashlib
+import io
+import json
+import mimetypes
+import os
+
+from flask import current_app, request, send_file
+from flask.sessions import SecureCookieSessionInterface
+
+try:
+    import brotli
+except ImportError:  # 未安装 Brotli 时只生成 gzip 版本
+    brotli = None
+
+try:
+    from PIL import Image
+except ImportError:  # 未安装 Pillow 时不转换图片格式
+    Image = None
+
+# 静态资源指纹：按内容哈希把 static 目录下的文件复制为 <名称>.<哈希>.<扩展名>，
+# 文本文件另外生成 .gz/.br 预压缩版本，JPEG/PNG 可另外生成 .webp 版本，对应关系写入 manifest.json。
+# 带指纹的地址内容永不改变，响应带一年的 immutable 缓存头；文件修改后哈希随之改变，页面引用新地址。
+# 输出目录的布局与 nginx gzip_static/brotli_static 一致，也可以由 nginx 直接提供
+MANIFEST = 'manifest.json'
+HASH_LENGTH = 12
+COMPRESSIBLE = {'text/css', 'text/javascript', 'application/javascript', 'application/json', 'image/svg+xml',
+                'text/plain', 'text/html'}
+CONVERTIBLE = {'image/jpeg', 'image/png'}
+ONE_YEAR = 365 * 24 * 3600
+
+
+def _compress_gzip(data):
+    return gzip.compress(data, 9, mtime=0)
+
+
+def _compress_brotli(data):
+    return brotli.compress(data, quality=11)
+
+
+# 按优先顺序排列：客户端都接受时优先返回 br
+ENCODINGS = [('br', '.br', _compress_brotli if brotli else None), ('gzip', '.gz', _compress_gzip)]
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # 多个工作进程可能同时构建，先写临时文件再改名
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+# Flask-Login 在每个请求结束时都会读取 session，Flask 因此给所有响应加上 Vary: Cookie，
+# 浏览器在登录或会话更新后会重新下载静态文件；静态文件请求没有修改会话时不保存会话
+class StaticSessionInterface(SecureCookieSessionInterface):
+    def save_session(self, app, session, response):
+        if request.endpoint == 'static' and not session.modified:
+            return
+        super().save_session(app, session, response)
+
+
+class StaticAssets:
+    """静态资源清单：构建指纹文件、改写 url_for('static', ...) 生成的地址并按请求头选择压缩版本返回。"""
+
+    def __init__(self, source, output, webp_quality=None, max_age=ONE_YEAR):
+        self.source = source
+        self.output = os.path.abspath(output)
+        self.webp_quality = webp_quality
+        self.max_age = max_age
+        self.manifest = {}  # 原文件名 -> 清单条目
+        self._files = {}  # 指纹文件名 -> 清单条目
+
+    def sources(self):
+        for root, dirs, files in os.walk(self.source):
+            dirs.sort()
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                yield os.path.relpath(path, self.source).replace(os.sep, '/')
+
+    def build(self, force=False):
+        """为 static 目录下的每个文件生成指纹文件和各个版本，写入 manifest.json 并返回清单。
+
+        指纹文件名包含内容哈希，已存在的文件说明内容没有变化，直接复用；force 时全部重新生成
+        （例如修改了 STATIC_WEBP_QUALITY 之后）。
+        """
+        manifest = {name: self._build_file(name, force) for name in self.sources()}
+        _write(os.path.join(self.output, MANIFEST),
+               json.dumps(manifest, ensure_ascii=False, indent=2, sort_keys=True).encode('utf-8'))
+        self.manifest = manifest
+        self._files = {entry['file']: entry for entry in manifest.values()}
+        return manifest
+
+    def _build_file(self, name, force):
+        with open(os.path.join(self.source, name), 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+        stem, ext = os.path.splitext(name)
+        built = f'{stem}.{digest}{ext}'
+        mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        entry = {'file': built, 'hash': digest, 'mimetype': mimetype, 'size': len(data), 'variants': {}}
+        target = os.path.join(self.output, built)
+        if force or not os.path.exists(target):
+            _write(target, data)
+        if mimetype in COMPRESSIBLE:
+            for encoding, suffix, compress in ENCODINGS:
+                if compress is not None:
+                    self._build_variant(entry, encoding, target + suffix, force, lambda: compress(data))
+        if mimetype in CONVERTIBLE and Image is not None and self.webp_quality:
+            self._build_variant(entry, 'webp', target + '.webp', force, lambda: self._to_webp(data))
+        return entry
+
+    # 只有比原文件小的版本才写入并记入清单
+    def _build_variant(self, entry, key, path, force, encode):
+        if force or not os.path.exists(path):
+            data = encode()
+            if len(data) >= entry['size']:
+                if os.path.exists(path):
+                    os.remove(path)
+                return
+            _write(path, data)
+        entry['variants'][key] = {'file': os.path.basename(path), 'size': os.path.getsize(path)}
+
+    def _to_webp(self, data):
+        buffer = io.BytesIO()
+        with Image.open(io.BytesIO(data)) as image:
+            image.save(buffer, 'WEBP', quality=self.webp_quality, method=6)
+        return buffer.getvalue()
+
+    # app.url_defaults 回调：url_for('static', filename='style.css') 生成 /static/style.<哈希>.css
+    def url_defaults(self, endpoint, values):
+        if endpoint == 'static':
+            entry = self.manifest.get(values.get('filename'))
+            if entry is not None:
+                values['filename'] = entry['file']
+
+    def _choose(self, entry):
+        variants = entry['variants']
+        if 'webp' in variants and any(value == 'image/webp' and quality > 0
+                                      for value, quality in request.accept_mimetypes):
+            return variants['webp']['file'], 'image/webp', None
+        for encoding, _, _ in ENCODINGS:
+            if encoding in variants and request.accept_encodings[encoding] > 0:
+                return variants[encoding]['file'], entry['mimetype'], encoding
+        return entry['file'], entry['mimetype'], None
+
+    # 替换 Flask 自带的 static 视图；不带指纹的地址（例如旧页面中的 /static/style.css）仍按原方式返回
+    def send(self, filename):
+        entry = self._files.get(filename)
+        if entry is None:
+            return current_app.send_static_file(filename)
+        name, mimetype, encoding = self._choose(entry)
+        response = send_file(os.path.join(self.output, name), mimetype=mimetype, max_age=self.max_age,
+                             etag=name, conditional=True)
+        response.cache_control.immutable = True
+        if encoding:
+            response.content_encoding = encoding
+        vary = [header for header, keys in (('Accept', ('webp',)), ('Accept-Encoding', ('br', 'gzip')))
+                if any(key in entry['variants'] for key in keys)]
+        if vary:
+            response.vary.update(vary)
+        return response
+
+    def install(self, app):
+        """启动时构建清单并接管静态文件地址；输出目录不可写时记录警告，退回 Flask 默认的静态文件处理。"""
+        try:
+            self.build()
+        except OSError as e:
+            app.logger.warning('静态资源构建失败，使用未加指纹的地址：%s', e)
+            return
+        app.url_defaults(self.url_defaults)
+        app.view_functions['static'] = self.send
+        if type(app.session_interface) is SecureCookieSessionInterface:
+            app.session_interface = StaticSessionInterface()
@@ -0,0 +1,96 @@
+import os
+import sys
+
+import pytest
+
+# 应用模块直接按文件名导入（import calendar_bits），测试从任意目录运行时都把应用目录加入搜索路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PASSWORD = 'secret1'
+
+
+@pytest.fixture
+def app_config():
+    """测试模块可重新定义此夹具，覆盖 app 夹具的配置项。"""
+    return {}
+
+
+@pytest.fixture
+def app(tmp_path, app_config):
+    """使用临时目录中的数据库、上传目录和归档目录的应用，已升级到最新版本，测试期间保持应用上下文。"""
+    from app import create_app
+    import db_bootstrap
+    from extensions import db
+    app = create_app({
+        'TESTING': True,
+        'WTF_CSRF_ENABLED': False,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "users.db"}',
+        'SQLALCHEMY_BINDS': {'archive': f'sqlite:///{tmp_path / "archive.db"}'},
+        'UPLOAD_FOLDER': str(tmp_path / 'uploads'),
+        'ARCHIVE_FOLDER': str(tmp_path / 'archive'),
+        'STATIC_FINGERPRINT': False,
+        'ADMISSION_CONTROL': False,
+        'PASSWORD_HASH_WORKERS': 0,
+        'BCRYPT_LOG_ROUNDS': 4,
+        'ROSTER_HASH_ROUNDS': 4,
+        **app_config,
+    })
+    with app.app_context():
+        db_bootstrap.upgrade(db, log=lambda message: None)
+        yield app
+        db.session.remove()
+        import services
+        if services.checkin_writer is not None:
+            services.checkin_writer.shutdown()
+
+
+@pytest.fixture
+def make_user(app):
+    """创建用户并返回其 id。"""
+    from extensions import db
+    from models import User
+    from password_hasher import hash_password
+    password = hash_password(PASSWORD, 4)
+
+    def make(username, is_admin=False, department='理学院'):
+        user = User(username=username, name=f'学生{username[-2:]}', password=password, Departments=department,
+                    QQ='1', is_admin=is_admin)
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+    return make
+
+
+@pytest.fixture
+def login(app):
+    """login(client, 学号)：用测试密码登录。"""
+    from flask import g
+
+    def login(client, username):
+        response = client.post('/login', data={'username': username, 'password': PASSWORD})
+        assert response.status_code == 302, response.data[:300]
+        # 测试期间应用上下文一直存在，请求共用同一个 g：去掉登录时保存的 User 对象，
+        # 之后的请求照常通过用户缓存加载
+        g.pop('_login_user', None)
+    return login
+
+
+@pytest.fixture
+def count_queries(app):
+    """with count_queries() as statements: ... 统计期间主库执行的 SQL 语句。"""
+    from contextlib import contextmanager
+    from sqlalchemy import event
+    from extensions import db
+
+    @contextmanager
+    def counter():
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+    return counter
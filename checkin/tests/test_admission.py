@@ -0,0 +1,189 @@
+import threading
+import time
+
+import pytest
+from flask import Flask
+from flask_login import LoginManager, UserMixin
+
+import admission
+from admission import ADMIN, AUTH, CHECKIN, AdmissionController, Overloaded, TokenBucketLimiter
+from metrics import Metrics
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError('条件未在限定时间内满足')
+        time.sleep(0.005)
+
+
+class FakeUser(UserMixin):
+    def __init__(self, user_id, is_admin):
+        self.id = user_id
+        self.is_admin = is_admin
+
+
+# 请求头 X-User 指定当前用户，以 admin 开头的是管理员
+def make_app():
+    app = Flask(__name__)
+    login_manager = LoginManager(app)
+
+    @login_manager.request_loader
+    def load_user(req):
+        user_id = req.headers.get('X-User')
+        return FakeUser(user_id, user_id.startswith('admin')) if user_id else None
+
+    return app
+
+
+# 在后台线程中申请名额，结果（等待秒数或 Overloaded）写入 results
+def acquire_later(controller, route_class, results):
+    def run():
+        try:
+            results.append(controller.acquire(route_class))
+        except Overloaded as e:
+            results.append(e)
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def test_queues_then_sheds_when_queue_is_full():
+    controller = AdmissionController(10, {CHECKIN: (1, 1)}, timeout=5.0)
+    assert controller.acquire(CHECKIN) == 0.0
+    results = []
+    thread = acquire_later(controller, CHECKIN, results)
+    wait_until(lambda: controller.queued[CHECKIN] == 1)
+    # 并发和排队都已满：后来的请求立即被拒绝，不等待
+    with pytest.raises(Overloaded) as excinfo:
+        controller.acquire(CHECKIN)
+    assert excinfo.value.reason == 'queue_full'
+    assert controller.rejected[CHECKIN] == 1
+    controller.release(CHECKIN)
+    thread.join()
+    assert len(results) == 1 and results[0] > 0
+    assert controller.active[CHECKIN] == 1 and controller.queued[CHECKIN] == 0
+
+
+def test_queued_request_times_out():
+    controller = AdmissionController(10, {CHECKIN: (1, 2)}, timeout=0.05)
+    controller.acquire(CHECKIN)
+    with pytest.raises(Overloaded) as excinfo:
+        controller.acquire(CHECKIN)
+    assert excinfo.value.reason == 'timeout'
+    assert controller.queued[CHECKIN] == 0 and controller.rejected[CHECKIN] == 1
+
+
+def test_reserve_is_kept_for_admin():
+    controller = AdmissionController(3, {CHECKIN: (3, 0), ADMIN: (1, 0)}, reserve=1, timeout=0.05)
+    controller.acquire(CHECKIN)
+    controller.acquire(CHECKIN)
+    # 学生请求只能用到 max_active - reserve 个名额
+    with pytest.raises(Overloaded):
+        controller.acquire(CHECKIN)
+    assert controller.acquire(ADMIN) == 0.0
+    with pytest.raises(Overloaded):
+        controller.acquire(ADMIN)
+
+
+def test_release_wakes_waiters_of_other_classes():
+    controller = AdmissionController(1, {CHECKIN: (1, 1), AUTH: (1, 1)}, timeout=5.0)
+    controller.acquire(CHECKIN)
+    results = []
+    thread = acquire_later(controller, AUTH, results)
+    wait_until(lambda: controller.queued[AUTH] == 1)
+    controller.release(CHECKIN)
+    thread.join()
+    assert results and not isinstance(results[0], Overloaded)
+    assert controller.active == {CHECKIN: 0, AUTH: 1}
+
+
+def test_observer_sees_queue_changes():
+    events = []
+    controller = AdmissionController(10, {CHECKIN: (1, 1)}, timeout=5.0,
+                                     observer=lambda *args: events.append(args))
+    controller.acquire(CHECKIN)
+    thread = acquire_later(controller, CHECKIN, [])
+    wait_until(lambda: controller.queued[CHECKIN] == 1)
+    controller.release(CHECKIN)
+    thread.join()
+    assert events == [(CHECKIN, 1, 0), (CHECKIN, 1, 1), (CHECKIN, 0, 1), (CHECKIN, 0, 0), (CHECKIN, 1, 0)]
+
+
+def test_token_bucket_burst_then_refill():
+    limiter = TokenBucketLimiter(rate=2.0, burst=3)
+    assert [limiter.take('a', now=0.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.take('a', now=0.0) == pytest.approx(0.5)
+    assert limiter.take('b', now=0.0) == 0.0  # 各键独立计数
+    assert limiter.take('a', now=0.5) == 0.0
+    assert limiter.limited == 1
+
+
+def test_token_bucket_forgets_oldest_keys():
+    limiter = TokenBucketLimiter(rate=1.0, burst=1, max_keys=2)
+    limiter.take('a', now=0.0)
+    limiter.take('b', now=0.0)
+    limiter.take('c', now=0.0)
+    # a 已被淘汰，按满桶重新开始；c 仍在限速中
+    assert limiter.take('a', now=0.0) == 0.0
+    assert limiter.take('c', now=0.0) > 0
+
+
+def test_install_returns_503_with_retry_after():
+    app = make_app()
+    controller = AdmissionController(1, {ADMIN: (1, 0)}, timeout=0.05)
+    admission.install(app, controller, {}, Metrics(), retry_after=7)
+    entered = threading.Event()
+    leave = threading.Event()
+
+    @app.route('/admin/report')
+    def report():
+        entered.set()
+        leave.wait(2)
+        return 'ok'
+
+    @app.route('/index')
+    def index():
+        return 'ok'
+
+    client = app.test_client()
+    admin = {'X-User': 'admin1'}
+    thread = threading.Thread(target=lambda: app.test_client().get('/admin/report', headers=admin))
+    thread.start()
+    assert entered.wait(2)
+    busy = client.get('/admin/report', headers=admin)
+    assert busy.status_code == 503 and busy.headers['Retry-After'] == '7'
+    # 不受控的路由不受影响
+    assert client.get('/index').status_code == 200
+    leave.set()
+    thread.join()
+    assert client.get('/admin/report', headers=admin).status_code == 200
+    assert controller.active[ADMIN] == 0
+
+
+def test_admin_class_only_for_admins():
+    app = make_app()
+    for user, expected in ((None, None), ('student1', None), ('admin1', ADMIN)):
+        headers = {'X-User': user} if user else {}
+        with app.test_request_context('/admin/report', headers=headers):
+            assert admission.route_class('main.report') == expected
+
+
+def test_login_rate_limit_is_per_client_address():
+    app = make_app()
+    limiter = TokenBucketLimiter(rate=0.001, burst=1)
+    admission.install(app, AdmissionController(4, {AUTH: (4, 0)}), {'main.login': limiter}, Metrics())
+
+    @app.route('/login', endpoint='main.login', methods=['POST'])
+    def login():
+        return 'ok'
+
+    client = app.test_client()
+    attacker = {'REMOTE_ADDR': '10.0.0.1'}
+    owner = {'REMOTE_ADDR': '10.0.0.2'}
+    form = {'username': '000000000002'}
+    assert client.post('/login', data=form, environ_base=attacker).status_code == 200
+    assert client.post('/login', data=form, environ_base=attacker).status_code == 429
+    # 别人用同一学号反复尝试，不影响本人从自己的地址登录
+    assert client.post('/login', data=form, environ_base=owner).status_code == 200
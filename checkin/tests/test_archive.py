@@ -0,0 +1,125 @@
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import text
+
+import archive
+import search_index
+import services
+from checkins import commit_checkin, rebuild_period_summary
+from extensions import db
+from models import ArchivedRecord, CheckInRecord, PeriodUserSummary, SignPeriod, UserCheckInStats, bump_generation
+
+START = date(2024, 3, 1)
+TODAY = date(2024, 4, 1)
+
+
+def noop(message):
+    pass
+
+
+@pytest.fixture
+def closed_period(app, make_user):
+    """已结束的时间段：两名学生共打卡 7 次，返回时间段 id 和 {(学号, 日期): 内容}。"""
+    period = SignPeriod(name='第一阶段', start_date=START, end_date=START + timedelta(days=9))
+    db.session.add(period)
+    bump_generation('periods')
+    db.session.commit()
+    services.period_calendar.invalidate()
+    info = services.period_calendar.get(period.id)
+    contents = {}
+    for username, days in (('000000000002', range(4)), ('000000000003', range(0, 6, 2))):
+        user_pk = make_user(username)
+        for i in days:
+            day = START + timedelta(days=i)
+            contents[username, day] = f'{username} 第{i}天读《红楼梦》的笔记。' * 5
+            commit_checkin(user_pk, username, info, day, contents[username, day])
+    # 归档开始时按截止日期重建一次汇总，这里先重建，便于比较归档前后
+    rebuild_period_summary(info, TODAY)
+    db.session.commit()
+    return period.id, contents
+
+
+def summaries(period_id):
+    summary = PeriodUserSummary.query.filter_by(period_id=period_id).order_by(PeriodUserSummary.user_id)
+    stats = UserCheckInStats.query.filter_by(period_id=period_id).order_by(UserCheckInStats.user_id)
+    return ([(s.user_id, s.sign_count, s.completion, s.missed_dates, s.signed_bits) for s in summary],
+            [(s.user_id, s.count, s.current_streak, s.last_checkin_date) for s in stats])
+
+
+def search_results(query):
+    hits, _, _ = search_index.search(db.session, query, per_page=100)
+    return sorted((hit.username, hit.date) for hit in hits)
+
+
+def record_contents():
+    records = CheckInRecord.query.all()
+    return {(r.user_id, r.date): services.content_storage.load(r) for r in records}
+
+
+def archived_rows(period_id):
+    with db.engines['archive'].connect() as conn:
+        return conn.execute(text('SELECT count(*) FROM archived_record WHERE period_id = :id'),
+                            {'id': period_id}).scalar()
+
+
+def test_archive_and_restore_round_trip(closed_period):
+    period_id, contents = closed_period
+    before = summaries(period_id)
+    hits = search_results('红楼梦')
+    assert len(hits) == 7
+
+    assert archive.archive_period(period_id, batch_size=3, today=TODAY, log=noop) == 7
+    db.session.remove()
+    assert db.session.get(SignPeriod, period_id).archive_state == archive.ARCHIVED
+    assert summaries(period_id) == before
+    assert CheckInRecord.query.count() == 0
+    assert archived_rows(period_id) == 7
+    rows = ArchivedRecord.query.filter_by(period_id=period_id).all()
+    loaded = archive.load_contents(rows)
+    assert {(r.user_id, r.date): loaded[r.id] for r in rows} == contents
+    assert search_results('红楼梦') == []
+
+    assert archive.restore_period(period_id, batch_size=3, log=noop) == 7
+    db.session.remove()
+    assert db.session.get(SignPeriod, period_id).archive_state is None
+    assert summaries(period_id) == before
+    assert archived_rows(period_id) == 0
+    assert record_contents() == contents
+    assert search_results('红楼梦') == hits
+    day = (START + timedelta(days=2)).isoformat()
+    assert search_results('第2天') == [('000000000002', day), ('000000000003', day)]
+
+
+def test_archive_rerun_after_interruption(closed_period, monkeypatch):
+    period_id, contents = closed_period
+    before = summaries(period_id)
+    remove = services.duplicate_index.remove
+    calls = []
+
+    # 第二批写入归档库并提交后、删除本库记录前中断
+    def interrupted(ids):
+        calls.append(ids)
+        if len(calls) == 2:
+            raise RuntimeError('进程被终止')
+        remove(ids)
+    monkeypatch.setattr(services.duplicate_index, 'remove', interrupted)
+    with pytest.raises(RuntimeError):
+        archive.archive_period(period_id, batch_size=3, today=TODAY, log=noop)
+    db.session.rollback()
+    db.session.remove()
+    assert db.session.get(SignPeriod, period_id).archive_state == archive.ARCHIVING
+    assert CheckInRecord.query.count() == 4
+    assert archived_rows(period_id) == 6
+
+    monkeypatch.setattr(services.duplicate_index, 'remove', remove)
+    # 重新运行从剩下的 4 条继续，重复写入的归档行被覆盖
+    assert archive.archive_period(period_id, batch_size=3, today=TODAY, log=noop) == 4
+    db.session.remove()
+    assert db.session.get(SignPeriod, period_id).archive_state == archive.ARCHIVED
+    assert CheckInRecord.query.count() == 0
+    assert archived_rows(period_id) == 7
+    rows = ArchivedRecord.query.filter_by(period_id=period_id).all()
+    loaded = archive.load_contents(rows)
+    assert {(r.user_id, r.date): loaded[r.id] for r in rows} == contents
+    assert summaries(period_id) == before
@@ -0,0 +1,120 @@
+import random
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import calendar_bits
+import period_summary
+from period_calendar import PeriodInfo
+
+START = date(2024, 3, 1)
+
+
+def make_period(days=14, rest=(), period_id=1):
+    return PeriodInfo(period_id, 'P', START, START + timedelta(days=days - 1),
+                      frozenset(START + timedelta(days=i) for i in rest))
+
+
+def day(i):
+    return START + timedelta(days=i)
+
+
+def bits_of(*indexes):
+    return sum(1 << i for i in indexes)
+
+
+def test_encode_keeps_only_days_inside_period():
+    period = make_period(10)
+    bits = calendar_bits.encode(period, [day(-1), day(0), day(9), day(10)])
+    assert bits == bits_of(0, 9)
+    assert calendar_bits.dates(period, bits) == [day(0), day(9)]
+
+
+def test_bytes_round_trip_at_byte_boundaries():
+    for length in (1, 7, 8, 9, 16, 17):
+        period = make_period(length)
+        full = (1 << length) - 1
+        data = calendar_bits.to_bytes(period, full)
+        assert len(data) == (length + 7) // 8
+        assert calendar_bits.from_bytes(data) == full
+    assert calendar_bits.from_bytes(None) == 0
+    assert calendar_bits.from_bytes(b'') == 0
+
+
+def test_before_is_clamped_to_period():
+    period = make_period(10)
+    assert calendar_bits.before(period, day(-3)) == 0
+    assert calendar_bits.before(period, day(0)) == 0
+    assert calendar_bits.before(period, day(4)) == bits_of(0, 1, 2, 3)
+    assert calendar_bits.before(period, day(30)) == (1 << 10) - 1
+
+
+def test_current_streak_skips_rest_days_and_today():
+    period = make_period(10, rest=(3,))
+    # 第 0 天缺卡，1、2 打卡，3 休息，4、5 打卡，6（当天）还没打
+    bits = bits_of(1, 2, 4, 5)
+    assert calendar_bits.current_streak(period, bits, day(6)) == 4
+    # 第二天再看，第 6 天已算缺卡
+    assert calendar_bits.current_streak(period, bits, day(7)) == 0
+    # 当天已打卡计入连续
+    assert calendar_bits.current_streak(period, bits | bits_of(6), day(6)) == 5
+
+
+def test_current_streak_after_period_end():
+    period = make_period(5)
+    assert calendar_bits.current_streak(period, bits_of(0, 1, 2, 3, 4), day(20)) == 5
+    assert calendar_bits.current_streak(period, bits_of(0, 1, 2, 3), day(20)) == 0
+
+
+def test_longest_streak_bridges_rest_days_without_counting_them():
+    period = make_period(12, rest=(3, 4, 11))
+    bits = bits_of(1, 2, 5, 6, 8, 9, 10)
+    # 1、2 + 休息 3、4 + 5、6 连成 4 天；8-10 接期末休息日 11 为 3 天
+    assert calendar_bits.longest_streak(period, bits) == 4
+    # 休息日打卡不计入天数
+    assert calendar_bits.longest_streak(period, bits | bits_of(3)) == 4
+    assert calendar_bits.longest_streak(period, 0) == 0
+
+
+def test_summary_counts_and_completion():
+    period = make_period(7, rest=(6,))
+    bits = bits_of(0, 1, 3)
+    result = calendar_bits.summary(period, bits, day(5))
+    assert result['required_days'] == 6
+    assert result['sign_count'] == 3
+    assert result['missed_dates'] == [day(2).isoformat(), day(4).isoformat()]
+    assert result['completion'] == 50.0
+    assert result['signed'] == format(bits, 'x')
+    assert result['rest'] == format(bits_of(6), 'x')
+
+
+def test_day_counts_matches_naive_sum():
+    rng = random.Random(7)
+    length = 45
+    bitsets = [rng.getrandbits(length) for _ in range(300)]
+    expected = [sum((bits >> i) & 1 for bits in bitsets) for i in range(length)]
+    assert calendar_bits.day_counts(bitsets, length) == expected
+    assert calendar_bits.day_counts([], 3) == [0, 0, 0]
+
+
+def test_summarize_matches_bits():
+    period = make_period(10, rest=(2,))
+    signed = [day(0), day(1), day(5)]
+    row = period_summary.summarize(period, signed, day(6))
+    assert row['sign_count'] == 3
+    assert row['required_days'] == 9
+    assert row['missed_dates'] == ','.join(day(i).isoformat() for i in (3, 4))
+    assert row['last_signed_date'] == day(5)
+    assert calendar_bits.from_bytes(row['signed_bits']) == calendar_bits.encode(period, signed)
+
+
+def test_missed_dates_fills_days_after_refresh():
+    period = make_period(10, rest=(2,))
+    required = period_summary.required_days(period)
+    assert period_summary.missed_dates(required, None, day(4)) == [day(0), day(1), day(3)]
+    row = period_summary.summarize(period, [day(0), day(1)], day(1))
+    summary = SimpleNamespace(missed_dates=row['missed_dates'], refreshed_on=row['refreshed_on'],
+                              last_signed_date=row['last_signed_date'])
+    # 汇总刷新后再没有打卡：第 1 天当天已打，之后的应打卡日都算缺卡（不含当天和休息日）
+    assert period_summary.missed_dates(required, summary, day(5)) == [day(3), day(4)]
+    # 时间段结束后看，缺卡截至最后一天
+    assert period_summary.missed_dates(required, summary, day(30))[-1] == day(9)
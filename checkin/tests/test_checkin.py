@@ -0,0 +1,91 @@
+import os
+from datetime import date, timedelta
+
+import pytest
+
+import checkins
+import services
+from checkins import CREATED, DUPLICATE, REPLAYED, commit_checkin
+from extensions import db
+from models import CheckInRecord, SignPeriod, bump_generation
+
+CONTENT = '今天读了《红楼梦》第三回，林黛玉进贾府，' * 10
+
+
+@pytest.fixture(params=[True, False], ids=['group-commit', 'direct'])
+def app_config(request):
+    return {'CONTENT_BACKEND': 'file', 'CHECKIN_GROUP_COMMIT': request.param}
+
+
+@pytest.fixture
+def period(app):
+    today = date.today()
+    period = SignPeriod(name='本阶段', start_date=today - timedelta(days=3), end_date=today + timedelta(days=3))
+    db.session.add(period)
+    bump_generation('periods')
+    db.session.commit()
+    services.period_calendar.invalidate()
+    return services.period_calendar.get(period.id)
+
+
+def uploaded_files(app):
+    return [name for _, _, names in os.walk(app.config['UPLOAD_FOLDER']) for name in names]
+
+
+# 取出并清空会话中的提示信息
+def flashes(client):
+    with client.session_transaction() as session:
+        return [message for _, message in session.pop('_flashes', [])]
+
+
+def test_repeated_token_is_replayed_and_second_checkin_is_duplicate(app, make_user, period):
+    user_pk = make_user('000000000002')
+    today = date.today()
+    first = commit_checkin(user_pk, '000000000002', period, today, CONTENT, 'token-a')
+    assert first.status == CREATED
+    # 同一表单重复提交返回同一次打卡的结果
+    replay = commit_checkin(user_pk, '000000000002', period, today, CONTENT, 'token-a')
+    assert (replay.status, replay.record_id) == (REPLAYED, first.record_id)
+    # 换一个表单再提交是重复打卡
+    again = commit_checkin(user_pk, '000000000002', period, today, CONTENT, 'token-b')
+    assert (again.status, again.record_id) == (DUPLICATE, first.record_id)
+    assert CheckInRecord.query.count() == 1
+    assert len(uploaded_files(app)) == 1
+
+
+def test_rolled_back_savepoint_leaves_no_files(app, make_user, period, monkeypatch):
+    user_pk = make_user('000000000002')
+
+    def fail(*args):
+        raise RuntimeError('写入失败')
+    # 内容文件写出之后才失败
+    monkeypatch.setattr(services.duplicate_index, 'add', fail)
+    with pytest.raises(RuntimeError):
+        with db.session.begin_nested():
+            checkins.save_checkin(user_pk, '000000000002', period, date.today(), CONTENT)
+    db.session.commit()
+    assert CheckInRecord.query.count() == 0
+    assert uploaded_files(app) == []
+
+
+def test_write_error_becomes_retry_message(app, make_user, login, period, monkeypatch):
+    make_user('000000000002')
+    client = app.test_client()
+    login(client, '000000000002')
+
+    def fail(*args):
+        raise RuntimeError('写入失败')
+    monkeypatch.setattr(services.duplicate_index, 'add', fail)
+    response = client.post('/CheckIn', data={'contents': CONTENT, 'token': 'token-a'})
+    assert response.status_code == 302
+    assert flashes(client) == ['保存失败，请重试']
+    db.session.remove()
+    assert CheckInRecord.query.count() == 0
+    assert uploaded_files(app) == []
+
+    # 故障排除后可以正常重试
+    monkeypatch.undo()
+    response = client.post('/CheckIn', data={'contents': CONTENT, 'token': 'token-a'})
+    assert response.status_code == 302
+    assert flashes(client) == ['签到成功！']
+    assert len(uploaded_files(app)) == 1
@@ -0,0 +1,70 @@
+import os
+from datetime import date, timedelta
+
+import pytest
+
+import services
+from content_store import PREVIEW_LENGTH, SegmentBackend
+from extensions import db
+from models import CheckInContent, CheckInRecord
+
+CONTENT = '《论语》学而篇：学而时习之，不亦说乎？有朋自远方来，不亦乐乎？' * 8
+
+
+@pytest.fixture(params=[False, True], ids=['plain', 'zlib'])
+def app_config(request):
+    return {'CONTENT_COMPRESS': request.param}
+
+
+def add_record(user_pk, day, content, backend=None):
+    record = CheckInRecord(user_pk=user_pk, user_id='000000000002', date=day, file_path='')
+    db.session.add(record)
+    db.session.flush()
+    services.content_storage.save(record, content, backend)
+    db.session.commit()
+    return record.id
+
+
+def test_backends_round_trip(app, make_user):
+    user_pk = make_user('000000000002')
+    ids = {name: add_record(user_pk, date(2024, 3, 1) + timedelta(days=i), f'{name}：{CONTENT}', name)
+           for i, name in enumerate(('file', 'db', 'segment'))}
+    db.session.remove()
+    # 各记录按保存时的后端读取，与当前默认后端无关
+    records = CheckInRecord.query.all()
+    assert services.content_storage.load_many(records) == {ids[name]: f'{name}：{CONTENT}' for name in ids}
+    previews = services.content_storage.previews(records)
+    assert previews == {ids[name]: f'{name}：{CONTENT}'[:PREVIEW_LENGTH] for name in ids}
+    row = db.session.get(CheckInContent, ids['db'])
+    assert row.codec == ('zlib' if app.config['CONTENT_COMPRESS'] else 'plain')
+
+
+def test_load_many_skips_missing_files(app, make_user):
+    user_pk = make_user('000000000002')
+    kept = add_record(user_pk, date(2024, 3, 1), CONTENT, 'db')
+    lost = add_record(user_pk, date(2024, 3, 2), CONTENT, 'file')
+    os.remove(db.session.get(CheckInRecord, lost).file_path)
+    assert services.content_storage.load_many(CheckInRecord.query.all()) == {kept: CONTENT}
+
+
+def test_delete_returns_text_files_only(app, make_user):
+    user_pk = make_user('000000000002')
+    add_record(user_pk, date(2024, 3, 1), CONTENT, 'file')
+    add_record(user_pk, date(2024, 3, 2), CONTENT, 'segment')
+    records = CheckInRecord.query.order_by(CheckInRecord.date).all()
+    files = services.content_storage.delete(records)
+    db.session.commit()
+    assert files == [records[0].file_path]
+    assert CheckInContent.query.count() == 0
+
+
+def test_segment_rolls_over_at_max_bytes(app, tmp_path):
+    backend = SegmentBackend(str(tmp_path / 'uploads'), max_bytes=100)
+    record = CheckInRecord(id=1, user_id='000000000002', date=date(2024, 3, 1))
+    rows = []
+    for i in range(3):
+        row = CheckInContent(record_id=1)
+        backend.save(record, row, f'{i}:' + 'x' * 60)
+        rows.append(row)
+    assert [row.segment for row in rows] == ['segment-000001.dat', 'segment-000001.dat', 'segment-000002.dat']
+    assert [backend.load(record, row) for row in rows] == [f'{i}:' + 'x' * 60 for i in range(3)]
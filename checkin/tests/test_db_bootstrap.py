@@ -0,0 +1,18 @@
+from sqlalchemy import text
+
+import db_bootstrap
+from extensions import db
+
+
+def test_upgrade_analyzes_after_migrations(app):
+    # app 夹具已在空库上执行过全部迁移
+    with db.engine.connect() as conn:
+        assert conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")).scalar() == 1
+        conn.execute(text('DELETE FROM sqlite_stat1'))
+        conn.commit()
+    messages = []
+    assert db_bootstrap.upgrade(db, log=messages.append) == db_bootstrap.MIGRATIONS[-1][0]
+    # 没有新迁移时不重复 ANALYZE
+    assert messages == []
+    with db.engine.connect() as conn:
+        assert conn.execute(text('SELECT count(*) FROM sqlite_stat1')).scalar() == 0
@@ -0,0 +1,40 @@
+from datetime import date
+
+from sqlalchemy import event
+
+import services
+from extensions import db
+from models import CheckInRecord, PeriodUserSummary, SignPeriod, current_generation
+
+
+def test_rest_day_and_summary_change_in_one_commit(app, make_user, login):
+    make_user('000000000001', is_admin=True)
+    user_pk = make_user('000000000002')
+    period = SignPeriod(name='第一阶段', start_date=date(2024, 3, 1), end_date=date(2024, 3, 5))
+    db.session.add(period)
+    db.session.flush()
+    for day in range(1, 5):
+        db.session.add(CheckInRecord(user_pk=user_pk, user_id='000000000002', date=date(2024, 3, day), file_path=''))
+    db.session.commit()
+    period_id = period.id
+    client = app.test_client()
+    login(client, '000000000001')
+    assert services.period_calendar.get(period_id).exceptions == frozenset()
+    generation = current_generation('periods')
+
+    commits = []
+    listener = lambda conn: commits.append(1)
+    event.listen(db.engine, 'commit', listener)
+    try:
+        response = client.post(f'/admin/sign_periods/{period_id}/exceptions', data={'exception_date': '2024-03-05'})
+    finally:
+        event.remove(db.engine, 'commit', listener)
+    assert response.status_code == 302
+    assert len(commits) == 1
+
+    db.session.remove()
+    assert current_generation('periods') == generation + 1
+    # 提交后本进程的日历立即失效
+    assert services.period_calendar.get(period_id).exceptions == frozenset({date(2024, 3, 5)})
+    summary = PeriodUserSummary.query.filter_by(period_id=period_id, user_id=user_pk).one()
+    assert (summary.sign_count, summary.required_days, summary.missed_dates) == (4, 4, '')
@@ -0,0 +1,58 @@
+import csv
+import gzip
+import io
+
+import export_stream
+from extensions import db
+from models import User
+
+STUDENTS = 23
+
+
+def add_students(count):
+    db.session.execute(db.insert(User), [
+        dict(username=f'2024{i:08d}', name=f'学生{i}', Departments='理学院', QQ=str(i), password='x', is_admin=False)
+        for i in range(count)
+    ])
+    db.session.commit()
+
+
+def test_encode_rows_flushes_in_chunks(monkeypatch):
+    monkeypatch.setattr(export_stream, 'FLUSH_ROWS', 5)
+    rows = [(i, f'名字,{i}', 'a\tb') for i in range(12)]
+    csv_chunks = list(export_stream.encode_rows(['id', 'name', 'note'], iter(rows), 'csv'))
+    assert len(csv_chunks) == 3
+    assert list(csv.reader(io.StringIO(''.join(csv_chunks))))[1:] == [[str(a), b, c] for a, b, c in rows]
+    tsv_chunks = list(export_stream.encode_rows(['id', 'name', 'note'], iter(rows), 'tsv'))
+    assert len(tsv_chunks) == 3
+    assert ''.join(tsv_chunks).splitlines()[1] == '0\t名字,0\ta b'
+
+
+def test_user_export_streams_every_row(app, make_user, login, monkeypatch):
+    monkeypatch.setattr(export_stream, 'FLUSH_ROWS', 4)
+    make_user('000000000001', is_admin=True)
+    add_students(STUDENTS)
+    client = app.test_client()
+    login(client, '000000000001')
+
+    response = client.get('/admin/users?export=csv')
+    assert response.status_code == 200 and response.mimetype == 'text/csv'
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert rows[0] == ['学号', '姓名', '学院', 'QQ', '签到次数']
+    assert len(rows) == STUDENTS + 2  # 表头、管理员和学生
+
+    response = client.get('/admin/users?export=tsv&gzip=1', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Content-Disposition'] == 'attachment; filename=users.tsv'
+    lines = gzip.decompress(response.get_data()).decode('utf-8').splitlines()
+    assert len(lines) == STUDENTS + 2
+    assert lines[-1] == f'2024{STUDENTS - 1:08d}\t学生{STUDENTS - 1}\t理学院\t{STUDENTS - 1}\t0'
+
+
+def test_gzip_needs_accept_encoding(app, make_user, login):
+    make_user('000000000001', is_admin=True)
+    client = app.test_client()
+    login(client, '000000000001')
+    response = client.get('/admin/users?export=csv&gzip=1', headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_data(as_text=True).startswith('学号,姓名')
@@ -0,0 +1,70 @@
+import sqlite3
+
+from sqlalchemy import create_engine, event, text
+
+import db_bootstrap
+from extensions import db
+from models import User
+
+
+def traced_engine(path, statements):
+    engine = create_engine(f'sqlite:///{path}')
+
+    @event.listens_for(engine, 'connect')
+    def trace(dbapi_connection, connection_record):
+        dbapi_connection.set_trace_callback(statements.append)
+    return engine
+
+
+def test_schedule_optimize_runs_at_most_once_per_interval(tmp_path, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(db_bootstrap.time, 'monotonic', lambda: clock[0])
+    statements = []
+    engine = traced_engine(tmp_path / 'a.db', statements)
+    db_bootstrap.schedule_optimize(engine, 60)
+
+    def use_connection():
+        with engine.connect() as conn:
+            conn.execute(text('SELECT 1'))
+
+    use_connection()
+    assert 'PRAGMA optimize' not in statements
+    clock[0] += 61
+    use_connection()
+    use_connection()
+    assert statements.count('PRAGMA optimize') == 1
+    clock[0] += 61
+    use_connection()
+    assert statements.count('PRAGMA optimize') == 2
+    engine.dispose()
+
+
+def test_schedule_optimize_disabled_by_zero_interval(tmp_path, monkeypatch):
+    monkeypatch.setattr(db_bootstrap.time, 'monotonic', lambda: 1e9)
+    statements = []
+    engine = traced_engine(tmp_path / 'a.db', statements)
+    db_bootstrap.schedule_optimize(engine, 0)
+    with engine.connect() as conn:
+        conn.execute(text('SELECT 1'))
+    assert 'PRAGMA optimize' not in statements
+    engine.dispose()
+
+
+def test_dump_update_and_backup_commands(app, make_user, tmp_path):
+    for i in range(5):
+        make_user(f'00000000000{i}')
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['checkin', 'dump', 'user', '--format', 'tsv', '--batch-size', '2'])
+    assert result.exit_code == 0, result.output
+    assert len(result.output.splitlines()) == 6
+
+    result = runner.invoke(args=['checkin', 'update', 'user', '--set', 'QQ=42', '--where', 'username=000000000003'])
+    assert result.exit_code == 0 and '共修改 1 行' in result.output
+    db.session.remove()
+    assert User.query.filter_by(QQ='42').count() == 1
+
+    target = tmp_path / 'backup.db'
+    result = runner.invoke(args=['checkin', 'backup', str(target)])
+    assert result.exit_code == 0, result.output
+    with sqlite3.connect(target) as conn:
+        assert conn.execute('SELECT count(*) FROM user').fetchone()[0] == 5
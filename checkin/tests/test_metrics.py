@@ -0,0 +1,25 @@
+def test_metrics_exposes_request_and_latency_series(app, make_user, login):
+    make_user('000000000001', is_admin=True)
+    make_user('000000000002')
+    client = app.test_client()
+    login(client, '000000000001')
+    assert client.get('/admin/user/000000000002/records').status_code == 200
+
+    response = client.get('/admin/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    body = response.get_data(as_text=True)
+    assert '# TYPE checkin_requests_total counter' in body
+    assert 'checkin_requests_total{endpoint="main.user_checkin_records",method="GET",status="200"} 1' in body
+    assert '# TYPE checkin_request_duration_seconds histogram' in body
+    assert 'checkin_request_duration_seconds_count{endpoint="main.user_checkin_records",method="GET"} 1' in body
+    assert 'checkin_request_duration_seconds_bucket{endpoint="main.user_checkin_records",method="GET",le="+Inf"} 1' \
+        in body
+    assert 'checkin_request_sql_queries_count{endpoint="main.user_checkin_records"} 1' in body
+
+
+def test_metrics_requires_admin(app, make_user, login):
+    make_user('000000000002')
+    client = app.test_client()
+    login(client, '000000000002')
+    assert client.get('/admin/metrics').status_code == 403
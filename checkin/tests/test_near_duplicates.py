@@ -0,0 +1,57 @@
+from datetime import date
+
+import pytest
+
+import near_duplicates
+
+BASE = ('今天阅读了数据结构教材第三章，重点复习了二叉搜索树的插入和删除操作，并完成了课后练习题中的前五道，'
+        '对平衡树旋转的理解更加深入了。晚上整理了笔记，把红黑树的几种旋转情况画成了图。')
+NEAR = BASE.replace('晚上整理了笔记', '晚上背了单词')
+OTHER = ('下午去图书馆借了一本关于近代史的书，读完了前两章，了解了洋务运动的背景和主要人物，'
+         '还和同学讨论了甲午战争失败的原因，准备下周写一篇读书报告。')
+
+
+# 两个签名落入同一个桶的 (段号, 桶号)
+def shared_bands(a, b):
+    return set(near_duplicates.band_buckets(a)) & set(near_duplicates.band_buckets(b))
+
+
+def test_near_duplicate_pair_shares_a_band():
+    a, b = near_duplicates.signature(BASE), near_duplicates.signature(NEAR)
+    assert near_duplicates.similarity(a, b) >= 0.6
+    assert shared_bands(a, b)
+
+
+def test_unrelated_content_is_not_a_candidate():
+    a, c = near_duplicates.signature(BASE), near_duplicates.signature(OTHER)
+    assert near_duplicates.similarity(a, c) < 0.2
+    assert not shared_bands(a, c)
+
+
+def test_signature_ignores_case_and_punctuation():
+    assert near_duplicates.signature('Hello, World 你好世界') == near_duplicates.signature('hello world你好 世界！')
+    assert near_duplicates.unpack(near_duplicates.pack(near_duplicates.signature(BASE))) == \
+        tuple(near_duplicates.signature(BASE))
+
+
+def test_index_finds_earlier_near_duplicate(app):
+    import services
+    from extensions import db
+    from models import CheckInRecord
+    # 签名表引用打卡记录，先写入对应的记录
+    db.session.add_all(CheckInRecord(id=i, user_id=str(i), date=date(2024, 3, i), file_path='') for i in range(1, 6))
+    db.session.flush()
+    index = services.duplicate_index
+    assert index.add(1, user_pk=1, period_id=1, content=BASE) == []
+    assert index.add(2, user_pk=2, period_id=1, content=OTHER) == []
+    matches = index.add(3, user_pk=3, period_id=1, content=NEAR)
+    assert [record_id for record_id, score in matches] == [1]
+    # 不同时间段、不同用户的内容不比较
+    assert index.add(4, user_pk=4, period_id=2, content=NEAR) == []
+    db.session.commit()
+    index.remove([1])
+    assert index.add(5, user_pk=5, period_id=1, content=BASE) == [(3, pytest.approx(matches[0][1]))]
+
+
+def test_clusters_merge_pairs():
+    assert near_duplicates.clusters([(3, 1), (5, 3), (7, 8)]) == [[1, 3, 5], [7, 8]]
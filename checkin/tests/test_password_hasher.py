@@ -0,0 +1,77 @@
+import time
+
+import pytest
+
+import services
+from password_hasher import HasherBusy, PasswordHasher, check_password, hash_cost
+
+
+@pytest.fixture
+def app_config():
+    return {'PASSWORD_HASH_QUEUE': 1}
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError('条件未在限定时间内满足')
+        time.sleep(0.01)
+
+
+def test_generate_and_check_in_thread():
+    hasher = PasswordHasher(rounds=4, workers=0)
+    pw_hash = hasher.generate('secret1')
+    assert hasher.check(pw_hash, 'secret1') and not hasher.check(pw_hash, 'secret2')
+    assert not hasher.check('不是哈希', 'secret1')
+    assert not hasher.needs_rehash(pw_hash)
+    assert PasswordHasher(rounds=5, workers=0).needs_rehash(pw_hash)
+    assert hasher.stats()['completed'] == 4
+
+
+def test_full_queue_raises_busy():
+    hasher = PasswordHasher(rounds=4, workers=0, max_pending=1)
+    hasher._slots.acquire()  # 模拟另一个正在进行的哈希
+    with pytest.raises(HasherBusy):
+        hasher.generate('secret1')
+    assert hasher.stats()['rejected'] == 1
+    hasher._slots.release()
+    assert hash_cost(hasher.generate('secret1')) == 4
+
+
+def test_timeout_raises_busy_and_keeps_slot_until_done():
+    hasher = PasswordHasher(rounds=12, workers=1, max_pending=1, timeout=0.01)
+    try:
+        with pytest.raises(HasherBusy):
+            hasher.generate('secret1')
+        assert hasher.stats()['timeouts'] == 1
+        # 子进程中的哈希结束前名额仍被占用
+        wait_until(lambda: hasher._slots.acquire(blocking=False))
+        hasher._slots.release()
+    finally:
+        hasher._get_executor().shutdown()
+
+
+def test_generate_many_keeps_order():
+    hasher = PasswordHasher(rounds=4, workers=2)
+    passwords = [f'password{i}' for i in range(20)]
+    try:
+        hashes = hasher.generate_many(passwords, chunk_size=3)
+    finally:
+        hasher._get_executor().shutdown()
+    assert len(hashes) == 20
+    assert all(check_password(h, p) for h, p in zip(hashes, passwords))
+    assert [hash_cost(h) for h in PasswordHasher(rounds=4, workers=0).generate_many(passwords[:2], rounds=5)] == [5, 5]
+
+
+def test_login_returns_503_when_hasher_busy(app, make_user):
+    make_user('000000000002')
+    client = app.test_client()
+    services.password_hasher._slots.acquire()
+    try:
+        response = client.post('/login', data={'username': '000000000002', 'password': 'secret1'})
+    finally:
+        services.password_hasher._slots.release()
+    assert response.status_code == 503 and response.headers['Retry-After'] == '5'
+    assert '服务器繁忙'.encode() in response.data
+    assert client.post('/login', data={'username': '000000000002', 'password': 'secret1'}).status_code == 302
@@ -0,0 +1,64 @@
+from flask import Flask, Response
+
+from response_cache import CachedBody, ResponseCache
+
+
+def body(size):
+    return CachedBody(b'x' * size, 200, 'text/html', [])
+
+
+def test_evicts_least_recently_used_by_bytes():
+    cache = ResponseCache(max_bytes=100, max_entry_bytes=100)
+    cache.put('a', body(40))
+    cache.put('b', body(40))
+    assert cache.get('a') is not None  # a 变为最近使用
+    cache.put('c', body(40))
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+    assert cache.size == 80
+
+
+def test_one_large_entry_evicts_several_small_ones():
+    cache = ResponseCache(max_bytes=100, max_entry_bytes=100)
+    for key in 'abcde':
+        cache.put(key, body(20))
+    cache.put('big', body(70))
+    assert [key for key in 'abcde' if cache.get(key) is not None] == ['e']
+    assert cache.size == 90
+
+
+def test_replacing_entry_updates_size():
+    cache = ResponseCache(max_bytes=100, max_entry_bytes=100)
+    cache.put('a', body(60))
+    cache.put('a', body(10))
+    assert cache.size == 10
+    cache.put('b', body(90))
+    assert cache.get('a') is not None and cache.size == 100
+
+
+def test_entries_over_the_limit_are_not_cached():
+    cache = ResponseCache(max_bytes=100, max_entry_bytes=30)
+    cache.put('a', body(20))
+    cache.put('b', body(31))
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+    assert cache.stats()['entries'] == 1 and cache.stats()['bytes'] == 20
+
+
+def test_streamed_response_is_cached_only_when_small_enough():
+    app = Flask(__name__)
+    cache = ResponseCache(max_bytes=1000, max_entry_bytes=50)
+
+    @app.route('/export/<int:size>')
+    def export(size):
+        return cache.respond(('v1',), lambda: Response((b'x' * 10 for _ in range(size)), mimetype='text/csv'))
+
+    client = app.test_client()
+    small = client.get('/export/3')
+    assert small.data == b'x' * 30
+    large = client.get('/export/8')
+    assert large.data == b'x' * 80
+    assert cache.stats()['entries'] == 1 and cache.size == 30
+    again = client.get('/export/3')
+    assert again.data == b'x' * 30 and cache.hits == 1
+    assert client.get('/export/3', headers={'If-None-Match': small.headers['ETag']}).status_code == 304
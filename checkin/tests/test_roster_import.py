@@ -0,0 +1,61 @@
+import io
+
+import roster_import
+from extensions import db
+from forms import DEPARTMENTS
+from models import User
+from password_hasher import PasswordHasher, check_password, hash_cost
+
+DEPARTMENT = DEPARTMENTS[0]
+ROSTER = '\n'.join([
+    '学号\t姓名\t学院\tQQ\t密码',
+    f'202400000001\t张三\t{DEPARTMENT}\t10001\t',
+    f'202400000002\t李四\t{DEPARTMENT}\t10002\tmypassword',
+    f'20240000003\t王五\t{DEPARTMENT}\t10003\t',
+    f'202400000004\t赵六\t不存在的学院\t10004\t',
+    f'000000000002\t已注册\t{DEPARTMENT}\t10005\t',
+    f'202400000001\t重复\t{DEPARTMENT}\t10006\t',
+    f'202400000007\t孙七\t{DEPARTMENT}\t10007\t123',
+    '',
+])
+
+
+def import_text(text, **kwargs):
+    return roster_import.import_roster(db, User, text, default_password='initial1', departments=DEPARTMENTS,
+                                       rounds=4, hasher=PasswordHasher(rounds=4, workers=0), **kwargs)
+
+
+def test_import_reports_errors_and_creates_valid_rows(app, make_user, monkeypatch):
+    make_user('000000000002')
+    monkeypatch.setattr(roster_import, 'LOOKUP_CHUNK_SIZE', 2)
+    result = import_text(roster_import.decode(ROSTER.encode('gbk')))
+    assert (result.rows, result.created) == (7, 2)
+    assert [(e.line, e.message) for e in result.errors] == [
+        (4, '学号必须是 12 位数字'), (5, '未知学院：不存在的学院'), (6, '学号已注册'),
+        (7, '文件中学号重复'), (8, '初始密码至少 6 位'),
+    ]
+    users = {u.username: u for u in User.query.filter(User.username.like('2024%'))}
+    assert sorted(users) == ['202400000001', '202400000002']
+    assert check_password(users['202400000001'].password, 'initial1')
+    assert check_password(users['202400000002'].password, 'mypassword')
+    assert hash_cost(users['202400000001'].password) == 4
+
+
+def test_dry_run_creates_nothing(app):
+    result = import_text(ROSTER, dry_run=True)
+    assert (result.rows, result.created, len(result.errors)) == (7, 0, 4)
+    assert User.query.count() == 0
+
+
+def test_imported_student_can_log_in(app, make_user, login):
+    make_user('000000000001', is_admin=True)
+    client = app.test_client()
+    login(client, '000000000001')
+    roster = f'202400000001,张三,{DEPARTMENT},10001,secret1\n'.encode('utf-8-sig')
+    response = client.post('/admin/users/import', data={'roster': (io.BytesIO(roster), 'roster.csv')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 200
+    assert '已导入 1 名学生，0 行有错误'.encode() in response.data
+    user = User.query.filter_by(username='202400000001').one()
+    assert user.department_id is not None
+    login(app.test_client(), '202400000001')
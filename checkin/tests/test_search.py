@@ -0,0 +1,46 @@
+from datetime import date, timedelta
+
+import search_index
+import services
+from extensions import db
+from models import CheckInRecord
+
+
+def add_records(user_pk, username, contents, start=date(2024, 3, 1)):
+    for i, content in enumerate(contents):
+        record = CheckInRecord(user_pk=user_pk, user_id=username, date=start + timedelta(days=i), file_path='')
+        db.session.add(record)
+        db.session.flush()
+        services.content_storage.save(record, content)
+    db.session.commit()
+
+
+def test_short_term_scan_stops_at_limit(app, make_user, monkeypatch):
+    user_pk = make_user('000000000002')
+    # 较新的 30 条不含短词，只有最早一条含有
+    add_records(user_pk, '000000000002', ['读书笔记：红楼'] + ['读书笔记：西游'] * 30)
+    monkeypatch.setattr(search_index, 'SCAN_BATCH_SIZE', 4)
+    monkeypatch.setattr(search_index, 'SCAN_LIMIT', 10)
+    hits, has_next, truncated = search_index.search(db.session, '红楼')
+    assert hits == [] and not has_next and truncated
+
+    monkeypatch.setattr(search_index, 'SCAN_LIMIT', 100)
+    hits, has_next, truncated = search_index.search(db.session, '红楼')
+    assert [hit.date for hit in hits] == ['2024-03-01'] and not truncated
+
+    # 缩小日期范围后不再触及上限
+    monkeypatch.setattr(search_index, 'SCAN_LIMIT', 10)
+    hits, _, truncated = search_index.search(db.session, '红楼', end=date(2024, 3, 5))
+    assert len(hits) == 1 and not truncated
+
+
+def test_search_page_shows_refine_notice(app, make_user, login, monkeypatch):
+    make_user('000000000001', is_admin=True)
+    user_pk = make_user('000000000002')
+    add_records(user_pk, '000000000002', ['西游'] * 5)
+    monkeypatch.setattr(search_index, 'SCAN_LIMIT', 3)
+    client = app.test_client()
+    login(client, '000000000001')
+    response = client.get('/admin/search?q=红楼')
+    assert response.status_code == 200
+    assert '缩小时间段、日期范围'.encode() in response.data
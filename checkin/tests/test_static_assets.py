@@ -0,0 +1,52 @@
+import gzip
+import re
+
+import pytest
+
+from static_assets import StaticAssets
+
+
+@pytest.fixture
+def app_config(tmp_path):
+    return {'STATIC_FINGERPRINT': True, 'STATIC_BUILD_FOLDER': str(tmp_path / 'static-build')}
+
+
+def stylesheet_url(client):
+    page = client.get('/').get_data(as_text=True)
+    return re.search(r'href="(/static/style\.[0-9a-f]{12}\.css)"', page).group(1)
+
+
+def test_fingerprinted_url_is_immutable_and_precompressed(app):
+    client = app.test_client()
+    url = stylesheet_url(client)
+    with open(app.static_folder + '/style.css', 'rb') as f:
+        original = f.read()
+
+    response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200 and response.mimetype == 'text/css'
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.cache_control.immutable and response.cache_control.max_age == app.config['STATIC_MAX_AGE']
+    assert 'Accept-Encoding' in response.vary
+    assert 'Set-Cookie' not in response.headers
+    assert gzip.decompress(response.get_data()) == original
+
+    plain = client.get(url, headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in plain.headers and plain.get_data() == original
+    assert client.get(url, headers={'If-None-Match': plain.headers['ETag']}).status_code == 304
+    # 不带指纹的旧地址照常返回，但不带 immutable
+    legacy = client.get('/static/style.css')
+    assert legacy.status_code == 200 and not legacy.cache_control.immutable
+
+
+def test_fingerprint_changes_with_content(tmp_path):
+    source = tmp_path / 'static'
+    source.mkdir()
+    (source / 'app.js').write_text('console.log(1);' * 20)
+    assets = StaticAssets(str(source), str(tmp_path / 'build'))
+    first = assets.build()['app.js']
+    assert assets.build()['app.js'] == first
+    assert set(first['variants']) >= {'gzip'}
+    (source / 'app.js').write_text('console.log(2);' * 20)
+    second = assets.build()['app.js']
+    assert second['file'] != first['file'] and second['file'].startswith('app.')
+    assert (tmp_path / 'build' / first['file']).exists() and (tmp_path / 'build' / second['file']).exists()
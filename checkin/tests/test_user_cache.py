@@ -0,0 +1,44 @@
+from user_cache import UserCache, UserSnapshot
+
+
+def make_cache(check_interval):
+    calls = {'generation': 0, 'loader': 0}
+    state = {'generation': 1, 'name': '学生'}
+
+    def generation():
+        calls['generation'] += 1
+        return state['generation']
+
+    def loader(user_id):
+        calls['loader'] += 1
+        return UserSnapshot(user_id, '000000000001', state['name'], '理学院', '1', False)
+
+    return UserCache(loader, generation, check_interval=check_interval), calls, state
+
+
+def test_hit_within_interval_makes_no_queries():
+    cache, calls, state = make_cache(check_interval=60)
+    assert cache.get(1).name == '学生'
+    for _ in range(5):
+        cache.get(1)
+    assert calls == {'generation': 1, 'loader': 1}
+    # 间隔内其他进程的修改暂不可见
+    state['generation'], state['name'] = 2, '改名'
+    assert cache.get(1).name == '学生'
+
+
+def test_generation_change_reloads_after_interval():
+    cache, calls, state = make_cache(check_interval=0)
+    cache.get(1)
+    state['generation'], state['name'] = 2, '改名'
+    assert cache.get(1).name == '改名'
+    assert calls['loader'] == 2
+
+
+def test_invalidate_drops_entry_immediately():
+    cache, calls, state = make_cache(check_interval=60)
+    cache.get(1)
+    state['name'] = '改名'
+    cache.invalidate(1)
+    assert cache.get(1).name == '改名'
+    assert calls['generation'] == 1
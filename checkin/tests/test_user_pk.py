@@ -0,0 +1,67 @@
+import os
+from datetime import date, timedelta
+
+import pytest
+
+import services
+from checkins import commit_checkin
+from extensions import db
+from models import CheckInContent, CheckInRecord, PeriodUserSummary, SignPeriod, User, UserCheckInStats, \
+    bump_generation
+
+START = date(2024, 3, 1)
+CONTENT = '今天读了《平凡的世界》，孙少平在黄原揽工的日子。' * 5
+
+
+@pytest.fixture
+def app_config():
+    return {'CONTENT_BACKEND': 'file'}
+
+
+@pytest.fixture
+def student(app, make_user):
+    """学号 000000000002 的学生在第一阶段打卡 3 天，返回其 id。"""
+    make_user('000000000001', is_admin=True)
+    user_pk = make_user('000000000002')
+    period = SignPeriod(name='第一阶段', start_date=START, end_date=START + timedelta(days=9))
+    db.session.add(period)
+    bump_generation('periods')
+    db.session.commit()
+    services.period_calendar.invalidate()
+    info = services.period_calendar.get(period.id)
+    for i in range(3):
+        commit_checkin(user_pk, '000000000002', info, START + timedelta(days=i), CONTENT)
+    return user_pk
+
+
+def test_renamed_student_keeps_records(app, login, student):
+    client = app.test_client()
+    login(client, '000000000001')
+    response = client.post(f'/admin/users/edit/{student}/Name',
+                           data={'username': '000000000099', 'value': '改名后'})
+    assert response.status_code == 302
+    db.session.remove()
+    records = CheckInRecord.query.filter_by(user_pk=student).all()
+    assert [r.user_id for r in records] == ['000000000099'] * 3
+    assert db.session.get(UserCheckInStats, (student, 1)).count == 3
+    page = client.get('/admin/user/000000000099/records')
+    assert page.status_code == 200
+    assert '平凡的世界'.encode() in page.data
+    assert client.get('/admin/user/000000000002/records').status_code == 404
+
+
+def test_deleting_student_removes_their_data(app, login, make_user, student):
+    other = make_user('000000000003')
+    commit_checkin(other, '000000000003', services.period_calendar.get(1), START, CONTENT)
+    paths = [r.file_path for r in CheckInRecord.query.filter_by(user_pk=student)]
+    assert all(os.path.exists(path) for path in paths)
+    client = app.test_client()
+    login(client, '000000000001')
+    assert client.post(f'/admin/users/delete/{student}').status_code == 302
+    db.session.remove()
+    assert db.session.get(User, student) is None
+    assert [r.user_pk for r in CheckInRecord.query.all()] == [other]
+    assert CheckInContent.query.count() == 1
+    assert UserCheckInStats.query.filter_by(user_id=student).count() == 0
+    assert PeriodUserSummary.query.filter_by(user_id=student).count() == 0
+    assert not any(os.path.exists(path) for path in paths)
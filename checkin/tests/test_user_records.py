@@ -0,0 +1,52 @@
+from datetime import date, timedelta
+
+import services
+from extensions import db
+from models import CheckInRecord
+
+
+def add_records(user_pk, username, count, start=date(2024, 3, 1)):
+    for i in range(count):
+        record = CheckInRecord(user_pk=user_pk, user_id=username, date=start + timedelta(days=i), file_path='')
+        db.session.add(record)
+        db.session.flush()
+        services.content_storage.save(record, f'第{i}天的打卡内容' * 10)
+    db.session.commit()
+
+
+def test_page_query_count_does_not_grow_with_page_size(app, make_user, login, count_queries):
+    make_user('000000000001', is_admin=True)
+    small = make_user('000000000002')
+    large = make_user('000000000003')
+    add_records(small, '000000000002', 5)
+    add_records(large, '000000000003', 20)
+    client = app.test_client()
+    login(client, '000000000001')
+    client.get('/admin/user/000000000002/records')  # 先加载日历等进程内缓存
+    counts = []
+    for username in ('000000000002', '000000000003'):
+        db.session.remove()
+        with count_queries() as statements:
+            response = client.get(f'/admin/user/{username}/records')
+        assert response.status_code == 200
+        counts.append(len(statements))
+    assert counts[0] == counts[1], counts
+    assert '第19天的打卡内容'.encode() in response.data
+
+
+def test_legacy_preview_is_cached_once(app, make_user, login, count_queries, tmp_path):
+    make_user('000000000001', is_admin=True)
+    user_pk = make_user('000000000002')
+    path = tmp_path / 'legacy.txt'
+    path.write_text('旧版文本文件中的打卡内容' * 5, encoding='utf-8')
+    db.session.add(CheckInRecord(user_pk=user_pk, user_id='000000000002', date=date(2024, 3, 1), file_path=str(path)))
+    db.session.commit()
+    client = app.test_client()
+    login(client, '000000000001')
+    assert '旧版文本文件'.encode() in client.get('/admin/user/000000000002/records').data
+    path.unlink()
+    db.session.remove()
+    with count_queries() as statements:
+        response = client.get('/admin/user/000000000002/records')
+    assert "旧版文本文件".encode() in response.data
+    assert not any(s.lstrip().upper().startswith(('INSERT', 'UPDATE')) for s in statements), statements
@@ -0,0 +1,98 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class UserSnapshot:
+    """登录用户的只读快照，实现 Flask-Login 需要的接口，不持有数据库会话。"""
+
+    __slots__ = ('id', 'username', 'name', 'Departments', 'QQ', 'is_admin')
+
+    is_authenticated = True
+    is_active = True
+    is_anonymous = False
+
+    def __init__(self, id, username, name, Departments, QQ, is_admin):
+        object.__setattr__(self, 'id', id)
+        object.__setattr__(self, 'username', username)
+        object.__setattr__(self, 'name', name)
+        object.__setattr__(self, 'Departments', Departments)
+        object.__setattr__(self, 'QQ', QQ)
+        object.__setattr__(self, 'is_admin', bool(is_admin))
+
+    def __setattr__(self, key, value):
+        raise AttributeError('UserSnapshot 是只读的')
+
+    def get_id(self):
+        return str(self.id)
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.username, user.name, user.Departments, user.QQ, user.is_admin)
+
+
+class UserCache:
+    """按用户 id 缓存 UserSnapshot 的 LRU 缓存。
+
+    每个快照记录加载时数据库中的 users 代数（generation() 返回），任何进程修改用户信息时
+    递增该代数，本进程下一次读取时发现代数变化即重新加载。本进程修改后调用 invalidate 立即失效。
+    与 PeriodCalendar 一样每隔 check_interval 秒才查询一次代数，间隔内命中缓存不访问数据库，
+    其他进程的修改最多延迟 check_interval 秒生效。
+    """
+
+    def __init__(self, loader, generation, maxsize=4096, check_interval=1.0):
+        self._loader = loader
+        self._generation = generation
+        self.maxsize = maxsize
+        self.check_interval = check_interval
+        self._known_generation = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # 用户 id -> (代数, 快照)
+        self._sequence = 0  # 每次 invalidate/clear 递增，加载期间发生失效时丢弃加载结果
+        self.hits = 0
+        self.misses = 0
+
+    def _current_generation(self):
+        now = time.monotonic()
+        if self._known_generation is None or now - self._checked_at >= self.check_interval:
+            self._known_generation = self._generation()
+            self._checked_at = now
+        return self._known_generation
+
+    def get(self, user_id):
+        generation = self._current_generation()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] == generation:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            sequence = self._sequence
+        snapshot = self._loader(user_id)
+        with self._lock:
+            if sequence != self._sequence:
+                return snapshot
+            if snapshot is None:
+                self._entries.pop(user_id, None)
+                return None
+            self._entries[user_id] = (generation, snapshot)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return snapshot
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._sequence += 1
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._sequence += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
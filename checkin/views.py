@@ -0,0 +1,792 @@
+import os
+import uuid
+import zlib
+from concurrent.futures import TimeoutError as FutureTimeout
+from datetime import date
+
+from flask import Blueprint, Response, current_app, render_template, redirect, url_for, flash, request, abort, jsonify
+from flask_login import login_user, login_required, logout_user, current_user
+from sqlalchemy import func, and_
+
+import archive
+import calendar_bits
+import department_rollup
+import period_summary
+import near_duplicates
+import roster_import
+import search_index
+import services
+from checkins import (DUPLICATE, checkin_totals, commit_checkin, delete_user_data, rebuild_period_summary,
+                      rename_user_records)
+from export_stream import stream_export
+from extensions import db
+from forms import ChangePasswordForm, RegistrationForm, LoginForm, SignPeriodForm, ExceptionDateForm, \
+    RosterImportForm, DEPARTMENTS
+from models import ArchivedRecord, User, CheckInRecord, CheckInContent, DuplicateFlag, SignPeriod, SignInException, \
+    UserCheckInStats, PeriodUserSummary, bump_generation, checkins_generation, current_generations, period_info
+from password_hasher import HasherBusy
+
+bp = Blueprint('main', __name__)
+
+# 导出参数：export=csv/tsv，gzip=1 时在客户端支持的情况下压缩传输
+def requested_export():
+    fmt = request.args.get('export')
+    if fmt not in ('csv', 'tsv'):
+        return None, False
+    gzip = request.args.get('gzip') == '1' and 'gzip' in request.accept_encodings
+    return fmt, gzip
+
+# 键集（seek）分页：按 key 列定位，after/before 为上一页最后一条或下一页第一条的 key，
+# 不使用 OFFSET，第 N 页与第 1 页开销相同。返回 (items, has_prev, has_next)
+def keyset_page(query, key, after=None, before=None, per_page=20, descending=False):
+    forward = before is None
+    if descending:
+        forward_order, backward_order = key.desc(), key.asc()
+        if after is not None:
+            query = query.filter(key < after)
+        if before is not None:
+            query = query.filter(key > before)
+    else:
+        forward_order, backward_order = key.asc(), key.desc()
+        if after is not None:
+            query = query.filter(key > after)
+        if before is not None:
+            query = query.filter(key < before)
+    items = query.order_by(forward_order if forward else backward_order).limit(per_page + 1).all()
+    more = len(items) > per_page
+    items = items[:per_page]
+    if forward:
+        return items, after is not None, more
+    items.reverse()
+    return items, more, True
+
+# 管理页面的条件 GET 和页面缓存：depends 为页面依赖的数据代数（见 models.checkins_generation），
+# 代数在渲染前读取，render 在缓存未命中时才调用
+def cached_page(depends, render, *extra):
+    return services.response_cache.respond(current_generations(depends), render, *extra)
+
+# 哈希队列已满时快速返回 503，提示用户稍后重试
+def hasher_busy(template, **context):
+    flash('服务器繁忙，请稍后重试。', 'danger')
+    return render_template(template, **context), 503, {'Retry-After': '5'}
+
+@bp.route('/', methods=['GET'])
+def index():
+    return render_template("index.html")
+
+@bp.route('/register', methods=['GET', 'POST'])
+def register():
+    form = RegistrationForm()
+    if form.validate_on_submit():
+        try:
+            hashed_pw = services.password_hasher.generate(form.password.data)
+        except HasherBusy:
+            return hasher_busy('register.html', form=form)
+        user = User(
+            username=form.username.data,
+            password=hashed_pw,
+            QQ=form.QQ.data,
+            Departments=form.Departments.data,
+            department_id=department_rollup.department_id(db.session, form.Departments.data),
+            name=form.name.data
+        )
+        db.session.add(user)
+        bump_generation('users')
+        db.session.commit()
+        flash('注册成功，请登录。', 'success')
+        return redirect(url_for('.login'))
+    return render_template('register.html', form=form)
+
+@bp.route('/login', methods=['GET', 'POST'])
+def login():
+    form = LoginForm()
+    if form.validate_on_submit():
+        user = User.query.filter_by(username=form.username.data).first()
+        try:
+            valid = user is not None and services.password_hasher.check(user.password, form.password.data)
+        except HasherBusy:
+            return hasher_busy('login.html', form=form)
+        if valid:
+            if services.password_hasher.needs_rehash(user.password):
+                try:
+                    user.password = services.password_hasher.generate(form.password.data)
+                    db.session.commit()
+                except HasherBusy:
+                    pass
+            login_user(user)
+            return redirect(url_for('.dashboard'))
+        else:
+            flash('学号或密码错误。', 'danger')
+    return render_template('login.html', form=form)
+
+@bp.route('/index')
+@login_required
+def dashboard():
+    return render_template(
+        'RealIndex.html',
+        username=current_user.name,
+        sID=current_user.username,
+        Dep=current_user.Departments,
+        QQ=current_user.QQ
+    )
+
+@bp.route('/CheckIn', methods=['GET', 'POST'])
+@login_required
+def CheckIn():
+    user_id = current_user.username
+    name = current_user.name
+    today = date.today()
+    # 从进程内日历查询当前打卡时间段及休息日，无需访问数据库
+    period = services.period_calendar.active_period(today)
+    rest_day = services.period_calendar.is_rest_day(today, period)
+    # 设置一个状态变量，传递到模板显示提示信息
+    message = ''
+    if rest_day:
+        message = '今日休息，不用打卡'
+
+    if request.method == 'POST':
+        content = request.form.get('contents', '').strip()
+        if not period or rest_day:
+            flash('非打卡时段','error')
+            return redirect(url_for('.CheckIn'))
+        if not content:
+            flash('内容不能为空', 'error')
+            return redirect(url_for('.CheckIn'))
+        if len(content) < 100:
+            flash('内容不能少于100字', 'error')
+            return redirect(url_for('.CheckIn'))
+        # 表单中的一次性令牌：同一表单重复提交（双击、刷新重发）时返回同一次打卡的结果
+        token = request.form.get('token', '')[:32] or None
+        args = (current_user.id, user_id, period, today, content, token)
+        if services.checkin_writer is None:
+            try:
+                result = commit_checkin(*args)
+            except Exception:
+                current_app.logger.exception('保存打卡失败：%s', user_id)
+                db.session.rollback()
+                flash('保存失败，请重试', 'error')
+                return redirect(url_for('.CheckIn'))
+        else:
+            future = services.checkin_writer.submit(*args)
+            # 开启异步写入时不等待写线程，请求立即返回
+            if current_app.config['CHECKIN_ASYNC_WRITES']:
+                flash('打卡已提交，稍后刷新即可看到记录。', 'success')
+                return redirect(url_for('.CheckIn'))
+            # 等待期间归还本请求的数据库连接，避免大量等待中的请求占满连接池、写线程拿不到连接
+            db.session.close()
+            try:
+                result = future.result(timeout=current_app.config['CHECKIN_WRITE_TIMEOUT'])
+            except FutureTimeout:
+                flash('系统繁忙，打卡结果未能及时确认，请稍后刷新查看。', 'warning')
+                return redirect(url_for('.CheckIn'))
+            except Exception:
+                # 写线程中的异常（已在写线程中回滚）通过 Future 传回
+                current_app.logger.exception('保存打卡失败：%s', user_id)
+                db.session.rollback()
+                flash('保存失败，请重试', 'error')
+                return redirect(url_for('.CheckIn'))
+        if result.status == DUPLICATE:
+            flash('今天已经签到过了', 'warning')
+        # 保存时已查找过近似重复的内容，这里只提示，不拒绝打卡
+        elif result.similar:
+            flash('签到成功，但内容与已有的打卡高度相似，请尽量写自己的新内容。', 'warning')
+        else:
+            flash('签到成功！', 'success')
+        return redirect(url_for('.CheckIn'))
+    
+    count = checkin_totals([current_user.id]).get(current_user.id, 0)
+
+    # GET 方法时从汇总行的打卡位图得到当前时间段的打卡日期和连续天数，不显示打卡内容
+    calendar = user_calendar(current_user.id, period, today) if period else None
+    return render_template('check_in.html', 
+                           calendar=calendar, 
+                           user_id=user_id, 
+                           count=count,
+                           name=name, 
+                           current_period=period,
+                           token=uuid.uuid4().hex,
+                           message=message)
+
+# 用户在某时间段的打卡日历：按主键读取一行汇总的位图，统计全部由位运算得出
+def user_calendar(user_pk, period, today):
+    bits = db.session.query(PeriodUserSummary.signed_bits).filter_by(period_id=period.id, user_id=user_pk).scalar()
+    return calendar_bits.summary(period, calendar_bits.from_bytes(bits), today)
+
+# 日历接口的时间段：period_id 参数，默认今天所在（或最近一个）时间段
+def requested_period(today):
+    period_id = request.args.get('period_id', type=int)
+    if period_id:
+        return services.period_calendar.get(period_id)
+    periods = services.period_calendar.periods()
+    return services.period_calendar.active_period(today) or (periods[-1] if periods else None)
+
+# 当前用户的打卡日历（JSON）
+@bp.route('/calendar.json')
+@login_required
+def my_calendar():
+    today = date.today()
+    period = requested_period(today)
+    if period is None:
+        abort(404)
+    return jsonify(user_calendar(current_user.id, period, today))
+
+@bp.route('/logout')
+@login_required
+def logout():
+    logout_user()
+    flash('已登出。', 'info')
+    return redirect(url_for('.login'))
+
+@bp.route('/admin/change_password', methods=['GET', 'POST'])
+@login_required
+def change_password():
+    if not current_user.is_admin:
+        flash('您没有权限访问此页面。', 'danger')
+        return redirect(url_for('.dashboard'))
+    form = ChangePasswordForm()
+    if form.validate_on_submit():
+        user = User.query.filter_by(username=form.username.data).first()
+        if user:
+            try:
+                hashed_pw = services.password_hasher.generate(form.new_password.data)
+            except HasherBusy:
+                return hasher_busy('change_password.html', form=form)
+            user.password = hashed_pw
+            db.session.commit()
+            services.user_cache.invalidate(user.id)
+            flash('密码已成功修改。', 'success')
+        else:
+            flash('用户不存在。', 'danger')
+        return redirect(url_for('.change_password'))
+    return render_template('change_password.html', form=form)
+
+@bp.route('/admin/users')
+@login_required
+def list_users():
+    if not current_user.is_admin:
+        flash('您没有权限访问此页面。', 'danger')
+        return redirect(url_for('.dashboard'))
+    
+    fmt, gzip = requested_export()
+    if fmt:
+        # 一次关联聚合查询，按批次从数据库流式读取，不在内存中构建整个文件
+        def rows():
+            totals = db.session.query(
+                UserCheckInStats.user_id,
+                func.sum(UserCheckInStats.count).label('total')
+            ).group_by(UserCheckInStats.user_id).subquery()
+            return db.session.query(
+                User.username, User.name, User.Departments, User.QQ,
+                func.coalesce(totals.c.total, 0)
+            ).outerjoin(totals, totals.c.user_id == User.id) \
+                .order_by(User.id) \
+                .execution_options(yield_per=1000)
+        return cached_page(['users', 'checkins'],
+                           lambda: stream_export('users', ['学号', '姓名', '学院', 'QQ', '签到次数'], rows, fmt, gzip),
+                           gzip)
+
+    # users = User.query.all()
+    def render():
+        page = request.args.get('page', 1, type=int)
+        per_page = 20
+        pagination = User.query.paginate(page=page, per_page=per_page, error_out=False)
+        users = pagination.items
+        checkin_counts = checkin_totals([user.id for user in users])
+        return render_template('usersTable.html', users=users, pagination=pagination,
+                               checkin_counts=checkin_counts)
+    return cached_page(['users', 'checkins'], render)
+
+# 批量导入学生名单（学期初代替逐个自行注册）；大批量导入建议使用命令行 import-roster
+@bp.route('/admin/users/import', methods=['GET', 'POST'])
+@login_required
+def import_users():
+    if not current_user.is_admin:
+        flash('您没有权限访问此页面。', 'danger')
+        return redirect(url_for('.dashboard'))
+    form = RosterImportForm()
+    result = None
+    if form.validate_on_submit():
+        try:
+            text = roster_import.decode(form.roster.data.read())
+        except ValueError as e:
+            flash(str(e), 'danger')
+            return render_template('admin_import_users.html', form=form, result=None)
+        config = current_app.config
+        # 在登录共用的哈希进程池中计算，不在请求中另建进程池
+        try:
+            result = roster_import.import_roster(
+                db, User, text,
+                default_password=form.default_password.data,
+                departments=DEPARTMENTS,
+                rounds=config['ROSTER_HASH_ROUNDS'],
+                batch_size=config['ROSTER_BATCH_SIZE'],
+                dry_run=form.dry_run.data,
+                hasher=services.password_hasher
+            )
+        except HasherBusy:
+            flash('服务器繁忙，请稍后重新导入。', 'danger')
+            return render_template('admin_import_users.html', form=form, result=None)
+        if form.dry_run.data:
+            flash(f'检查完成：{result.rows - len(result.errors)} 行可以导入，{len(result.errors)} 行有错误。', 'info')
+        else:
+            if result.created:
+                department_rollup.assign_departments(db.session)
+                bump_generation('users')
+                db.session.commit()
+            flash(f'已导入 {result.created} 名学生，{len(result.errors)} 行有错误。', 'success')
+    return render_template('admin_import_users.html', form=form, result=result)
+
+@bp.route('/admin/users/delete/<int:user_id>', methods=['POST'])
+@login_required
+def delete_user(user_id):
+    if not current_user.is_admin:
+        flash('您没有权限执行此操作。', 'danger')
+        return redirect(url_for('.dashboard'))
+    user = User.query.get_or_404(user_id)
+    # 打卡记录、内容、统计和汇总一起删除，提交成功后再删除内容文件
+    files = delete_user_data(user)
+    db.session.commit()
+    services.user_cache.invalidate(user_id)
+    for path in files:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    flash('用户已删除。', 'success')
+    return redirect(url_for('.list_users'))
+
+@bp.route('/admin/users/edit/<int:user_id>/<field>', methods=['GET', 'POST'])
+@login_required
+def edit_user_field(user_id, field):
+    if not current_user.is_admin:
+        flash('您没有权限执行此操作。', 'danger')
+        return redirect(url_for('.dashboard'))
+    user = User.query.get_or_404(user_id)
+    valid_fields = {
+        'QQ': 'QQ',
+        'Name': 'name',
+        'Dep': 'Departments'
+    }
+    if field not in valid_fields:
+        abort(404)
+    if request.method == 'POST':
+        username = request.form['username']
+        if username != user.username:
+            # 打卡记录按 user_pk 关联，只需同步记录里冗余保存的学号
+            user.username = username
+            rename_user_records(user.id, username)
+        setattr(user, valid_fields[field], request.form['value'])
+        if field == 'Dep':
+            # 学院变化时把该用户的打卡次数移到新学院
+            new_department = department_rollup.department_id(db.session, user.Departments)
+            department_rollup.move_user(db.session, user.id, user.department_id, new_department)
+            user.department_id = new_department
+        bump_generation('users')
+        db.session.commit()
+        services.user_cache.invalidate(user.id)
+        flash('用户信息已更新。', 'success')
+        return redirect(url_for('.list_users'))
+    return render_template('editUser.html', user=user, lab=field, value=getattr(user, valid_fields[field]))
+
+@bp.route('/admin/user/<username>/records')
+@login_required
+def user_checkin_records(username):
+    if not current_user.is_admin:
+        flash('您没有权限访问此页面。', 'danger')
+        return redirect(url_for('.dashboard'))
+    user = User.query.filter_by(username=username).first_or_404()
+
+    # 指定已归档的时间段时从归档库读取，否则只查询本库（可按时间段筛选）
+    period_id = request.args.get('period_id', type=int)
+    period = services.period_calendar.get(period_id) if period_id else None
+    if period_id and period is None:
+        abort(404)
+    archived = period is not None and period.archive_state is not None
+    if archived:
+        model = ArchivedRecord
+        base = ArchivedRecord.query.filter_by(user_pk=user.id, period_id=period.id)
+    else:
+        model = CheckInRecord
+        base = CheckInRecord.query.filter_by(user_pk=user.id)
+        if period:
+            base = base.filter(CheckInRecord.date >= period.start_date, CheckInRecord.date <= period.end_date)
+
+    fmt, gzip = requested_export()
+    if fmt:
+        user_pk = user.id
+
+        def rows():
+            if archived:
+                query = db.select(ArchivedRecord.date, ArchivedRecord.preview) \
+                    .where(ArchivedRecord.user_pk == user_pk, ArchivedRecord.period_id == period.id)
+            else:
+                query = db.select(CheckInRecord.date, CheckInContent.preview) \
+                    .outerjoin(CheckInContent, CheckInContent.record_id == CheckInRecord.id) \
+                    .where(CheckInRecord.user_pk == user_pk)
+                if period:
+                    query = query.where(CheckInRecord.date >= period.start_date, CheckInRecord.date <= period.end_date)
+            query = query.order_by(model.date)
+            for row in db.session.execute(query.execution_options(yield_per=1000)):
+                yield row.date, row.preview or ''
+        return stream_export(f'records_{username}', ['日期', '内容预览'], rows, fmt, gzip)
+
+    # 按日期倒序键集分页，每页只读取本页记录的预览；旧版文本文件的预览读取一次后写入 check_in_content
+    per_page = 20
+    records, has_prev, has_next = keyset_page(
+        base, model.date,
+        after=request.args.get('after', type=date.fromisoformat),
+        before=request.args.get('before', type=date.fromisoformat),
+        per_page=per_page, descending=True
+    )
+    cached = False
+    if archived:
+        previews = {record.id: record.preview for record in records}
+    else:
+        previews = services.content_storage.previews(records, cache=True)
+        # 写回了旧记录的预览时才需要提交（之后的查询会自动 flush，这里先记下）
+        cached = bool(db.session.new)
+    # 先取出页面需要的字段再提交：提交会让已加载的记录过期，之后访问属性会逐条重新查询
+    record_previews = [{
+        'id': record.id,
+        'date': record.date,
+        'preview': previews[record.id]
+    } for record in records]
+    total = checkin_totals([user.id]).get(user.id, 0)
+    if cached:
+        db.session.commit()
+    periods = services.period_calendar.periods()
+    return render_template('admin_user_records.html', user=user, records=record_previews, total=total,
+                           has_prev=has_prev, has_next=has_next, period=period, archived=archived,
+                           archived_periods=[p for p in periods if p.archive_state])
+
+# 单条打卡的全文（JSON），详情页点击“查看全文”时按需加载
+@bp.route('/admin/records/<int:record_id>/content')
+@login_required
+def record_content(record_id):
+    if not current_user.is_admin:
+        abort(403)
+    # 归档记录的链接带有 archived=1，只有这时才读取归档库和内容包
+    if request.args.get('archived', type=int):
+        record = ArchivedRecord.query.get_or_404(record_id)
+        try:
+            content = archive.load_contents([record])[record.id]
+        except (OSError, zlib.error):
+            return jsonify(error='内容读取失败'), 404
+    else:
+        record = CheckInRecord.query.get_or_404(record_id)
+        try:
+            content = services.content_storage.load(record)
+        except OSError:
+            return jsonify(error='内容读取失败'), 404
+    return jsonify(id=record.id, username=record.user_id, date=record.date.isoformat(), content=content)
+
+@bp.route('/admin/stats')
+@login_required
+def runtime_stats():
+    if not current_user.is_admin:
+        abort(403)
+    return jsonify(
+        user_cache=services.user_cache.stats(),
+        password_hasher=services.password_hasher.stats(),
+        checkin_writer=services.checkin_writer.stats() if services.checkin_writer else None,
+        admission=services.admission.stats(),
+        rate_limited={endpoint: limiter.limited for endpoint, limiter in services.rate_limiters.items()}
+    )
+
+# 打卡内容全文搜索（管理员），可按时间段、学院和日期范围筛选
+@bp.route('/admin/search')
+@login_required
+def search_records():
+    if not current_user.is_admin:
+        flash('您没有权限访问此页面。', 'danger')
+        return redirect(url_for('.dashboard'))
+    q = request.args.get('q', '').strip()
+    period_id = request.args.get('period_id', type=int)
+    department = request.args.get('department') or None
+    start = request.args.get('start', type=date.fromisoformat)
+    end = request.args.get('end', type=date.fromisoformat)
+    page = max(request.args.get('page', 1, type=int), 1)
+    # 时间段与日期范围同时给出时取交集
+    period = services.period_calendar.get(period_id) if period_id else None
+    if period:
+        start = max(start, period.start_date) if start else period.start_date
+        end = min(end, period.end_date) if end else period.end_date
+    hits, has_next, truncated = [], False, False
+    if q:
+        hits, has_next, truncated = search_index.search(db.session, q, start=start, end=end,
+                                                        department=department, page=page, per_page=20)
+    periods = SignPeriod.query.order_by(SignPeriod.start_date.desc()).all()
+    args = {'q': q, 'period_id': period_id, 'department': department,
+            'start': request.args.get('start'), 'end': request.args.get('end')}
+    return render_template('admin_search.html', hits=hits, has_next=has_next, page=page, periods=periods,
+                           departments=DEPARTMENTS, args=args, truncated=truncated,
+                           scan_limit=search_index.SCAN_LIMIT,
+                           short_query=any(len(t) < search_index.MIN_TERM_LENGTH for t in q.split()))
+
+# 某时间段内疑似重复/抄袭的打卡，按相似记录簇列出
+@bp.route('/admin/duplicates/<int:period_id>')
+@login_required
+def duplicate_report(period_id):
+    if not current_user.is_admin:
+        flash('您没有权限访问此页面。', 'danger')
+        return redirect(url_for('.dashboard'))
+    period = SignPeriod.query.get_or_404(period_id)
+    pairs = db.session.query(DuplicateFlag.record_id, DuplicateFlag.match_id, DuplicateFlag.similarity) \
+        .join(CheckInRecord, CheckInRecord.id == DuplicateFlag.record_id) \
+        .filter(CheckInRecord.date >= period.start_date, CheckInRecord.date <= period.end_date).all()
+    scores = {}
+    for record_id, match_id, score in pairs:
+        scores[record_id] = max(scores.get(record_id, 0), score)
+    groups = near_duplicates.clusters((a, b) for a, b, _ in pairs)
+    limit = 50
+    shown = groups[:limit]
+    ids = [rid for group in shown for rid in group]
+    rows = db.session.query(CheckInRecord, User.username, User.name) \
+        .join(User, User.id == CheckInRecord.user_pk) \
+        .filter(CheckInRecord.id.in_(ids)).all() if ids else []
+    previews = services.content_storage.previews([record for record, _, _ in rows])
+    entries = {record.id: {'id': record.id, 'date': record.date, 'username': username, 'name': name,
+                           'preview': previews[record.id], 'similarity': scores.get(record.id)}
+               for record, username, name in rows}
+    clusters = [[entries[rid] for rid in group if rid in entries] for group in shown]
+    return render_template('admin_duplicates.html', period=period, clusters=clusters,
+                           total_clusters=len(groups), limit=limit)
+
+# 各学院参与率的统计范围：指定时间段或 start/end，默认为今天所在（或最近一个）时间段；
+# 应打卡天数只计算到今天
+def department_report():
+    period_id = request.args.get('period_id', type=int)
+    start = request.args.get('start', type=date.fromisoformat)
+    end = request.args.get('end', type=date.fromisoformat)
+    today = date.today()
+    periods = services.period_calendar.periods()
+    period = services.period_calendar.get(period_id) if period_id else None
+    if period is None and not (start and end):
+        period = services.period_calendar.active_period(today) or (periods[-1] if periods else None)
+    if period is not None:
+        start, end = period.start_date, period.end_date
+    if start is None or end is None:
+        return None, None, None, [], []
+    days = department_rollup.required_days_between(periods, start, min(end, today))
+    return period, start, end, days, department_rollup.participation(db.session, start, end, len(days))
+
+# 各学院打卡参与率（管理员），数据来自按学院和日期预先汇总的统计表
+@bp.route('/admin/departments')
+@login_required
+def department_dashboard():
+    if not current_user.is_admin:
+        flash('您没有权限访问此页面。', 'danger')
+        return redirect(url_for('.dashboard'))
+    period, start, end, days, rates = department_report()
+    return render_template('admin_departments.html', period=period, start=start, end=end,
+                           required_days=len(days), rates=rates, periods=services.period_calendar.periods())
+
+@bp.route('/admin/departments.json')
+@login_required
+def department_rates():
+    if not current_user.is_admin:
+        abort(403)
+    period, start, end, days, rates = department_report()
+    return jsonify(
+        period_id=period.id if period else None,
+        start=start.isoformat() if start else None,
+        end=end.isoformat() if end else None,
+        required_days=len(days),
+        departments=[rate._asdict() for rate in rates]
+    )
+
+# 某个学生的打卡日历（管理员，JSON）
+@bp.route('/admin/user/<username>/calendar.json')
+@login_required
+def user_calendar_json(username):
+    if not current_user.is_admin:
+        abort(403)
+    user = User.query.filter_by(username=username).first_or_404()
+    today = date.today()
+    period = requested_period(today)
+    if period is None:
+        abort(404)
+    return jsonify(username=user.username, name=user.name, **user_calendar(user.id, period, today))
+
+# 某时间段全体学生的打卡位图（管理员，JSON），用于整体热力图：
+# 一次查询读出所有汇总行，daily 为每天打卡人数
+@bp.route('/admin/sign_periods/<int:period_id>/calendar.json')
+@login_required
+def period_calendar_json(period_id):
+    if not current_user.is_admin:
+        abort(403)
+    period = services.period_calendar.get(period_id)
+    if period is None:
+        abort(404)
+
+    def render():
+        rows = db.session.query(User.username, PeriodUserSummary.signed_bits) \
+            .outerjoin(PeriodUserSummary, and_(PeriodUserSummary.user_id == User.id,
+                                               PeriodUserSummary.period_id == period.id)) \
+            .filter(User.is_admin.is_(False)).order_by(User.id).all()
+        bitsets = [calendar_bits.from_bytes(bits) for _, bits in rows]
+        _, rest, required = calendar_bits.masks(period)
+        return jsonify(
+            period_id=period.id,
+            start=period.start_date.isoformat(),
+            end=period.end_date.isoformat(),
+            length=calendar_bits.period_length(period),
+            rest=calendar_bits.to_hex(rest),
+            required_days=required.bit_count(),
+            daily=calendar_bits.day_counts(bitsets, calendar_bits.period_length(period)),
+            users=[{'username': username, 'signed': calendar_bits.to_hex(bits)}
+                   for (username, _), bits in zip(rows, bitsets)]
+        )
+    return cached_page(['periods', 'users', checkins_generation(period_id)], render)
+
+# Prometheus 文本格式的性能指标（本工作进程）
+@bp.route('/admin/metrics')
+@login_required
+def metrics():
+    if not current_user.is_admin:
+        abort(403)
+    return Response(services.metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# ----------------管理打卡时间段及例外日期----------------
+
+# 列出所有打卡时间段（管理员）
+@bp.route('/admin/sign_periods')
+@login_required
+def list_sign_periods():
+    if not current_user.is_admin:
+        flash('您没有权限访问此页面。', 'danger')
+        return redirect(url_for('.dashboard'))
+    return cached_page(['periods'], lambda: render_template(
+        'admin_sign_periods.html', periods=SignPeriod.query.order_by(SignPeriod.start_date.desc()).all()))
+
+# 新增打卡时间段（管理员）
+@bp.route('/admin/sign_periods/add', methods=['GET', 'POST'])
+@login_required
+def add_sign_period():
+    if not current_user.is_admin:
+        flash('您没有权限访问此页面。', 'danger')
+        return redirect(url_for('.dashboard'))
+    form = SignPeriodForm()
+    if form.validate_on_submit():
+        new_period = SignPeriod(
+            name=form.name.data,
+            start_date=form.start_date.data,
+            end_date=form.end_date.data
+        )
+        db.session.add(new_period)
+        bump_generation('periods')
+        db.session.commit()
+        services.period_calendar.invalidate()
+        flash('打卡时间段添加成功。', 'success')
+        return redirect(url_for('.list_sign_periods'))
+    return render_template('admin_add_sign_period.html', form=form)
+
+# 管理某个时间段的例外日期（管理员）
+@bp.route('/admin/sign_periods/<int:period_id>/exceptions', methods=['GET', 'POST'])
+@login_required
+def manage_exceptions(period_id):
+    if not current_user.is_admin:
+        flash('您没有权限访问此页面。', 'danger')
+        return redirect(url_for('.dashboard'))
+    period = SignPeriod.query.get_or_404(period_id)
+    form = ExceptionDateForm()
+    if form.validate_on_submit():
+        # 归档时的完成情况汇总即为最终结果，不再修改休息日
+        if period.archive_state:
+            flash('该时间段已归档，不能修改休息日。', 'danger')
+            return redirect(url_for('.manage_exceptions', period_id=period.id))
+        # 添加新的例外日期
+        new_exception = SignInException(
+            sign_period=period,
+            exception_date=form.exception_date.data
+        )
+        db.session.add(new_exception)
+        # 应打卡天数变化，在同一事务中按新的休息日重建该时间段的完成情况汇总，
+        # 其他进程不会看到已有休息日、汇总却还是旧的中间状态
+        rebuild_period_summary(period_info(period))
+        bump_generation('periods')
+        db.session.commit()
+        services.period_calendar.invalidate()
+        flash('休息日期添加成功。', 'success')
+        return redirect(url_for('.manage_exceptions', period_id=period.id))
+    # 表单带有本会话的 CSRF 令牌，整页不能缓存，只缓存休息日列表片段
+    exceptions = services.response_cache.fragment(
+        ('exceptions', period.id) + current_generations(['periods']),
+        lambda: render_template('_exception_list.html', exceptions=period.exceptions))
+    return render_template('admin_manage_exceptions.html', period=period, exceptions=exceptions, form=form)
+
+# 按时间段查看全部打卡记录（管理员）
+@bp.route('/admin/records_by_period/<int:period_id>')
+@login_required
+def records_by_period(period_id):
+    if not current_user.is_admin:
+        flash('您没有权限访问此页面。', 'danger')
+        return redirect(url_for('.dashboard'))
+    # 页面依赖时间段、用户和本时间段内的打卡，缺卡日期还随当天日期变化；
+    # 同一导出地址按客户端是否支持 gzip 返回不同的内容，分别缓存
+    _, gzip = requested_export()
+    return cached_page(['periods', 'users', checkins_generation(period_id)],
+                       lambda: render_records_by_period(period_id), date.today(), gzip)
+
+def render_records_by_period(period_id):
+    period = SignPeriod.query.get_or_404(period_id)
+    # 签到次数、完成率和缺卡日期都从 period_user_summary 读取；below 参数筛选完成率低于该百分比的用户
+    info = services.period_calendar.get(period.id)
+    required = period_summary.required_days(info)
+    today = date.today()
+    below = request.args.get('below', type=float)
+    summary_join = and_(PeriodUserSummary.user_id == User.id, PeriodUserSummary.period_id == period.id)
+
+    # 若需要导出，则不分页，按批次流式输出全部数据
+    fmt, gzip = requested_export()
+    if fmt:
+        query = db.select(
+            User.username, User.name, User.Departments,
+            PeriodUserSummary.sign_count, PeriodUserSummary.completion, PeriodUserSummary.missed_dates,
+            PeriodUserSummary.last_signed_date, PeriodUserSummary.refreshed_on
+        ).outerjoin(PeriodUserSummary, summary_join)
+        if below is not None:
+            query = query.where(func.coalesce(PeriodUserSummary.completion, 0) < below)
+
+        def rows():
+            for row in db.session.execute(query.order_by(User.id).execution_options(yield_per=1000)):
+                summary = row if row.refreshed_on is not None else None
+                yield (row.username, row.name, row.Departments,
+                       summary.sign_count if summary else 0,
+                       len(required),
+                       summary.completion if summary else period_summary.completion(0, len(required)),
+                       ' '.join(d.isoformat() for d in period_summary.missed_dates(required, summary, today)))
+        return stream_export(f'records_period_{period.id}',
+                             ['学号', '姓名', '学院', '签到次数', '应打卡天数', '完成率(%)', '缺卡日期'],
+                             rows, fmt, gzip)
+
+    # 按 User.id 键集分页，每页只读取本页用户的汇总行
+    per_page = 20
+    query = db.session.query(User, PeriodUserSummary).outerjoin(PeriodUserSummary, summary_join)
+    if below is not None:
+        query = query.filter(func.coalesce(PeriodUserSummary.completion, 0) < below)
+    rows, has_prev, has_next = keyset_page(
+        query, User.id,
+        after=request.args.get('after', type=int),
+        before=request.args.get('before', type=int),
+        per_page=per_page
+    )
+    records = [{
+        'user': user,
+        'sign_count': summary.sign_count if summary else 0,
+        'completion': summary.completion if summary else period_summary.completion(0, len(required)),
+        'missed': period_summary.missed_dates(required, summary, today),
+    } for user, summary in rows]
+    total_users = db.session.query(func.count(User.id)).scalar() if below is None else None
+
+    return render_template(
+        'admin_records_by_period.html',
+        period=period,
+        records=records,
+        per_page=per_page,
+        total_users=total_users,
+        required_days=len(required),
+        below=below,
+        has_prev=has_prev,
+        has_next=has_next
+    )